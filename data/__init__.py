@@ -1,26 +1,63 @@
 from data import Data
-from netCDF4 import Dataset
 import nemo
 import fvcom
 import mercator
 from cachetools import LRUCache
+import settings
+import compute
+import shared_store
+import pool
+import mirror
+from lazy import LazyData
 
 __dataset_cache = LRUCache(maxsize=10, getsizeof=lambda x: 1)
 
 
+def configure(config):
+    """Applies the data layer settings of an application config"""
+    settings.configure(config)
+    compute.limit_native_threads()
+
+
 def open_dataset(url):
     if url is not None:
         if __dataset_cache.get(url) is None:
-            if url.startswith("http") or url.endswith(".nc"):
-                with Dataset(url, 'r') as ds:
+            # Datasets mirrored locally are read from the mirror
+            source = mirror.lookup(url) or url
+            if source.startswith("http") or source.endswith(".nc") or \
+                    source.endswith(".ncml"):
+                # The handle goes back to the pool and is reused by the
+                # first with block on the new dataset
+                ds = pool.acquire(source)
+                try:
                     if 'latitude_longitude' in ds.variables or \
                             'LatLon_Projection' in ds.variables:
-                        __dataset_cache[url] = mercator.Mercator(url)
+                        dataset = mercator.Mercator(source)
                     elif 'siglay' in ds.variables:
-                        __dataset_cache[url] = fvcom.Fvcom(url)
+                        dataset = fvcom.Fvcom(source)
                     elif 'polar_stereographic' in ds.variables:
-                        __dataset_cache[url] = nemo.Nemo(url)
+                        dataset = nemo.Nemo(source)
                     else:
-                        __dataset_cache[url] = nemo.Nemo(url)
+                        dataset = nemo.Nemo(source)
+                finally:
+                    pool.release(ds)
+
+                __dataset_cache[url] = LazyData(dataset)
 
     return __dataset_cache.get(url)
+
+
+def preload(urls):
+    """Publishes the static coordinates of the datasets to the shared store
+    and builds their spatial indexes.
+
+    Called from the master process before the workers are forked, so every
+    worker attaches to the same arrays and inherits the indexes.
+    """
+    shared_store.clear()
+    for url in urls:
+        with open_dataset(url) as dataset:
+            dataset.preload()
+
+    # Workers open their own handles
+    pool.clear()
@@ -0,0 +1,192 @@
+import numpy as np
+import hashlib
+import os
+import settings
+import shared_store
+import read_plan
+import mirror
+
+# Bottom levels at most this far apart are read in one slab, as long as
+# that at most doubles the cells read
+LEVEL_GAP = 4
+
+
+def bottom_index(var, time=0):
+    """Finds the deepest unmasked level of each column of a variable
+
+    The variable is read one level at a time, so the whole 3-D field is
+    never in memory at once.
+
+    Arguments:
+        var -- a (time, depth, y, x) variable
+        time -- the time index to take the land mask from
+
+    Returns:
+        A (y, x) int array of level indices, -1 for land
+    """
+    result = np.empty(var.shape[2:], dtype=np.int16)
+    result.fill(-1)
+
+    for level in range(0, var.shape[1]):
+        valid = ~np.ma.getmaskarray(var[time, level, :, :])
+        result[valid] = level
+
+    return result
+
+
+def variables(variables, depth_dimensions):
+    """The names of the (time, depth, y, x) variables of a dataset, those
+    that have a bottom index map
+
+    Arguments:
+        variables -- the variables of the netCDF dataset
+        depth_dimensions -- the names of the depth dimensions
+    """
+    return [name for name, var in variables.items()
+            if len(var.dimensions) == 4 and
+            var.dimensions[1] in depth_dimensions]
+
+
+def _checksum(var):
+    """A checksum of the grid and land mask of a variable
+
+    Covers the shape of a time step, and the mask of the first one at
+    shared_store.CHECKSUM_SAMPLES points along each dimension, in one read.
+    """
+    step = tuple(
+        slice(None, None, max(1, -(-n // shared_store.CHECKSUM_SAMPLES)))
+        for n in var.shape[1:])
+
+    result = hashlib.sha1(repr(tuple(var.shape[1:])))
+    result.update(np.ascontiguousarray(
+        np.ma.getmaskarray(var[(0,) + step])).tobytes())
+
+    return result.hexdigest()
+
+
+def _path(url, name, var):
+    key = hashlib.sha1("%s|%s|%s" % (url, name, _checksum(var))).hexdigest()
+    return os.path.join(settings.get('CACHE_DIR'), 'bottom_index',
+                        key + '.npy')
+
+
+def load(url, name, var):
+    """Returns the bottom index map of a variable, memory mapped from the
+    local mirror or from CACHE_DIR if it has been computed before.
+
+    Maps are keyed by a checksum of the grid and land mask, see _checksum,
+    so a changed grid at the same url gets a new map.
+
+    Arguments:
+        url -- the dataset url
+        name -- the variable name
+        var -- the (time, depth, y, x) variable, sampled for the checksum
+               and only read in full if the map hasn't been computed yet
+    """
+    index = mirror.sidecar(url, 'bottom', name)
+    if index is not None and index.shape == tuple(var.shape[2:]):
+        return index
+
+    path = _path(url, name, var)
+
+    try:
+        index = np.load(path, mmap_mode='r')
+        if index.shape == tuple(var.shape[2:]):
+            return index
+    except (IOError, ValueError):
+        pass
+
+    index = bottom_index(var)
+    try:
+        shared_store.save(path, index)
+        return np.load(path, mmap_mode='r')
+    except (IOError, OSError):
+        return index
+
+
+def gather(var, time, index, miny, minx):
+    """Reads the bottom cell of each column of a slab
+
+    Only the levels that are the bottom of some column in the slab are read,
+    limited to the box around the columns that end there. Levels close
+    together are read in one slab, see _groups.
+
+    Arguments:
+        var -- a (time, depth, y, x) variable
+        time -- a time index, or a list of time indices
+        index -- the (y, x) bottom index map of the slab, -1 for land
+        miny, minx -- the index of the first point of the slab
+
+    Returns:
+        A masked array with the shape of index, preceded by the number of
+        times if time is a list
+    """
+    index = np.asarray(index)
+    shape = index.shape
+    if hasattr(time, "__len__"):
+        shape = (len(time),) + shape
+
+    result = np.ma.masked_all(shape, dtype=var.dtype)
+
+    for first, last, (y0, y1, x0, x1) in _groups(index):
+        box = read_plan.read(var, (time, slice(first, last + 1),
+                                   slice(miny + y0, miny + y1),
+                                   slice(minx + x0, minx + x1)))
+        box = np.ma.asarray(box).reshape(
+            shape[:-2] + (last - first + 1, y1 - y0, x1 - x0))
+
+        ys, xs = np.nonzero((index >= first) & (index <= last))
+        result[..., ys, xs] = box[..., index[ys, xs] - first,
+                                  ys - y0, xs - x0]
+
+    return result
+
+
+def _groups(index):
+    """Groups the bottom levels of a slab into the slabs to read
+
+    Each level is added to the group of the level above it if they are at
+    most LEVEL_GAP apart and reading the group as one slab at most doubles
+    the cells read.
+
+    Arguments:
+        index -- a (y, x) bottom index map, -1 for land
+
+    Returns:
+        A list of (first level, last level, (y0, y1, x0, x1))
+    """
+    groups = []
+    for level in np.unique(index[index >= 0]):
+        ys, xs = np.nonzero(index == level)
+        box = (np.amin(ys), np.amax(ys) + 1, np.amin(xs), np.amax(xs) + 1)
+        cells = (box[1] - box[0]) * (box[3] - box[2])
+
+        if groups and level - groups[-1][1] <= LEVEL_GAP:
+            first, last, union, total = groups[-1]
+            union = (min(union[0], box[0]), max(union[1], box[1]),
+                     min(union[2], box[2]), max(union[3], box[3]))
+            merged = (level - first + 1) * \
+                (union[1] - union[0]) * (union[3] - union[2])
+            if merged <= 2 * (total + cells):
+                groups[-1] = [first, level, union, total + cells]
+                continue
+
+        groups.append([level, level, box, cells])
+
+    return [tuple(g[:3]) for g in groups]
+
+
+def depth(depths, index):
+    """Maps a bottom index map to the depths of those levels
+
+    Arguments:
+        depths -- the depth of each level
+        index -- a bottom index map, -1 for land
+
+    Returns:
+        A masked array with the shape of index
+    """
+    index = np.asarray(index)
+
+    return np.ma.masked_array(np.asarray(depths)[np.clip(index, 0, None)],
+                              mask=index < 0)
@@ -0,0 +1,107 @@
+import contextlib
+import multiprocessing
+import os
+import threading
+import settings
+
+# Environment variables sizing the thread pools of the native libraries
+NATIVE_THREAD_VARIABLES = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+]
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def threads():
+    """The number of compute threads this process may use
+
+    COMPUTE_THREADS if it is set, otherwise the cores are shared evenly
+    between the COMPUTE_PROCESSES worker processes on the machine.
+    """
+    if settings.get('COMPUTE_THREADS'):
+        return max(1, int(settings.get('COMPUTE_THREADS')))
+
+    try:
+        cores = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cores = 1
+
+    return max(1, cores // max(1, int(settings.get('COMPUTE_PROCESSES'))))
+
+
+class Budget(object):
+
+    """A number of compute slots shared by the threads of a process
+
+    Each caller asks for as many slots as it can use and is granted between
+    one and that many, whatever is free, waiting until at least one is. An
+    idle process gives a single resample all of its threads, a busy one
+    gives every request one.
+
+    Arguments:
+        size -- the number of slots
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.free = size
+        self.__condition = threading.Condition()
+
+    def acquire(self, wanted=1):
+        with self.__condition:
+            while self.free == 0:
+                self.__condition.wait()
+
+            granted = max(1, min(wanted, self.free))
+            self.free -= granted
+
+            return granted
+
+    def release(self, granted):
+        with self.__condition:
+            self.free += granted
+            self.__condition.notify_all()
+
+
+def _get_budget():
+    global _budget
+    with _budget_lock:
+        size = threads()
+        if _budget is None or _budget.size != size:
+            _budget = Budget(size)
+
+        return _budget
+
+
+@contextlib.contextmanager
+def slots(wanted=None):
+    """Holds compute slots for the duration of a with block
+
+    Arguments:
+        wanted -- the number of threads the work can use, defaults to all
+                  of the process's threads
+
+    Yields:
+        The number of threads granted, e.g. for pyresample's nprocs
+    """
+    budget = _get_budget()
+    granted = budget.acquire(wanted or budget.size)
+    try:
+        yield granted
+    finally:
+        budget.release(granted)
+
+
+def limit_native_threads():
+    """Sizes the OpenMP and BLAS thread pools to the compute budget
+
+    Variables already in the environment are left alone. The pools read
+    them when they start, so this only applies to libraries that haven't
+    started theirs yet; set them before starting the server to cover the
+    rest.
+    """
+    for name in NATIVE_THREAD_VARIABLES:
+        os.environ.setdefault(name, str(threads()))
@@ -0,0 +1,270 @@
+import numpy as np
+import hashlib
+import grid_index
+import resampling
+
+EARTH_RADIUS = 6378137.0
+
+# Cells tried from the one at the nearest grid point before giving up
+WALK_STEPS = 8
+
+# Newton iterations inverting the bilinear map of a cell
+NEWTON_STEPS = 8
+
+# Fractional positions this far outside of [0, 1] still count as inside the
+# cell, so points on a shared edge are found in one of its cells
+TOLERANCE = 1e-6
+
+
+class CurvilinearGrid(object):
+
+    """Cell lookup and interpolation on a curvilinear grid, e.g. NEMO's ORCA
+
+    A point is located by starting at the cell of its nearest grid point,
+    from the KD tree, and walking to the neighbouring cell in the direction
+    of the point until its fractional position in the cell, from inverting
+    the bilinear map of the cell's corners, is in [0, 1]. Points that can't
+    be located are outside of the grid and are masked.
+
+    The weights to the target points are cached, per target grid and method,
+    so a tile or transect that has been seen before is just the weighted sum
+    of 4 grid points per point.
+
+    Arguments:
+        url -- the dataset url, part of the cache keys
+        name -- the name of the latitude variable
+        lat, lon -- the 2-D coordinates of the grid
+    """
+
+    def __init__(self, url, name, lat, lon):
+        self.url = url
+        self.name = name
+        self.lat = np.ma.getdata(lat)
+        self.lon = np.ma.getdata(lon)
+        self.__tree = grid_index.kdtree(url, name, self.lat, self.lon)
+
+    @property
+    def shape(self):
+        return self.lat.shape
+
+    def find_index(self, lat, lon, n=1):
+        """Finds the nearest grid points
+
+        Arguments:
+            lat, lon -- the query point(s)
+            n -- the number of grid points for each query point
+
+        Returns:
+            y, x -- the indices of the grid points
+            distance -- the distances to the grid points, in metres
+        """
+        dist, index = self.__tree.query(grid_index.to_xyz(lat, lon), k=n)
+        y, x = np.unravel_index(index, self.shape)
+
+        return y, x, dist * EARTH_RADIUS
+
+    def __corners(self, j, i):
+        """The xyz of the corners of the cells, (4, n, 3) in the order
+        (j, i), (j, i + 1), (j + 1, i), (j + 1, i + 1)
+        """
+        ys = [j, j, j + 1, j + 1]
+        xs = [i, i + 1, i, i + 1]
+
+        return np.array([
+            grid_index.to_xyz(self.lat[y, x], self.lon[y, x], np.float64)
+            for y, x in zip(ys, xs)
+        ])
+
+    @staticmethod
+    def __fractions(corners, point, east, north):
+        """Inverts the bilinear map of the cells for the points
+
+        The corners are projected on the plane tangent to the sphere at each
+        point, with the point at the origin.
+
+        Returns:
+            fy, fx -- the fractional position of each point in its cell
+        """
+        c = corners - point
+        p = np.stack([np.sum(c * east, axis=-1),
+                      np.sum(c * north, axis=-1)], axis=-1)
+        p00, p01, p10, p11 = p
+
+        u = np.full(len(point), 0.5)
+        v = np.full(len(point), 0.5)
+        for _ in range(NEWTON_STEPS):
+            uu = u[:, np.newaxis]
+            vv = v[:, np.newaxis]
+            f = (1 - uu) * (1 - vv) * p00 + uu * (1 - vv) * p01 + \
+                (1 - uu) * vv * p10 + uu * vv * p11
+            du = (1 - vv) * (p01 - p00) + vv * (p11 - p10)
+            dv = (1 - uu) * (p10 - p00) + uu * (p11 - p01)
+
+            det = du[:, 0] * dv[:, 1] - du[:, 1] * dv[:, 0]
+            det = np.where(det == 0, np.nan, det)
+            u = u - (f[:, 0] * dv[:, 1] - f[:, 1] * dv[:, 0]) / det
+            v = v - (du[:, 0] * f[:, 1] - du[:, 1] * f[:, 0]) / det
+
+        return v, u
+
+    def locate(self, lat, lon):
+        """Finds the cell containing each point
+
+        Arguments:
+            lat, lon -- the coordinates of the points, any shape
+
+        Returns:
+            j, i -- the index of the first corner of each point's cell
+            fy, fx -- the fractional position of each point in its cell
+            valid -- False for the points outside of the grid
+        """
+        lat = np.ravel(lat).astype(np.float64)
+        lon = np.ravel(lon).astype(np.float64)
+        point = grid_index.to_xyz(lat, lon, np.float64)
+        n = len(point)
+        ny, nx = self.shape
+
+        rlat = np.radians(lat)[:, np.newaxis]
+        rlon = np.radians(lon)[:, np.newaxis]
+        east = np.hstack((-np.sin(rlon), np.cos(rlon), np.zeros((n, 1))))
+        north = np.hstack((-np.sin(rlat) * np.cos(rlon),
+                           -np.sin(rlat) * np.sin(rlon),
+                           np.cos(rlat)))
+
+        dist, nearest = self.__tree.query(point.astype(np.float32), k=1)
+        j, i = np.unravel_index(np.ravel(nearest), self.shape)
+        j = np.clip(j, 0, ny - 2)
+        i = np.clip(i, 0, nx - 2)
+
+        fy = np.zeros(n)
+        fx = np.zeros(n)
+        valid = np.zeros(n, dtype=bool)
+        todo = np.arange(n)
+
+        for _ in range(WALK_STEPS):
+            if len(todo) == 0:
+                break
+
+            y, x = self.__fractions(self.__corners(j[todo], i[todo]),
+                                    point[todo], east[todo], north[todo])
+            inside = (y >= -TOLERANCE) & (y <= 1 + TOLERANCE) & \
+                (x >= -TOLERANCE) & (x <= 1 + TOLERANCE)
+
+            done = todo[inside]
+            valid[done] = True
+            fy[done] = np.clip(y[inside], 0, 1)
+            fx[done] = np.clip(x[inside], 0, 1)
+
+            # Walk towards the point, giving up at the edge of the grid
+            todo = todo[~inside]
+            y = y[~inside]
+            x = x[~inside]
+            step_j = np.where(y < 0, -1, np.where(y > 1, 1, 0))
+            step_i = np.where(x < 0, -1, np.where(x > 1, 1, 0))
+            new_j = np.clip(j[todo] + step_j, 0, ny - 2)
+            new_i = np.clip(i[todo] + step_i, 0, nx - 2)
+            moved = (new_j != j[todo]) | (new_i != i[todo])
+            j[todo] = new_j
+            i[todo] = new_i
+            todo = todo[moved]
+
+        return j, i, fy, fx, valid
+
+    def __weights(self, lat, lon, method, neighbours):
+        """The resampling.Neighbours into the flattened grid"""
+        j, i, fy, fx, valid = self.locate(lat, lon)
+        nx = self.shape[1]
+
+        if method == 'bilinear':
+            index = np.column_stack((j * nx + i, j * nx + i + 1,
+                                     (j + 1) * nx + i, (j + 1) * nx + i + 1))
+            weight = np.column_stack((
+                (1 - fy) * (1 - fx),
+                (1 - fy) * fx,
+                fy * (1 - fx),
+                fy * fx,
+            ))
+        elif method in ['nearest', 'idw']:
+            k = 1 if method == 'nearest' else neighbours
+            y, x, dist = self.find_index(lat, lon, k)
+            index = np.reshape(y * nx + x, (len(lat), k)).astype(np.int64)
+            weight = resampling.inverse_square(
+                np.reshape(dist, (len(lat), k)).astype(np.float64))
+        else:
+            raise ValueError("Unknown interpolation method: %s" % method)
+
+        return resampling.Neighbours(valid, index[valid], weight[valid])
+
+    def neighbours(self, lat, lon, offset=(0, 0), shape=None,
+                   method='bilinear', neighbours=10):
+        """Finds the grid points and weights to interpolate to points
+
+        The weights into the whole grid are cached per set of points and
+        method, the slab is applied on top of those.
+
+        Arguments:
+            lat, lon -- the target points
+            offset -- the (y, x) index of the first point of the slab the
+                      weights will be applied to
+            shape -- the (y, x) shape of that slab, defaults to the rest of
+                     the grid
+            method -- 'bilinear', 'nearest', or 'idw' for inverse square
+                      distance weighting of the nearest grid points
+            neighbours -- the number of grid points for 'idw'
+
+        Returns:
+            A resampling.Neighbours with indices into the flattened slab.
+            Grid points outside of the slab get no weight.
+        """
+        if shape is None:
+            shape = (self.shape[0] - offset[0], self.shape[1] - offset[1])
+
+        h = hashlib.sha1()
+        h.update("%s|%s|%s|%s|%d|" % (self.url, self.name, self.shape,
+                                      method, neighbours))
+        for a in [lat, lon]:
+            h.update(np.ascontiguousarray(np.ravel(a),
+                                          dtype=np.float64).tobytes())
+
+        info = resampling.cached(
+            h.hexdigest(),
+            lambda: self.__weights(np.ravel(lat), np.ravel(lon), method,
+                                   neighbours))
+
+        ys, xs = np.divmod(info.index, self.shape[1])
+        ys = ys - offset[0]
+        xs = xs - offset[1]
+        inside = (ys >= 0) & (ys < shape[0]) & (xs >= 0) & (xs < shape[1])
+        weight = np.where(inside, info.weight, 0)
+        index = np.where(inside, ys * shape[1] + xs, 0)
+
+        used = weight.sum(axis=1) > 0
+        found = info.valid_output.copy()
+        found[found] = used
+
+        return resampling.Neighbours(found, index[used], weight[used])
+
+    def interpolate(self, data, lat, lon, offset=(0, 0), method='bilinear',
+                    neighbours=10):
+        """Interpolates a slab of the grid to the target points
+
+        Arguments:
+            data -- a (y, x, ...) slab of the grid, trailing dimensions are
+                    interpolated together as channels
+            lat, lon -- the target points
+            offset -- the (y, x) index of the first point of the slab
+            method -- 'bilinear', 'nearest' or 'idw'
+            neighbours -- the number of grid points for 'idw'
+
+        Returns:
+            A masked array with the shape of lat followed by the trailing
+            dimensions of data
+        """
+        info = self.neighbours(lat, lon, offset, data.shape[:2], method,
+                               neighbours)
+        channels = data.shape[2:]
+
+        output = info.apply(
+            np.ma.asarray(data).reshape((data.shape[0] * data.shape[1], -1)))
+
+        return output.reshape(np.shape(lat) + channels)
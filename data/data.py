@@ -1,6 +1,7 @@
 import abc
 import numpy as np
 import geo
+import overview
 
 __author__ = 'Geoff Holden'
 
@@ -10,6 +11,10 @@ class Data(object):
     """Abstract base class for data access"""
     __metaclass__ = abc.ABCMeta
 
+    # Whether get_profile over a list of times returns the depths of each
+    # time, with the times in their last axis, rather than one set of depths
+    profile_depths_by_time = False
+
     def __init__(self, url):
         self.url = url
 
@@ -23,7 +28,13 @@ class Data(object):
 
     @abc.abstractmethod
     def get_point(self, latitude, longitude, depth, time, variable,
-                  return_depth=False):
+                  return_depth=False, resolution=None):
+        """Reads a variable at some points
+
+        resolution is the spacing of the points in metres, if they are a
+        grid. Backends that can may read a coarser version of the data for
+        points far apart.
+        """
         pass
 
     @abc.abstractmethod
@@ -50,6 +61,10 @@ class Data(object):
     def get_raw_point(self, latitude, longitude, depth, time, variable):
         pass
 
+    def preload(self):
+        """Loads the static coordinates and spatial indexes of the dataset"""
+        pass
+
     def get_path(self, path, depth, time, variable, numpoints=100, times=None,
                  return_depth=False):
         if times is None:
@@ -78,17 +93,39 @@ class Data(object):
         return np.array([lat, lon]), distances, result.transpose(), depth
 
     def get_area(self, area, depth, time, variable, return_depth=False):
+        """Reads a variable over a grid of points
+
+        Arguments:
+            area -- a (2, ...) array of the latitudes and longitudes
+            variable -- a variable key, or a list of them to read together,
+                        in which case a list of the results is returned
+
+        The grid may be read at a lower resolution when its points are far
+        apart, e.g. for a tile of the whole domain.
+
+        Returns:
+            The data in the shape of the grid, and the depths if
+            return_depth is set
+        """
         latitude = area[0, :].ravel()
         longitude = area[1, :].ravel()
+        resolution = overview.spacing(area[0], area[1])
 
-        if return_depth:
-            a, d = self.get_point(latitude, longitude, depth, time, variable,
-                                  return_depth=return_depth)
-            return np.reshape(a, area.shape[1:]), np.reshape(d, area.shape[1:])
+        def reshape(result):
+            if return_depth:
+                return np.reshape(result[0], area.shape[1:]), \
+                    np.reshape(result[1], area.shape[1:])
+            else:
+                return np.reshape(result, area.shape[1:])
+
+        result = self.get_point(latitude, longitude, depth, time, variable,
+                                return_depth=return_depth,
+                                resolution=resolution)
+
+        if isinstance(variable, list):
+            return [reshape(r) for r in result]
         else:
-            a = self.get_point(latitude, longitude, depth, time, variable,
-                               return_depth=return_depth)
-            return np.reshape(a, area.shape[1:])
+            return reshape(result)
 
     def get_timeseries_point(self, latitude, longitude, depth, starttime,
                              endtime, variable, return_depth=False):
@@ -105,6 +142,9 @@ class Data(object):
 
 class Variable(object):
 
+    __slots__ = ('_key', '_name', '_unit', '_dimensions', '_valid_min',
+                 '_valid_max')
+
     def __init__(self, key, name, unit, dimensions, valid_min=None,
                  valid_max=None):
         self._key = key
@@ -154,12 +194,28 @@ class Variable(object):
 
 class VariableList(list):
 
+    """A list of Variables that can also be indexed by variable key
+
+    Lookups by key go through a dict that is rebuilt whenever the list is
+    modified.
+    """
+
+    def __init__(self, *args):
+        super(VariableList, self).__init__(*args)
+        self._reindex()
+
+    def _reindex(self):
+        index = {}
+        for v in self:
+            index.setdefault(v.key, v)
+        self._index = index
+
     def __getitem__(self, pos):
         if isinstance(pos, basestring):
-            for v in self:
-                if v.key == pos:
-                    return v
-            raise IndexError("%s not found in variable list" % pos)
+            try:
+                return self._index[pos]
+            except KeyError:
+                raise IndexError("%s not found in variable list" % pos)
         elif isinstance(pos, Variable):
             return self[pos.key]
         else:
@@ -167,9 +223,23 @@ class VariableList(list):
 
     def __contains__(self, key):
         if isinstance(key, basestring):
-            for v in self:
-                if v.key == key:
-                    return True
-            return False
+            return key in self._index
         else:
             return super(VariableList, self).__contains__(key)
+
+
+def _reindexing(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        result = method(self, *args)
+        self._reindex()
+        return result
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ['append', 'extend', 'insert', 'remove', 'pop', '__setitem__',
+              '__delitem__', '__setslice__', '__delslice__', '__iadd__']:
+    setattr(VariableList, _name, _reindexing(_name))
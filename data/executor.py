@@ -0,0 +1,136 @@
+import Queue
+import os
+import sys
+import threading
+import settings
+
+# netCDF4 releases the GIL while it reads, but the HDF5 library it is built
+# against isn't built thread-safe and keeps global state, so local files,
+# mirrors and NcML aggregations are read by one thread at a time, whichever
+# the file. OPeNDAP reads go through their own handles and overlap.
+_local_lock = threading.RLock()
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+_workers = None
+_workers_lock = threading.Lock()
+_thread = threading.local()
+
+
+def _is_local(url):
+    return url is not None and not url.startswith('http')
+
+
+def _semaphore(url):
+    """The semaphore bounding the concurrent reads of a dataset"""
+    with _semaphores_lock:
+        if url not in _semaphores:
+            _semaphores[url] = threading.BoundedSemaphore(
+                settings.get('FETCH_DATASET_THREADS'))
+
+        return _semaphores[url]
+
+
+def _read(dataset, read):
+    _thread.reading = getattr(_thread, 'reading', 0) + 1
+    try:
+        if _is_local(dataset.url):
+            with _local_lock:
+                with dataset:
+                    return read(dataset)
+
+        with dataset:
+            return read(dataset)
+    finally:
+        _thread.reading -= 1
+
+
+def _run(dataset, read):
+    with _semaphore(dataset.url):
+        return _read(dataset, read)
+
+
+class _Workers(object):
+
+    """The threads that run the reads of every batch
+
+    Created on first use in each process, threads don't survive a fork.
+    """
+
+    def __init__(self, size):
+        self.pid = os.getpid()
+        self.tasks = Queue.Queue()
+        for _ in range(size):
+            t = threading.Thread(target=self.__work)
+            t.daemon = True
+            t.start()
+
+    def __work(self):
+        while True:
+            self.tasks.get()()
+
+
+def _get_workers():
+    global _workers, _semaphores
+    with _workers_lock:
+        if _workers is None or _workers.pid != os.getpid():
+            _workers = _Workers(settings.get('FETCH_THREADS'))
+            with _semaphores_lock:
+                _semaphores = {}
+
+        return _workers
+
+
+def fetch(requests):
+    """Runs a batch of reads concurrently
+
+    The reads run on a pool of FETCH_THREADS threads shared by every batch,
+    with at most FETCH_DATASET_THREADS of them reading from one dataset at a
+    time. Each thread gets its own pooled handle of the dataset, so reads
+    that wait on OPeNDAP overlap. Reads of local files are serialized, see
+    _local_lock. A batch fetched from within a read runs in the thread of
+    that read.
+
+    Arguments:
+        requests -- a list of (dataset, read), dataset being a Data, e.g.
+                    from open_dataset, and read a function of the open
+                    dataset, e.g. lambda d: d.get_area(area, 0, t, 'u')
+
+    Returns:
+        The results of the reads, in the order of the requests. If any of
+        them raised, the exception of the first one is raised once all of
+        the reads are done.
+    """
+    # The thread of a read already holds its limits, waiting on other
+    # threads from there could deadlock
+    if getattr(_thread, 'reading', 0):
+        return [_read(dataset, read) for dataset, read in requests]
+
+    if len(requests) <= 1:
+        return [_run(dataset, read) for dataset, read in requests]
+
+    results = [None] * len(requests)
+    errors = [None] * len(requests)
+    done = threading.Semaphore(0)
+
+    def task(i):
+        dataset, read = requests[i]
+        try:
+            results[i] = _run(dataset, read)
+        except Exception:
+            errors[i] = sys.exc_info()
+        finally:
+            done.release()
+
+    workers = _get_workers()
+    for i in range(len(requests)):
+        workers.tasks.put(lambda i=i: task(i))
+    for _ in requests:
+        done.acquire()
+
+    for error in errors:
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    return results
@@ -1,15 +1,12 @@
-from pykdtree.kdtree import KDTree
-import pyresample
 import numpy as np
-import warnings
 import netcdf_data
 from pint import UnitRegistry
-from data import Variable, VariableList
-from netCDF4 import chartostring
-import pytz
-from cachetools import TTLCache
-import dateutil.parser
-import re
+import grid_index
+import shared_store
+import mesh
+import read_plan
+import timestamps
+import vertical
 
 RAD_FACTOR = np.pi / 180.0
 EARTH_RADIUS = 6378137.0
@@ -19,6 +16,9 @@ ureg = UnitRegistry()
 class Fvcom(netcdf_data.NetCDFData):
     __depths = None
 
+    # The depths of the sigma levels move with zeta
+    profile_depths_by_time = True
+
     @property
     def depth_dimensions(self):
         return ['siglev', 'siglay']
@@ -31,58 +31,14 @@ class Fvcom(netcdf_data.NetCDFData):
 
         return self.__depths
 
-    @property
-    def timestamps(self):
-        if self.__timestamp_cache.get("timestamps") is None:
-            for v in ['Times']:
-                if v in self._dataset.variables:
-                    var = self._dataset.variables[v]
-                    break
-
-            tz = pytz.timezone(var.time_zone)
-            timestamps = np.array(
-                map(
-                    lambda datestr:
-                    dateutil.parser.parse(datestr).replace(tzinfo=tz),
-                    chartostring(var[:])
-                )
-            )
-            timestamps.flags.writeable = False
-            self.__timestamp_cache["timestamps"] = timestamps
-
-        return self.__timestamp_cache.get("timestamps")
-
-    @property
-    def variables(self):
-        l = []
-        for name in self._dataset.variables:
-            var = self._dataset.variables[name]
-            if 'coordinates' not in var.ncattrs():
-                continue
-
-            if 'long_name' in var.ncattrs():
-                long_name = var.long_name
-            else:
-                long_name = name
-
-            if 'units' in var.ncattrs():
-                units = var.units
-            else:
-                units = None
-
-            if 'valid_min' in var.ncattrs():
-                valid_min = float(re.sub(r"[^0-9\.\+,eE]", "",
-                                         str(var.valid_min)))
-                valid_max = float(re.sub(r"[^0-9\,\+,eE]", "",
-                                         str(var.valid_max)))
-            else:
-                valid_min = None
-                valid_max = None
+    def _time_variable(self):
+        return self._dataset.variables.get('Times')
 
-            l.append(Variable(name, long_name, units, var.dimensions,
-                              valid_min, valid_max))
+    def _time_decoder(self, var):
+        return timestamps.string_decoder(var.time_zone)
 
-        return VariableList(l)
+    def _include_variable(self, var):
+        return 'coordinates' in var.ncattrs()
 
     def __find_var(self, candidates):
         for c in candidates:
@@ -94,149 +50,78 @@ class Fvcom(netcdf_data.NetCDFData):
     def __find_index(self, lat, lon, element=False, n=10):
         index = int(element)
 
-        if element:
-            latvar = self._dataset.variables['latc']
-            lonvar = self._dataset.variables['lonc']
-        else:
-            latvar = self._dataset.variables['lat']
-            lonvar = self._dataset.variables['lon']
-
         if self._kdt[index] is None:
-            latvals = latvar[:] * RAD_FACTOR
-            lonvals = lonvar[:] * RAD_FACTOR
-            clat, clon = np.cos(latvals), np.cos(lonvals)
-            slat, slon = np.sin(latvals), np.sin(lonvals)
-            triples = np.array(list(zip(np.ravel(clat * clon),
-                                        np.ravel(clat * slon),
-                                        np.ravel(slat))))
-            self._kdt[index] = KDTree(triples)
-            del clat, clon
-            del slat, slon
-            del triples
-
-        if not hasattr(lat, "__len__"):
-            lat = [lat]
-            lon = [lon]
-
-        lat = np.array(lat)
-        lon = np.array(lon)
-
-        lat_rad = lat * RAD_FACTOR
-        lon_rad = lon * RAD_FACTOR
-        clat, clon = np.cos(lat_rad), np.cos(lon_rad)
-        slat, slon = np.sin(lat_rad), np.sin(lon_rad)
-        q = np.array([clat * clon, clat * slon, slat]).transpose()
-
-        dist_sq_min, minindex_1d = self._kdt[index].query(np.float32(q), k=n)
-        return np.squeeze(minindex_1d), dist_sq_min * EARTH_RADIUS
-
-    def __bounding_box(self, lat, lon, element=False, n=10):
-        index, d = self.__find_index(lat, lon, element, n)
-
-        def fix_limits(data, limit):
-            mx = np.amax(data)
-            mn = np.amin(data)
-            d = mx - mn
-
-            if d < 2:
-                mn -= 2
-                mx += 2
+            if element:
+                latname, lonname = 'latc', 'lonc'
+            else:
+                latname, lonname = 'lat', 'lon'
 
-            mn = int(mn - d / 4.0)
-            mx = int(mx + d / 4.0)
+            self._kdt[index] = grid_index.kdtree(
+                self.url, latname,
+                self.__coordinate(latname), self.__coordinate(lonname))
 
-            mn = np.clip(mn, 0, limit)
-            mx = np.clip(mx, 0, limit)
+        q = grid_index.to_xyz(lat, lon)
 
-            return mn, mx
+        dist_sq_min, minindex_1d = self._kdt[index].query(q, k=n)
+        return np.squeeze(minindex_1d), dist_sq_min * EARTH_RADIUS
 
-        if element:
-            latvar = self._dataset.variables['latc']
-        else:
-            latvar = self._dataset.variables['lat']
-        mini, maxi = fix_limits(index, latvar.shape)
+    def __coordinate(self, name):
+        if self._coords.get(name) is None:
+            var = self._dataset.variables[name]
+            self._coords[name] = shared_store.get_or_create(
+                self.url, name, lambda: var[:], [var])
 
-        return mini[0], maxi[0], np.clip(np.amax(d), 5000, 50000)
+        return self._coords[name]
 
     def __latlon_vars(self, data_var):
         var = self._dataset.variables[data_var]
         if 'latc' in var.coordinates:
-            latvar = self._dataset.variables['latc']
-            lonvar = self._dataset.variables['lonc']
+            return self.__coordinate('latc'), self.__coordinate('lonc')
         else:
-            latvar = self._dataset.variables['lat']
-            lonvar = self._dataset.variables['lon']
+            return self.__coordinate('lat'), self.__coordinate('lon')
 
-        return latvar, lonvar
+    def __mesh(self):
+        if self._mesh is None:
+            self._mesh = mesh.TriangleMesh(
+                self.url,
+                self.__coordinate('lat'), self.__coordinate('lon'),
+                self.__coordinate('nv'),
+                self.__coordinate('latc'), self.__coordinate('lonc'))
 
-    def __resample(self, lat_in, lon_in, lat_out, lon_out, var, radius=50000):
-        if len(var.shape) == 2:
-            var = np.rollaxis(var, 0, 2)
-        elif len(var.shape) == 3:
-            var = np.rollaxis(var, 0, 3)
-            var = np.rollaxis(var, 0, 3)
-
-        origshape = var.shape
-        var = var.reshape([var.shape[0], -1])
-
-        def weight(r):
-            r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
-            return 1. / r ** 2
-
-        data = np.squeeze(var[:])
+        return self._mesh
 
-        masked_lon_in = np.ma.array(lon_in)
-        masked_lat_in = np.ma.array(lat_in)
-
-        output_def = pyresample.geometry.SwathDefinition(
-            lons=np.ma.array(lon_out),
-            lats=np.ma.array(lat_out)
-        )
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-
-            if len(data.shape) == 2 and data.shape[1] != 1:
-                output = []
-                # multiple depths
-                for d in range(0, data.shape[1]):
-                    masked_lon_in.mask = masked_lat_in.mask = \
-                        data[:, d].view(np.ma.MaskedArray).mask
-                    input_def = pyresample.geometry.SwathDefinition(
-                        lons=masked_lon_in,
-                        lats=masked_lat_in
-                    )
-                    output.append(pyresample.kd_tree.resample_custom(
-                        input_def, data[:, d], output_def,
-                        radius_of_influence=float(radius),
-                        neighbours=10,
-                        weight_funcs=weight,
-                        fill_value=None, nprocs=4
-                    ))
-
-                output = np.ma.array(output).transpose()
-            else:
-                masked_lon_in.mask = masked_lat_in.mask = \
-                    var[:].view(np.ma.MaskedArray).mask
-                input_def = pyresample.geometry.SwathDefinition(
-                    lons=masked_lon_in,
-                    lats=masked_lat_in
-                )
-                output = pyresample.kd_tree.resample_custom(
-                    input_def, data, output_def,
-                    radius_of_influence=float(radius),
-                    neighbours=10,
-                    weight_funcs=weight,
-                    fill_value=None, nprocs=4
-                )
-
-        if len(origshape) == 3:
-            output = output.reshape(origshape[1:])
-
-        return np.squeeze(output)
+    def __mode(self, variable):
+        if 'nele' in self._dataset.variables[variable].dimensions:
+            return 'element'
+        else:
+            return 'node'
+
+    def __neighbours(self, latitude, longitude, mode):
+        """Locates the points in the mesh
+
+        Returns:
+            points -- the nodes, or elements, to read
+            neighbours -- the resampling.Neighbours into those
+        """
+        return mesh.compact(
+            self.__mesh().neighbours(latitude, longitude, mode))
+
+    @staticmethod
+    def __interpolate(neighbours, data):
+        """Interpolates data with the nodes, or elements, in the last
+        dimension to the points of neighbours.
+        """
+        data = np.rollaxis(np.ma.asarray(data), -1, 0)
+        shape = data.shape
+        output = neighbours.apply(
+            data.reshape((shape[0], int(np.prod(shape[1:])))))
+
+        return np.squeeze(output.reshape((-1,) + shape[1:]))
 
     def __init__(self, url):
         self._kdt = [None, None]
-        self.__timestamp_cache = TTLCache(1, 3600)
+        self._coords = {}
+        self._mesh = None
         super(Fvcom, self).__init__(url)
 
     def __enter__(self):
@@ -244,72 +129,67 @@ class Fvcom(netcdf_data.NetCDFData):
 
         return self
 
-    def get_raw_point(self, latitude, longitude, depth, time, variable):
-        min_i, max_i, radius = self.__bounding_box(
-            latitude, longitude, False, 10)
+    def preload(self):
+        self.__find_index(0, 0, False)
+        self.__mesh()
 
-        if not hasattr(latitude, "__len__"):
-            latitude = np.array([latitude])
-            longitude = np.array([longitude])
+    def get_raw_point(self, latitude, longitude, depth, time, variable):
+        element = self.__mode(variable) == 'element'
+        index, d = self.__find_index(latitude, longitude, element, 10)
+        points = np.unique(index)
 
-        var = self._dataset.variables[variable]
+        var = self._variable(variable)
         latvar, lonvar = self.__latlon_vars(variable)
 
         if depth == 'bottom':
             depth = -1
 
-        if len(var.shape) == 3:
-            data = var[time, depth, min_i:max_i]
+        if len(var.shape) == 3 and vertical.is_metres(depth):
+            data = self.__at_depth(variable, time, depth, points)
+        elif len(var.shape) == 3:
+            data = read_plan.gather(var, (time, depth), points)
         else:
-            data = var[time, min_i:max_i]
+            data = read_plan.gather(var, (time,), points)
 
         return (
-            latvar[min_i:max_i],
-            lonvar[min_i:max_i],
+            latvar[points],
+            lonvar[points],
             data
         )
 
     def get_point(self, latitude, longitude, depth, time, variable,
-                  return_depth=False):
-        var = self._dataset.variables[variable]
-        latvar, lonvar = self.__latlon_vars(variable)
+                  return_depth=False, resolution=None):
+        if isinstance(variable, list):
+            # The mesh neighbours are cached, the variables share them
+            return [self.get_point(latitude, longitude, depth, time, v,
+                                   return_depth, resolution)
+                    for v in variable]
 
-        min_i, max_i, radius = self.__bounding_box(
-            latitude, longitude,
-            'nele' in self._dataset.variables[variable].dimensions,
-            10
-        )
+        var = self._variable(variable)
 
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
+        points, neighbours = self.__neighbours(
+            latitude, longitude, self.__mode(variable))
+
         if depth == 'bottom':
             depth = -1
 
-        if len(var.shape) == 3:
-            data = var[time, depth, min_i:max_i]
+        if len(var.shape) == 3 and vertical.is_metres(depth):
+            data = self.__at_depth(variable, time, depth, points)
+        elif len(var.shape) == 3:
+            data = read_plan.gather(var, (time, depth), points)
         else:
-            data = var[time, min_i:max_i]
-
-        res = self.__resample(
-            latvar[min_i:max_i],
-            lonvar[min_i:max_i],
-            latitude, longitude,
-            data,
-            radius
-        )
+            data = read_plan.gather(var, (time,), points)
 
-        if return_depth:
-            d = self.__get_depths(variable, time, min_i, max_i)
+        res = self.__interpolate(neighbours, data)
 
-            res_d = self.__resample(
-                latvar[min_i:max_i],
-                lonvar[min_i:max_i],
-                latitude, longitude,
-                d,
-                radius
-            )
+        if return_depth and vertical.is_metres(depth):
+            return res, np.full(np.shape(res), depth)
+        elif return_depth:
+            res_d = self.__get_depths(variable, time, latitude, longitude)
 
             if len(latitude) > 1:
                 dep = res_d[:, depth]
@@ -320,103 +200,125 @@ class Fvcom(netcdf_data.NetCDFData):
         else:
             return res
 
-    def __get_depths(self, variable, time, min_i, max_i):
+    def __sigma(self, name):
+        """The static part of the depths of the levels, per mesh
+
+        Returns:
+            sigma -- the sigma coordinates of the levels, (nlev, node)
+            static -- sigma * h, the depths for a surface at 0
+        """
+        sigma = self.__coordinate(name)
+        static = shared_store.get_or_create(
+            self.url, name + '_h',
+            lambda: np.ma.getdata(sigma) * np.ma.getdata(
+                self.__coordinate('h')),
+            [self._dataset.variables[name], self._dataset.variables['h']])
+
+        return sigma, static
+
+    def __get_depths(self, variable, time, latitude, longitude):
+        """The depths of the levels of a variable at some points
+
+        The depths are computed on the nodes and interpolated to the points,
+        for element variables they are averaged over the element. Only zeta
+        is read, sigma * h is computed once per mesh.
+        """
         var = self._dataset.variables[variable]
-
-        if 'nele' in var.dimensions:
-            # First, find indicies to cover the nodes
-            nv = self._dataset.variables['nv'][:, min_i:max_i]
-            min_n, max_n = np.amin(nv), np.amax(nv)
-
-            if 'siglay' in var.dimensions:
-                sigma_var = 'siglay'
-            elif 'siglev' in var.dimensions:
-                sigma_var = 'siglev'
-            else:
-                return np.zeros(max_i - min_i)
-
-            radius = 50000
-
-            lat_in = self._dataset.variables['lat'][min_n:max_n]
-            lon_in = self._dataset.variables['lon'][min_n:max_n]
-            lat_out = self._dataset.variables['latc'][min_i:max_i]
-            lon_out = self._dataset.variables['lonc'][min_i:max_i]
-
-            sigma = self.__resample(
-                lat_in, lon_in,
-                lat_out, lon_out,
-                self._dataset.variables[sigma_var][:, min_n:max_n],
-                radius
-            ).transpose()
-            bath = self.__resample(
-                lat_in, lon_in,
-                lat_out, lon_out,
-                self._dataset.variables['h'][min_n:max_n],
-                radius
-            )
-            surf = self.__resample(
-                lat_in, lon_in,
-                lat_out, lon_out,
-                self._dataset.variables['zeta'][time, min_n:max_n],
-                radius
-            ).transpose()
-
-            if hasattr(time, "__len__"):
-                sigma = np.tile(sigma, (len(time), 1, 1))
-                sigma = np.rollaxis(sigma, 1, 0)
-
-            z = -1 * (sigma * (bath + surf) + surf)
-            return z
+        mode = 'centre' if 'nele' in var.dimensions else 'node'
+        points, neighbours = self.__neighbours(latitude, longitude, mode)
+
+        levels = [d for d in ['siglay', 'siglev'] if d in var.dimensions]
+        if not levels:
+            return self.__interpolate(neighbours, np.zeros(len(points)))
+
+        return self.__interpolate(
+            neighbours, self.__column_depths(levels[0], time, points))
+
+    def __column_depths(self, name, time, nodes):
+        """The depths of the levels at some nodes
+
+        Returns:
+            (nlev, nodes), or (nlev, time, nodes) for a list of times
+        """
+        sigma, static = self.__sigma(name)
+        sigma = np.ma.getdata(sigma)[:, nodes]
+        static = static[:, nodes]
+        surf = read_plan.gather(self._variable('zeta'), (time,), nodes)
+
+        if hasattr(time, "__len__"):
+            sigma = sigma[:, np.newaxis, :]
+            static = static[:, np.newaxis, :]
+
+        # z = -(sigma * (h + zeta) + zeta)
+        return -1 * (static + (sigma + 1) * surf)
+
+    def __at_depth(self, variable, time, depth, points):
+        """Reads a variable on sigma levels at a depth in metres
+
+        The depths of the levels of each column come from zeta and the
+        cached sigma * h, element columns taking the mean of their nodes.
+        Each level is only read at the columns that have it above or below
+        the depth, so every column reads two levels.
+
+        Arguments:
+            points -- the nodes, or elements, to read
+
+        Returns:
+            (points,), or (time, points) for a list of times
+        """
+        var = self._variable(variable)
+        dimensions = self._dataset.variables[variable].dimensions
+        name = [d for d in ['siglay', 'siglev'] if d in dimensions][0]
+
+        if 'nele' in dimensions:
+            corners = self.__mesh().nodes[points]
+            nodes, inverse = np.unique(corners, return_inverse=True)
+            z = self.__column_depths(name, time, nodes)[..., inverse]
+            z = z.reshape(z.shape[:-1] + corners.shape).mean(axis=-1)
         else:
-            if 'siglay' in var.dimensions:
-                sigma = self._dataset.variables['siglay'][:, min_i:max_i]
-            elif 'siglev' in var.dimensions:
-                sigma = self._dataset.variables['siglev'][:, min_i:max_i]
-            else:
-                return np.array([0] * (max_i - min_i))
-
-            bath = self._dataset.variables['h'][min_i:max_i]
-            surf = self._dataset.variables['zeta'][time, min_i:max_i]
-
-            if hasattr(time, "__len__"):
-                sigma = np.tile(sigma, (len(time), 1, 1))
-                sigma = np.rollaxis(sigma, 1, 0)
-
-            z = -1 * (sigma * (bath + surf) + surf)
-            return z
+            z = self.__column_depths(name, time, points)
+
+        upper, lower, weight, valid = vertical.bracket(z, depth)
+        shape = upper.shape
+        upper, lower, weight, valid = [
+            np.reshape(a, (int(np.prod(shape[:-1])), len(points)))
+            for a in [upper, lower, weight, valid]
+        ]
+        lower_used = valid & (weight > 0)
+
+        above = np.ma.masked_all(upper.shape, dtype=var.dtype)
+        below = np.ma.masked_all(upper.shape, dtype=var.dtype)
+        for level in np.unique(np.concatenate([upper[valid],
+                                               lower[lower_used]])):
+            used = (valid & (upper == level)) | (lower_used & (lower == level))
+            columns = np.flatnonzero(np.any(used, axis=0))
+            values = np.ma.asarray(read_plan.gather(
+                var, (time, int(level)), points[columns]
+            )).reshape((-1, len(columns)))
+
+            for result, index in [(above, upper), (below, lower)]:
+                hit = index[:, columns] == level
+                block = result[:, columns]
+                block[hit] = values[hit]
+                result[:, columns] = block
+
+        result = vertical.combine(above, below, weight)
+        result[~valid] = np.ma.masked
+
+        return result.reshape(shape)
 
     def get_profile(self, latitude, longitude, time, variable):
-        latvar, lonvar = self.__latlon_vars(variable)
-
-        min_i, max_i, radius = self.__bounding_box(
-            latitude, longitude,
-            'nele' in self._dataset.variables[variable].dimensions,
-            10
-        )
-
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        data = self._dataset.variables[variable][time, :, min_i:max_i]
-        res = self.__resample(
-            latvar[min_i:max_i],
-            lonvar[min_i:max_i],
-            [latitude], [longitude],
-            data,
-            radius
-        )
-
-        d = self.__get_depths(variable, time, min_i, max_i)
+        points, neighbours = self.__neighbours(
+            latitude, longitude, self.__mode(variable))
 
-        res_d = self.__resample(
-            latvar[min_i:max_i],
-            lonvar[min_i:max_i],
-            [latitude], [longitude],
-            d,
-            radius
-        )
+        data = read_plan.gather(self._variable(variable),
+                                (time, slice(None)), points)
+        res = self.__interpolate(neighbours, data)
 
-        dep = res_d
+        dep = self.__get_depths(variable, time, latitude, longitude)
 
         return res, dep
@@ -0,0 +1,81 @@
+from pykdtree.kdtree import KDTree
+import numpy as np
+import hashlib
+import os
+import settings
+import shared_store
+
+RAD_FACTOR = np.pi / 180.0
+
+
+def to_xyz(lat, lon, dtype=np.float32):
+    """Converts latitude and longitude to unit-sphere cartesian triples
+
+    Arguments:
+        lat -- latitude(s) in degrees, any shape
+        lon -- longitude(s) in degrees, same shape as lat
+        dtype -- the type of the result
+
+    Returns:
+        An (n, 3) array, where n is the number of input points
+    """
+    lat_rad = np.ravel(lat) * RAD_FACTOR
+    lon_rad = np.ravel(lon) * RAD_FACTOR
+    clat = np.cos(lat_rad)
+
+    return np.column_stack((
+        clat * np.cos(lon_rad),
+        clat * np.sin(lon_rad),
+        np.sin(lat_rad),
+    )).astype(dtype)
+
+
+def index_key(url, name, lat, lon):
+    """The cache key of the triples of a grid
+
+    Hashing the full arrays costs about as much as converting them, so the
+    key covers their shapes and samples, see shared_store.checksum.
+    """
+    return hashlib.sha1(
+        "%s|%s|%s" % (url, name, shared_store.checksum(lat, lon))
+    ).hexdigest()
+
+
+def _index_path(key):
+    return os.path.join(settings.get('CACHE_DIR'), 'grid_index',
+                        key + '.npy')
+
+
+def load_triples(url, name, lat, lon):
+    """Returns the xyz triples for a grid, memory mapped from CACHE_DIR
+    if they've been built before.
+    """
+    lat = np.ma.getdata(lat)
+    lon = np.ma.getdata(lon)
+    path = _index_path(index_key(url, name, lat, lon))
+
+    try:
+        triples = np.load(path, mmap_mode='r')
+        if triples.shape == (np.size(lat), 3):
+            return triples
+    except (IOError, ValueError):
+        pass
+
+    triples = to_xyz(lat, lon)
+    try:
+        shared_store.save(path, triples)
+        return np.load(path, mmap_mode='r')
+    except (IOError, OSError):
+        return triples
+
+
+def kdtree(url, name, lat, lon):
+    """Builds a KDTree over the points of a grid
+
+    Arguments:
+        url -- the dataset url, used as part of the cache key
+        name -- the name of the coordinate variable
+        lat -- the latitude array of the grid
+        lon -- the longitude array of the grid
+    """
+    return KDTree(load_triples(url, name, lat, lon))
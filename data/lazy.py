@@ -0,0 +1,171 @@
+import numpy as np
+from data import Data
+import settings
+import vertical
+
+
+# Grid points read around each point, for the size of the slab of a time
+POINT_SOURCES = 64
+
+
+def _chunks(n, size):
+    """Splits n entries into even chunks of about size entries
+
+    No chunk is a single entry, which the backends would squeeze away.
+    """
+    count = max(1, min(-(-n // max(size, 1)), n // 2))
+    bounds = np.linspace(0, n, count + 1).astype(int)
+
+    return zip(bounds[:-1], bounds[1:])
+
+
+class LazyData(Data):
+
+    """Streams reads over many times in chunks of bounded memory
+
+    Wraps another Data. Reads of a list of times are split into chunks of
+    times, each one read and resampled on its own, so only the input of one
+    chunk is in memory at a time and not the slab of every time. The chunk
+    size is chosen so the slabs around the points for the chunk would fit
+    in LAZY_MEMORY_LIMIT bytes, see __chunk_size, so reads of a few points
+    aren't split. The results of the chunks are joined along the time axis
+    of each method.
+
+    Everything else goes straight to the wrapped dataset.
+
+    Arguments:
+        dataset -- the Data to wrap
+    """
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+        super(LazyData, self).__init__(dataset.url)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._dataset, name)
+
+    def __enter__(self):
+        self._dataset.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._dataset.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def timestamps(self):
+        return self._dataset.timestamps
+
+    @property
+    def depths(self):
+        return self._dataset.depths
+
+    @property
+    def variables(self):
+        return self._dataset.variables
+
+    @property
+    def depth_dimensions(self):
+        return self._dataset.depth_dimensions
+
+    def preload(self):
+        self._dataset.preload()
+
+    def get_raw_point(self, latitude, longitude, depth, time, variable):
+        return self._dataset.get_raw_point(latitude, longitude, depth, time,
+                                           variable)
+
+    def __chunk_size(self, variable, points, depth):
+        """The number of times whose slabs fit in LAZY_MEMORY_LIMIT
+
+        The slab of a time is POINT_SOURCES grid points around each point,
+        at most the whole grid, on each level read.
+
+        Arguments:
+            points -- the number of points read
+            depth -- the depth read, None for every level
+        """
+        var = self._dataset._variable(variable)
+        grid = 1
+        levels = 1
+        for d, n in zip(var.dimensions[1:], var.shape[1:]):
+            if d not in self._dataset.depth_dimensions:
+                grid *= n
+            elif depth is None or depth == 'bottom':
+                levels = n
+            elif vertical.is_metres(depth):
+                levels = 2
+
+        # float64 after resampling
+        entry = 8 * levels * min(grid, points * POINT_SOURCES)
+
+        return int(settings.get('LAZY_MEMORY_LIMIT') // max(entry, 1))
+
+    def __stream(self, time, size, axes, read):
+        """Reads a list of times in chunks of about size times
+
+        Arguments:
+            axes -- for each part of the result, the axis of its times, or
+                    None if it is the same for every time
+            read -- read(times) reads some of the times
+
+        Returns:
+            read(time), a tuple if axes has more than one part
+        """
+        time = list(time)
+        chunks = _chunks(len(time), size)
+        if len(chunks) == 1:
+            return read(time)
+
+        results = [read(time[a:b]) for a, b in chunks]
+        if len(axes) == 1:
+            results = [(r,) for r in results]
+
+        joined = []
+        for parts, axis in zip(zip(*results), axes):
+            if axis is None:
+                joined.append(parts[0])
+            else:
+                joined.append(np.ma.concatenate(parts, axis=axis))
+
+        return joined[0] if len(axes) == 1 else tuple(joined)
+
+    def get_point(self, latitude, longitude, depth, time, variable,
+                  return_depth=False, resolution=None):
+        def read(t):
+            return self._dataset.get_point(latitude, longitude, depth, t,
+                                           variable,
+                                           return_depth=return_depth,
+                                           resolution=resolution)
+
+        # The backends lay out the depths of a list of times differently
+        if settings.get('LAZY_MEMORY_LIMIT') is None or return_depth or \
+                not hasattr(time, "__len__"):
+            return read(time)
+
+        if isinstance(variable, list):
+            # Streamed one variable at a time
+            return [self.get_point(latitude, longitude, depth, time, v,
+                                   resolution=resolution)
+                    for v in variable]
+
+        # The times are the last axis
+        return self.__stream(
+            time, self.__chunk_size(variable, np.size(latitude), depth),
+            [-1], read)
+
+    def get_profile(self, latitude, longitude, time, variable):
+        def read(t):
+            return self._dataset.get_profile(latitude, longitude, t,
+                                             variable)
+
+        if settings.get('LAZY_MEMORY_LIMIT') is None or \
+                not hasattr(time, "__len__"):
+            return read(time)
+
+        # The times are before the levels
+        return self.__stream(
+            time, self.__chunk_size(variable, np.size(latitude), None),
+            [-2, -1 if self._dataset.profile_depths_by_time else None],
+            read)
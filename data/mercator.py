@@ -1,11 +1,10 @@
-import pyresample
 import numpy as np
-import warnings
 import netcdf_data
 from pint import UnitRegistry
-from data import Variable, VariableList
-import math
-import re
+import shared_store
+import regular_grid
+import bottom
+import vertical
 
 RAD_FACTOR = np.pi / 180.0
 EARTH_RADIUS = 6378137.0
@@ -21,53 +20,26 @@ class Mercator(netcdf_data.NetCDFData):
     @property
     def depths(self):
         if self.__depths is None:
-            var = None
-            for v in ['depth', 'deptht']:
-                if v in self._dataset.variables:
-                    var = self._dataset.variables[v]
-                    break
-
-            if var is not None:
-                ureg = UnitRegistry()
-                unit = ureg.parse_units(var.units.lower())
-                self.__depths = ureg.Quantity(
-                    var[:], unit
-                ).to(ureg.meters).magnitude
-            else:
-                self.__depths = np.array([0])
-
-            self.__depths.flags.writeable = False
+            self.__depths = shared_store.get_or_create(
+                self.url, 'depths', self.__read_depths,
+                [self._dataset.variables[v] for v in ['depth', 'deptht']
+                 if v in self._dataset.variables][:1])
 
         return self.__depths
 
-    @property
-    def variables(self):
-        l = []
-        for name in self._dataset.variables:
-            var = self._dataset.variables[name]
-            if 'long_name' in var.ncattrs():
-                long_name = var.long_name
-            else:
-                long_name = name
-
-            if 'units' in var.ncattrs():
-                units = var.units
-            else:
-                units = None
-
-            if 'valid_min' in var.ncattrs():
-                valid_min = float(re.sub(r"[^0-9\.\+,eE]", "",
-                                         str(var.valid_min)))
-                valid_max = float(re.sub(r"[^0-9\,\+,eE]", "",
-                                         str(var.valid_max)))
-            else:
-                valid_min = None
-                valid_max = None
-
-            l.append(Variable(name, long_name, units, var.dimensions,
-                              valid_min, valid_max))
-
-        return VariableList(l)
+    def __read_depths(self):
+        var = None
+        for v in ['depth', 'deptht']:
+            if v in self._dataset.variables:
+                var = self._dataset.variables[v]
+                break
+
+        if var is not None:
+            ureg = UnitRegistry()
+            unit = ureg.parse_units(var.units.lower())
+            return ureg.Quantity(var[:], unit).to(ureg.meters).magnitude
+        else:
+            return np.array([0])
 
     def __find_var(self, candidates):
         for c in candidates:
@@ -76,39 +48,18 @@ class Mercator(netcdf_data.NetCDFData):
 
         return None
 
-    def __find_index(self, lat, lon, n=1):
-        def find_nearest(array, value, sorter):
-            idx = np.searchsorted(array, value, side="left",
-                                  sorter=sorter)
-
-            result = []
-            for i in range(0, len(value)):
-                if idx[i] > 0 and (
-                    idx[i] == len(array) or
-                    math.fabs(value[i] - array[idx[i] - 1]) < math.fabs(
-                        value[i] - array[idx[i]])
-                ):
-                    result.append(idx[i] - 1)
-                else:
-                    result.append(idx[i])
+    def __bottom(self, variable):
+        if self._bottom.get(variable) is None:
+            self._bottom[variable] = bottom.load(
+                self.url, variable, self._dataset.variables[variable])
 
-            return sorter[result]
+        return self._bottom[variable]
 
-        if not hasattr(lat, "__len__"):
-            lat = [lat]
-            lon = [lon]
-
-        lat = np.array(lat)
-        lon = np.mod(np.array(lon) + 360, 360)
-
-        iy_min = find_nearest(self.latvar[:], lat, self.__latsort)
-        ix_min = find_nearest(np.mod(self.lonvar[:] + 360, 360), lon,
-                              self.__lonsort)
-
-        return iy_min, ix_min, [50000]
+    def __find_index(self, lat, lon):
+        return self.__grid.find_index(lat, lon)
 
     def __bounding_box(self, lat, lon, n=10):
-        y, x, d = self.__find_index(lat, np.mod(np.add(lon, 360), 360), n)
+        y, x = self.__find_index(lat, lon)
 
         def fix_limits(data, limit):
             mx = np.amax(data)
@@ -125,134 +76,133 @@ class Mercator(netcdf_data.NetCDFData):
         miny, maxy = fix_limits(y, self.latvar.shape[0])
         minx, maxx = fix_limits(x, self.lonvar.shape[0])
 
-        return miny, maxy, minx, maxx, np.amax(d)
-
-    def __resample(self, lat_in, lon_in, lat_out, lon_out, var, radius=50000):
-        if len(var.shape) == 3:
-            var = np.rollaxis(var, 0, 3)
-
-        origshape = var.shape
-
-        def weight(r):
-            r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
-            return 1. / r ** 2
-
-        data = var[:]
-
-        masked_lon_in = np.ma.array(lon_in)
-        masked_lat_in = np.ma.array(lat_in)
-
-        output_def = pyresample.geometry.SwathDefinition(
-            lons=np.ma.array(lon_out),
-            lats=np.ma.array(lat_out)
+        return miny, maxy, minx, maxx
+
+    def __columns(self, minx, maxx, n=10):
+        """The column slices to read for a box
+
+        The ends of a periodic longitude axis are neighbours, so a box at
+        either end also reads n / 2 columns from the other end, and points
+        between the last column and the first are interpolated across the
+        seam.
+        """
+        nx = self.lonvar.shape[0]
+        slices = [slice(minx, maxx)]
+        if self.__grid.periodic and maxx - minx < nx:
+            if minx == 0:
+                slices.insert(0, slice(max(maxx, nx - n // 2), nx))
+            if maxx == nx:
+                slices.append(slice(0, min(minx, n // 2)))
+
+        return [s for s in slices if s.stop > s.start]
+
+    @staticmethod
+    def __read_columns(slices, read):
+        """Reads each column slice with read(xs), and joins them"""
+        parts = [np.ma.asarray(read(xs)) for xs in slices]
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.ma.concatenate(parts, axis=-1)
+
+    def __resample(self, miny, slices, lat_out, lon_out, arrays):
+        """Interpolates slabs to the points lat_out, lon_out
+
+        The arrays are stacked into one multi-channel array, so they share
+        one set of weights, each one keeping its own mask.
+
+        Arguments:
+            miny -- the first row of the slabs
+            slices -- the column slices the slabs were read from, see
+                      __columns
+            arrays -- slabs with rows and columns as the last two
+                      dimensions, e.g. (time, depth, y, x)
+
+        Returns:
+            A list of the interpolated arrays, squeezed
+        """
+        shapes = []
+        channels = []
+        for var in arrays:
+            var = np.ma.asarray(var)
+            shapes.append(var.shape[:-2])
+            var = var.reshape((-1,) + var.shape[-2:])
+            channels.append(var.transpose((1, 2, 0)))
+
+        columns = np.concatenate([np.arange(s.start, s.stop) for s in slices])
+
+        # Bilinear interpolation straight from the fractional indices of
+        # the target points, all variables and depths at once
+        output = self.__grid.interpolate(
+            np.ma.concatenate(channels, axis=2),
+            np.ravel(lat_out), np.ravel(lon_out), offset=(miny, 0),
+            columns=columns
         )
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-
-            if len(data.shape) == 3:
-                output = []
-                # multiple depths
-                for d in range(0, data.shape[2]):
-                    grid_lat, grid_lon = np.meshgrid(
-                        masked_lat_in,
-                        masked_lon_in
-                    )
-                    grid_lat.mask = grid_lon.mask = \
-                        data[:, :, d].view(np.ma.MaskedArray).mask.transpose()
-                    input_def = pyresample.geometry.SwathDefinition(
-                        lons=grid_lon,
-                        lats=grid_lat
-                    )
-                    output.append(pyresample.kd_tree.resample_custom(
-                        input_def, data[:, :, d].transpose(), output_def,
-                        radius_of_influence=float(radius),
-                        neighbours=10,
-                        weight_funcs=weight,
-                        fill_value=None, nprocs=4
-                    ))
-
-                output = np.ma.array(output).transpose()
-            else:
-                grid_lat, grid_lon = np.meshgrid(
-                    masked_lat_in,
-                    masked_lon_in
-                )
-                grid_lat.mask = grid_lon.mask = \
-                    data.view(np.ma.MaskedArray).mask.transpose()
-
-                input_def = pyresample.geometry.SwathDefinition(
-                    lons=grid_lon,
-                    lats=grid_lat
-                )
-
-                output = pyresample.kd_tree.resample_custom(
-                    input_def, data.transpose(), output_def,
-                    radius_of_influence=float(radius),
-                    neighbours=10,
-                    weight_funcs=weight,
-                    fill_value=None, nprocs=4
-                )
-
-        if len(origshape) == 4:
-            output = output.reshape(origshape[2:])
-
-        return np.squeeze(output)
+
+        splits = np.cumsum([c.shape[2] for c in channels])[:-1]
+        return [
+            np.squeeze(part.reshape((len(part),) + shape))
+            for part, shape in zip(np.split(output, splits, axis=1), shapes)
+        ]
 
     def __init__(self, url):
         super(Mercator, self).__init__(url)
         self.latvar = None
         self.lonvar = None
-        self.__latsort = None
-        self.__lonsort = None
+        self.__grid = None
+        self._bottom = {}
 
     def __enter__(self):
         super(Mercator, self).__enter__()
 
         if self.latvar is None:
-            self.latvar = self.__find_var(['nav_lat', 'latitude', 'lat'])
-            self.lonvar = self.__find_var(['nav_lon', 'longitude', 'lon'])
-            self.__latsort = np.argsort(self.latvar[:])
-            self.__lonsort = np.argsort(np.mod(self.lonvar[:] + 360, 360))
+            latvar = self.__find_var(['nav_lat', 'latitude', 'lat'])
+            lonvar = self.__find_var(['nav_lon', 'longitude', 'lon'])
+            self.latvar = shared_store.get_or_create(
+                self.url, latvar.name, lambda: latvar[:], [latvar])
+            self.lonvar = shared_store.get_or_create(
+                self.url, lonvar.name, lambda: lonvar[:], [lonvar])
+            # The axes are sorted and the longitudes wrapped once, here
+            self.__grid = regular_grid.RegularGrid(
+                self.latvar, self.lonvar,
+                shared_store.get_or_create(
+                    self.url, 'latsort', lambda: np.argsort(self.latvar),
+                    [latvar]),
+                shared_store.get_or_create(
+                    self.url, 'lonsort',
+                    lambda: np.argsort(np.mod(self.lonvar + 360, 360)),
+                    [lonvar])
+            )
 
         return self
 
+    def preload(self):
+        self.depths
+
+        # Finding the bottom of every column reads every level, it's done
+        # once here rather than on the first bottom request
+        for name in bottom.variables(self._dataset.variables,
+                                     self.depth_dimensions):
+            self.__bottom(name)
+
     def get_raw_point(self, latitude, longitude, depth, time, variable):
-        miny, maxy, minx, maxx, radius = self.__bounding_box(
+        miny, maxy, minx, maxx = self.__bounding_box(
             latitude, longitude, 10)
 
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        var = self._dataset.variables[variable]
+        var = self._variable(variable)
 
         if depth == 'bottom':
-            if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
-            else:
-                d = var[time, :, miny:maxy, minx:maxx]
-
-            reshaped = d.reshape([d.shape[0], -1])
-
-            edges = np.array(np.ma.notmasked_edges(reshaped, axis=0))
-            depths = edges[1, 0, :]
-            indices = edges[1, 1, :]
-
-            if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
-                data_in = data_in.reshape(
-                    [data_in.shape[0], data_in.shape[1], -1])
-                data = []
-                for i, t in enumerate(time):
-                    data.append(data_in[i, depths, indices])
-                data = np.ma.array(data).reshape([len(time), d.shape[-2],
-                                                  d.shape[-1]])
-            else:
-                data = np.ma.MaskedArray(np.zeros(d.shape[1:]),
-                                         mask=True,
-                                         dtype=d.dtype)
-                data[np.unravel_index(indices, data.shape)] = \
-                    reshaped[depths, indices]
+            data = bottom.gather(var, time,
+                                 self.__bottom(variable)[miny:maxy,
+                                                         minx:maxx],
+                                 miny, minx)
+        elif len(var.shape) == 4 and vertical.is_metres(depth):
+            data = vertical.read(var, time, self.depths, depth,
+                                 (slice(miny, maxy), slice(minx, maxx)))
         else:
             if len(var.shape) == 4:
                 data = var[time, depth, miny:maxy, minx:maxx]
@@ -268,115 +218,91 @@ class Mercator(netcdf_data.NetCDFData):
         )
 
     def get_point(self, latitude, longitude, depth, time, variable,
-                  return_depth=False):
-
-        miny, maxy, minx, maxx, radius = self.__bounding_box(
+                  return_depth=False, resolution=None):
+        if isinstance(variable, list):
+            return self.__get_points(latitude, longitude, depth, time,
+                                     variable, return_depth)
+
+        return self.__get_points(latitude, longitude, depth, time,
+                                 [variable], return_depth)[0]
+
+    def __get_points(self, latitude, longitude, depth, time, variables,
+                     return_depth):
+        """get_point for a list of variables, read from the same slab and
+        interpolated together
+        """
+        miny, maxy, minx, maxx = self.__bounding_box(
             latitude, longitude, 10)
+        slices = self.__columns(minx, maxx, 10)
 
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        var = self._dataset.variables[variable]
-
-        if depth == 'bottom':
-            if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
-            else:
-                d = var[time, :, miny:maxy, minx:maxx]
-
-            reshaped = d.reshape([d.shape[0], -1])
-
-            edges = np.array(np.ma.notmasked_edges(reshaped, axis=0))
-            depths = edges[1, 0, :]
-            indices = edges[1, 1, :]
-
-            if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
-                data_in = data_in.reshape(
-                    [data_in.shape[0], data_in.shape[1], -1])
-                data = []
-                for i, t in enumerate(time):
-                    di = np.ma.MaskedArray(np.zeros(data_in.shape[-1]),
-                                           mask=True,
-                                           dtype=data_in.dtype)
-                    di[indices] = data_in[i, depths, indices]
-                    data.append(di)
-                data = np.ma.array(data).reshape([len(time), d.shape[-2],
-                                                  d.shape[-1]])
+        arrays = []
+        for v in variables:
+            var = self._variable(v)
+            if depth == 'bottom':
+                index = self.__read_columns(
+                    slices, lambda xs: self.__bottom(v)[miny:maxy, xs])
+                arrays.append(self.__read_columns(
+                    slices, lambda xs: bottom.gather(
+                        var, time, self.__bottom(v)[miny:maxy, xs],
+                        miny, xs.start)))
+
+                if return_depth:
+                    d = bottom.depth(self.depths, np.ma.getdata(index))
+                    if hasattr(time, "__len__"):
+                        d = np.ma.array([d] * len(time))
+                    arrays.append(d)
+            elif len(var.shape) == 4 and vertical.is_metres(depth):
+                arrays.append(self.__read_columns(
+                    slices, lambda xs: vertical.read(
+                        var, time, self.depths, depth,
+                        (slice(miny, maxy), xs))))
+            elif len(var.shape) == 4:
+                arrays.append(self.__read_columns(
+                    slices, lambda xs: var[time, depth, miny:maxy, xs]))
             else:
-                data = np.ma.MaskedArray(np.zeros(d.shape[1:]),
-                                         mask=True,
-                                         dtype=d.dtype)
-                data[np.unravel_index(indices, data.shape)] = \
-                    reshaped[depths, indices]
-
-            res = self.__resample(
-                self.latvar[miny:maxy],
-                np.mod(self.lonvar[minx:maxx] + 360, 360),
-                [latitude], [longitude],
-                data,
-                radius
-            )
-
-            if return_depth:
-                d = np.ma.MaskedArray(np.zeros(d.shape[1:]),
-                                      mask=True,
-                                      dtype=self.depths.dtype)
+                arrays.append(self.__read_columns(
+                    slices, lambda xs: var[time, miny:maxy, xs]))
 
-                d[np.unravel_index(indices, d.shape)] = self.depths[depths]
+        parts = self.__resample(miny, slices, latitude, longitude, arrays)
 
-                if hasattr(time, "__len__"):
-                    d = [d] * len(time)
+        results = []
+        for v in variables:
+            res = parts.pop(0)
+            if not return_depth:
+                results.append(res)
+                continue
 
-                dep = self.__resample(
-                    self.latvar[miny:maxy],
-                    self.lonvar[minx:maxx],
-                    latitude, longitude,
-                    np.reshape(d, data.shape),
-                    radius
-                )
-
-        else:
-            if len(var.shape) == 4:
-                data = var[time, depth, miny:maxy, minx:maxx]
+            if depth == 'bottom':
+                dep = parts.pop(0)
             else:
-                data = var[time, miny:maxy, minx:maxx]
-
-            res = self.__resample(
-                self.latvar[miny:maxy],
-                self.lonvar[minx:maxx],
-                latitude, longitude,
-                data,
-                radius
-            )
-
-            if return_depth:
-                dep = self.depths[depth]
+                dep = vertical.metres(self.depths, depth)
                 dep = np.tile(dep, len(latitude))
                 if hasattr(time, "__len__"):
                     dep = np.array([dep] * len(time))
 
-        if return_depth:
-            return res, dep
-        else:
-            return res
+            results.append((res, dep))
+
+        return results
 
     def get_profile(self, latitude, longitude, time, variable):
-        miny, maxy, minx, maxx, radius = self.__bounding_box(
+        miny, maxy, minx, maxx = self.__bounding_box(
             latitude, longitude, 10)
+        slices = self.__columns(minx, maxx, 10)
 
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        var = self._dataset.variables[variable]
+        var = self._variable(variable)
         res = self.__resample(
-            self.latvar[miny:maxy],
-            self.lonvar[minx:maxx],
-            [latitude], [longitude],
-            var[time, :, miny:maxy, minx:maxx],
-            radius
-        )
+            miny, slices,
+            latitude, longitude,
+            [self.__read_columns(slices,
+                                 lambda xs: var[time, :, miny:maxy, xs])]
+        )[0]
 
         return res, np.squeeze([self.depths] * len(latitude))
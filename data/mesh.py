@@ -0,0 +1,235 @@
+import numpy as np
+import hashlib
+import grid_index
+import resampling
+
+# Barycentric coordinates this far below 0 still count as inside, so points
+# on a shared edge are found in one of its triangles
+TOLERANCE = 1e-9
+
+
+class TriangleMesh(object):
+
+    """Locates points in an unstructured triangular mesh, e.g. FVCOM's
+
+    The elements are indexed with a KD tree over their centres. A point is
+    located by testing the elements with the nearest centres, and values
+    are interpolated with the barycentric coordinates of the point in its
+    element. Points outside of the mesh are masked.
+
+    The element containing a point may not have one of the nearest centres,
+    e.g. a long, thin element along a coast. The centre of the element of a
+    point is at most the largest centre to node distance of the mesh away,
+    so points not found in the nearest elements are tested against every
+    element with a centre that close.
+
+    Arguments:
+        url -- the dataset url, part of the cache keys
+        lat, lon -- the coordinates of the nodes
+        nv -- the nodes of each element, (3, nele) or (nele, 3), 1-based as
+              in FVCOM or 0-based
+        latc, lonc -- the coordinates of the element centres, computed from
+                      the nodes if not given
+        candidates -- the number of elements tested for each point
+    """
+
+    def __init__(self, url, lat, lon, nv, latc=None, lonc=None,
+                 candidates=8):
+        self.url = url
+        self.candidates = candidates
+
+        nv = np.asarray(np.ma.getdata(nv), dtype=np.int64)
+        if nv.shape[0] == 3 and nv.shape[1] != 3:
+            nv = nv.T
+        if nv.min() == 1:
+            nv = nv - 1
+        self.nodes = nv
+
+        lat = np.ma.getdata(lat)
+        lon = np.ma.getdata(lon)
+        self.__xyz = grid_index.to_xyz(lat, lon, np.float64)
+
+        if latc is None or lonc is None:
+            centre = self.__xyz[nv].mean(axis=1)
+            latc = np.degrees(np.arcsin(
+                centre[:, 2] / np.linalg.norm(centre, axis=1)))
+            lonc = np.degrees(np.arctan2(centre[:, 1], centre[:, 0]))
+
+        self.__tree = grid_index.kdtree(url, 'latc', np.ma.getdata(latc),
+                                        np.ma.getdata(lonc))
+
+        # With some room for the float32 centres of the tree
+        centre = grid_index.to_xyz(np.ma.getdata(latc), np.ma.getdata(lonc),
+                                   np.float64)
+        reach = np.linalg.norm(self.__xyz[nv] - centre[:, np.newaxis],
+                               axis=2)
+        self.__reach = float(np.amax(reach)) * (1 + 1e-4) + 1e-6
+
+    def __barycentric(self, point, element):
+        """Barycentric coordinates of points in elements, (n, 3)"""
+        a, b, c = [self.__xyz[self.nodes[element, i]] for i in range(3)]
+        v0 = b - a
+        v1 = c - a
+        v2 = point - a
+
+        d00 = np.sum(v0 * v0, axis=1)
+        d01 = np.sum(v0 * v1, axis=1)
+        d11 = np.sum(v1 * v1, axis=1)
+        d20 = np.sum(v2 * v0, axis=1)
+        d21 = np.sum(v2 * v1, axis=1)
+
+        denom = d00 * d11 - d01 * d01
+        denom = np.where(denom == 0, np.nan, denom)
+        v = (d11 * d20 - d01 * d21) / denom
+        w = (d00 * d21 - d01 * d20) / denom
+
+        return np.column_stack((1 - v - w, v, w))
+
+    def locate(self, lat, lon):
+        """Finds the element containing each point
+
+        Arguments:
+            lat, lon -- the coordinates of the points, any shape
+
+        Returns:
+            element -- the element of each point, -1 if it is outside
+            weight -- (n, 3) barycentric weights of the nodes of the element
+        """
+        point = grid_index.to_xyz(lat, lon, np.float64)
+        n = len(point)
+
+        element = np.full(n, -1, dtype=np.int64)
+        weight = np.zeros((n, 3))
+
+        k = min(self.candidates, len(self.nodes))
+        todo = np.arange(n)
+        while len(todo) > 0:
+            dist, candidates = self.__tree.query(
+                point[todo].astype(np.float32), k=k,
+                distance_upper_bound=self.__reach)
+            candidates = np.asarray(candidates,
+                                    dtype=np.int64).reshape(len(todo), -1)
+            self.__test(point, todo, candidates, element, weight)
+
+            # Points with more centres within reach than were tested are
+            # tested against more of them
+            dist = np.asarray(dist).reshape(len(todo), -1)
+            todo = todo[(element[todo] < 0) & np.isfinite(dist[:, -1])]
+            if k == len(self.nodes):
+                break
+            k = min(4 * k, len(self.nodes))
+
+        return element, weight
+
+    def __test(self, point, todo, candidates, element, weight):
+        """Tests the candidate elements of the points todo in turn"""
+        for j in range(candidates.shape[1]):
+            left = np.flatnonzero(element[todo] < 0)
+            e = candidates[left, j]
+
+            # Fewer than k centres are within reach
+            left = left[e < len(self.nodes)]
+            e = e[e < len(self.nodes)]
+            if len(left) == 0:
+                break
+
+            w = self.__barycentric(point[todo[left]], e)
+            inside = np.all(w >= -TOLERANCE, axis=1)
+
+            element[todo[left[inside]]] = e[inside]
+            w = np.clip(w[inside], 0, None)
+            weight[todo[left[inside]]] = w / w.sum(axis=1)[:, np.newaxis]
+
+    def neighbours(self, lat, lon, mode='node'):
+        """Returns the resampling.Neighbours to interpolate to points
+
+        The result is cached per mesh and set of points, e.g. per tile.
+
+        Arguments:
+            lat, lon -- the coordinates of the target points, any shape
+            mode -- 'node' for values on the nodes, interpolated with the
+                    barycentric weights; 'element' for values on the
+                    elements, taken from the containing element; 'centre'
+                    for values on the nodes averaged over the containing
+                    element, as FVCOM does for element depths
+        """
+        h = hashlib.sha1()
+        h.update("%s|%d|%s|" % (self.url, len(self.nodes), mode))
+        for a in [lat, lon]:
+            h.update(np.ascontiguousarray(np.ravel(a),
+                                          dtype=np.float64).tobytes())
+
+        return resampling.cached(h.hexdigest(),
+                                 lambda: self.__neighbours(lat, lon, mode))
+
+    def __neighbours(self, lat, lon, mode):
+        element, weight = self.locate(lat, lon)
+        valid = element >= 0
+        element = element[valid]
+
+        if mode == 'element':
+            index = element[:, np.newaxis]
+            weight = np.ones(index.shape)
+        elif mode == 'centre':
+            index = self.nodes[element]
+            weight = np.full(index.shape, 1.0 / 3)
+        else:
+            index = self.nodes[element]
+            weight = weight[valid]
+
+        return resampling.Neighbours(valid, index, weight)
+
+
+def compact(neighbours):
+    """Restricts Neighbours to the source points they use
+
+    Returns:
+        points -- the sorted source points to read
+        neighbours -- the Neighbours with indices into points
+    """
+    points = np.unique(neighbours.index)
+
+    return points, resampling.Neighbours(
+        neighbours.valid_output,
+        np.searchsorted(points, neighbours.index),
+        neighbours.weight)
+
+
+def hilbert_order(lat, lon, bits=16):
+    """A permutation that sorts points along a Hilbert curve
+
+    Points close together on the curve are close together in space, so
+    storing a mesh in this order keeps the nodes of an area together.
+
+    Arguments:
+        lat, lon -- the coordinates of the points
+        bits -- the resolution of the curve, per axis
+    """
+    lat = np.ma.getdata(lat).astype(np.float64)
+    lon = np.mod(np.ma.getdata(lon).astype(np.float64) + 180, 360) - 180
+
+    def scale(a):
+        span = a.max() - a.min()
+        a = (a - a.min()) / (span if span > 0 else 1)
+        return (a * (2 ** bits - 1)).astype(np.int64)
+
+    x = scale(lon)
+    y = scale(lat)
+    d = np.zeros(len(x), dtype=np.int64)
+
+    n = 2 ** bits
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+
+        # Rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s //= 2
+
+    return np.argsort(d, kind='mergesort')
@@ -0,0 +1,436 @@
+from netCDF4 import Dataset
+import numpy as np
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import bottom
+import mesh
+import pool
+import settings
+
+DATA_FILE = 'data.nc'
+MANIFEST_FILE = 'manifest.json'
+
+TIME_DIMENSIONS = ['time', 'time_counter']
+DEPTH_DIMENSIONS = ['depth', 'deptht', 'z', 'siglay', 'siglev']
+
+# Edge of the spatial chunks, a 256x256 tile for 2-D grids
+SPATIAL_CHUNK = 256
+
+# Attributes that describe the packing of the source, not of the mirror
+PACKING_ATTRIBUTES = ['_FillValue', 'missing_value', 'scale_factor',
+                      'add_offset']
+
+PACKED_FILL = np.int16(-32768)
+PACKED_MAX = 32767
+
+# Attributes in the units of the stored values, packed along with the data
+VALID_ATTRIBUTES = ['valid_min', 'valid_max', 'valid_range']
+
+# The FVCOM variables that hold node or element numbers, and the dimension
+# they number
+INDEX_VARIABLES = {
+    'nv': 'node',
+    'nbe': 'nele',
+    'nbve': 'nele',
+    'nbsn': 'node',
+}
+
+_NUMBER = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+
+
+def directory(url):
+    """The mirror directory of a dataset, None if MIRROR_DIR isn't set"""
+    if settings.get('MIRROR_DIR') is None or url is None:
+        return None
+
+    return os.path.join(settings.get('MIRROR_DIR'),
+                        hashlib.sha1(url).hexdigest())
+
+
+def lookup(url):
+    """Returns the mirror file of a dataset, or None if it isn't mirrored"""
+    path = directory(url)
+    if path is None:
+        return None
+
+    path = os.path.join(path, DATA_FILE)
+    return path if os.path.exists(path) else None
+
+
+def sidecar(url, kind, name):
+    """Memory maps a precomputed array of a mirror
+
+    Arguments:
+        url -- the url the dataset was opened with, a mirror file or not
+        kind -- 'coords', 'bottom' or 'order'
+        name -- the variable name
+
+    Returns:
+        The array, or None if url isn't a mirror or has no such sidecar
+    """
+    if settings.get('MIRROR_DIR') is None or url is None or \
+            os.path.basename(url) != DATA_FILE or \
+            not url.startswith(settings.get('MIRROR_DIR')):
+        return None
+
+    try:
+        return np.load(os.path.join(os.path.dirname(url), kind,
+                                    name + '.npy'),
+                       mmap_mode='r')
+    except (IOError, ValueError):
+        return None
+
+
+def _layout(var):
+    """Splits the dimensions of a variable into leading and spatial"""
+    leading = set(TIME_DIMENSIONS + DEPTH_DIMENSIONS)
+    spatial = 0
+    for d in reversed(var.dimensions):
+        if d in leading:
+            break
+        spatial += 1
+
+    return len(var.dimensions) - spatial, spatial
+
+
+def _chunksizes(var):
+    lead, spatial = _layout(var)
+    if spatial == 0 or spatial == len(var.dimensions):
+        return None
+
+    edge = SPATIAL_CHUNK ** (2.0 / spatial)
+    return [1] * lead + [int(min(edge, n)) for n in var.shape[lead:]]
+
+
+def _number(value):
+    """A numeric attribute as a float, None if it isn't a number
+
+    Some datasets store numbers as strings, with units or other characters
+    around them.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        match = _NUMBER.search(str(value))
+        return float(match.group(0)) if match else None
+
+
+def _valid(var, name):
+    """A valid range attribute of a variable in unpacked units
+
+    Returns:
+        An array of the values, None if they aren't numbers
+    """
+    values = [_number(v) for v in np.atleast_1d(var.getncattr(name))]
+    if None in values:
+        return None
+
+    values = np.array(values)
+    attrs = var.ncattrs()
+    if 'scale_factor' in attrs:
+        values = values * float(var.scale_factor)
+    if 'add_offset' in attrs:
+        values = values + float(var.add_offset)
+
+    return values
+
+
+def _pack_range(var, lead):
+    """The range of values to pack, from valid_min/valid_max or the data"""
+    attrs = var.ncattrs()
+    if 'valid_min' in attrs and 'valid_max' in attrs:
+        low = _valid(var, 'valid_min')
+        high = _valid(var, 'valid_max')
+        if low is not None and high is not None and low[0] < high[0]:
+            return low[0], high[0]
+
+    low, high = np.inf, -np.inf
+    for l in itertools.product(*[range(n) for n in var.shape[:lead]]):
+        data = np.ma.asarray(var[l])
+        if data.count() > 0:
+            low = min(low, float(data.min()))
+            high = max(high, float(data.max()))
+
+    if low > high:
+        return 0.0, 0.0
+
+    return low, high
+
+
+def _orders(src):
+    """Hilbert curve orders of the nodes and elements of an FVCOM mesh
+
+    Returns:
+        A dict of dimension name to permutation, empty if src isn't a mesh
+    """
+    if 'nv' not in src.variables or 'node' not in src.dimensions:
+        return {}
+
+    orders = {'node': mesh.hilbert_order(src.variables['lat'][:],
+                                         src.variables['lon'][:])}
+    if 'latc' in src.variables and 'nele' in src.dimensions:
+        orders['nele'] = mesh.hilbert_order(src.variables['latc'][:],
+                                            src.variables['lonc'][:])
+
+    return orders
+
+
+def _permute(data, dimensions, orders):
+    for axis, d in enumerate(dimensions):
+        if d in orders:
+            data = np.ma.take(data, orders[d], axis=axis)
+
+    return data
+
+
+def _renumber(data, order, base):
+    """Points node or element numbers at the reordered nodes or elements
+
+    Arguments:
+        data -- the numbers, e.g. nv
+        order -- the stored order of the nodes or elements, see _orders
+        base -- the number of the first node, that of nv. Smaller numbers,
+                e.g. the 0 of a missing neighbour, are kept.
+    """
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+
+    data = np.ma.asarray(data)
+    values = np.ma.getdata(data).astype(np.int64)
+    valid = ~np.ma.getmaskarray(data) & (values >= base) & \
+        (values < base + len(order))
+
+    result = values.copy()
+    result[valid] = inverse[values[valid] - base] + base
+
+    return np.ma.masked_array(result.astype(data.dtype),
+                              mask=np.ma.getmask(data))
+
+
+def _copy_variable(src, dst, name, pack, zlib, orders={}):
+    var = src.variables[name]
+    lead, spatial = _layout(var)
+    timed = any(d in TIME_DIMENSIONS for d in var.dimensions)
+    floating = np.dtype(var.dtype).kind == 'f'
+    attrs = var.ncattrs()
+    converted = [a for a in attrs if a not in PACKING_ATTRIBUTES]
+
+    if timed and floating and pack:
+        low, high = _pack_range(var, lead)
+        scale = (high - low) / 65534.0 or 1.0
+        offset = (high + low) / 2.0
+        out = dst.createVariable(name, np.int16, var.dimensions, zlib=zlib,
+                                 chunksizes=_chunksizes(var),
+                                 fill_value=PACKED_FILL)
+        out.setncattr('scale_factor', np.float32(scale))
+        out.setncattr('add_offset', np.float32(offset))
+        out.set_auto_maskandscale(False)
+        attrs = [a for a in converted if a not in VALID_ATTRIBUTES]
+
+        def convert(data):
+            # Values outside the range would wrap around
+            data = np.ma.round((np.ma.asarray(data) - offset) / scale)
+            data = np.ma.clip(data, -PACKED_MAX, PACKED_MAX)
+            return data.astype(np.int16).filled(PACKED_FILL)
+    elif timed and floating:
+        out = dst.createVariable(name, np.float32, var.dimensions, zlib=zlib,
+                                 chunksizes=_chunksizes(var))
+        attrs = [a for a in converted if a not in VALID_ATTRIBUTES]
+
+        def convert(data):
+            return np.ma.asarray(data).astype(np.float32)
+    else:
+        # Copied as is, any packing is undone on read and redone on write
+        fill = var.getncattr('_FillValue') if '_FillValue' in attrs else None
+        out = dst.createVariable(name, var.dtype, var.dimensions, zlib=zlib,
+                                 chunksizes=_chunksizes(var),
+                                 fill_value=fill)
+        attrs = [a for a in attrs if a != '_FillValue']
+
+        def convert(data):
+            return data
+
+    for a in attrs:
+        out.setncattr(a, var.getncattr(a))
+
+    # The valid range is in the units of the stored values, packed along
+    # with them. Ranges that aren't numbers are dropped.
+    for a in sorted(set(converted) - set(attrs)):
+        values = _valid(var, a)
+        if values is not None:
+            values = np.ma.getdata(convert(values))
+            out.setncattr(a, values if a == 'valid_range' else values[0])
+
+    if INDEX_VARIABLES.get(name) in orders:
+        copy = convert
+        base = int(np.ma.min(src.variables['nv'][:]))
+
+        def convert(data):
+            return copy(_renumber(data, orders[INDEX_VARIABLES[name]],
+                                  base))
+
+    if len(var.shape) == 0:
+        out.assignValue(var.getValue())
+    elif spatial == 0 or lead == 0:
+        out[:] = convert(_permute(var[:], var.dimensions, orders))
+    else:
+        # One time and depth at a time, the whole variable might not fit in
+        # memory
+        for l in itertools.product(*[range(n) for n in var.shape[:lead]]):
+            out[l] = convert(_permute(var[l], var.dimensions[lead:], orders))
+
+
+def _write(src, path, variables, pack, zlib, orders):
+    with Dataset(path, 'w', format='NETCDF4') as dst:
+        for name, dim in src.dimensions.items():
+            dst.createDimension(name, None if dim.isunlimited() else len(dim))
+
+        for a in src.ncattrs():
+            dst.setncattr(a, src.getncattr(a))
+
+        for name, var in src.variables.items():
+            timed = any(d in TIME_DIMENSIONS for d in var.dimensions)
+            if variables is not None and timed and name not in variables \
+                    and name not in TIME_DIMENSIONS:
+                continue
+            _copy_variable(src, dst, name, pack, zlib, orders)
+
+
+def _write_sidecars(path, orders):
+    """Precomputes the coordinates and bottom index maps of a mirror file"""
+    root = os.path.dirname(path)
+    os.makedirs(os.path.join(root, 'coords'))
+    os.makedirs(os.path.join(root, 'bottom'))
+
+    if orders:
+        os.makedirs(os.path.join(root, 'order'))
+        for name, order in orders.items():
+            np.save(os.path.join(root, 'order', name + '.npy'), order)
+
+    with Dataset(path, 'r') as ds:
+        for name, var in ds.variables.items():
+            timed = any(d in TIME_DIMENSIONS for d in var.dimensions)
+            numeric = np.dtype(var.dtype).kind in 'iuf'
+
+            if not timed and numeric and len(var.shape) in (1, 2):
+                np.save(os.path.join(root, 'coords', name + '.npy'),
+                        np.ma.getdata(var[:]))
+            elif len(var.shape) == 4 and \
+                    var.dimensions[0] in TIME_DIMENSIONS and \
+                    var.dimensions[1] in DEPTH_DIMENSIONS:
+                np.save(os.path.join(root, 'bottom', name + '.npy'),
+                        bottom.bottom_index(var))
+
+
+def ingest(url, variables=None, pack=False, zlib=False, reorder=False):
+    """Mirrors a dataset into MIRROR_DIR
+
+    The mirror is a netCDF4 file chunked for the navigator's reads, one
+    time and depth by SPATIAL_CHUNK x SPATIAL_CHUNK points, with float32
+    or packed int16 data. Next to it are the coordinate arrays and the
+    bottom index maps, ready to be memory mapped.
+
+    With reorder, the nodes and elements of an FVCOM mesh are stored along
+    a Hilbert curve, so the nodes of an area are close together in the file
+    and are read with few requests. order/node.npy and order/nele.npy map
+    the stored positions to the source ones. The node and element numbers
+    of INDEX_VARIABLES are renumbered to match.
+
+    Each ingest writes a new version of the mirror and switches a symlink
+    over to it, so open_dataset never sees a partial mirror.
+
+    Arguments:
+        url -- the dataset url
+        variables -- the names of the variables to mirror, or None for all
+                     of them. Variables without a time dimension, e.g.
+                     coordinates, are always mirrored.
+        pack -- store data as int16 with scale_factor and add_offset
+        zlib -- compress the chunks
+        reorder -- store an unstructured mesh along a Hilbert curve
+
+    Returns:
+        The path of the mirror file
+    """
+    target = directory(url)
+    if target is None:
+        raise ValueError("MIRROR_DIR isn't set")
+
+    parent = os.path.dirname(target)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+
+    version = tempfile.mkdtemp(
+        dir=parent,
+        prefix='%s.%d.' % (os.path.basename(target), int(time.time())))
+    try:
+        src = pool.acquire(url)
+        try:
+            orders = _orders(src) if reorder else {}
+            _write(src, os.path.join(version, DATA_FILE), variables, pack,
+                   zlib, orders)
+        finally:
+            pool.release(src)
+
+        _write_sidecars(os.path.join(version, DATA_FILE), orders)
+
+        with open(os.path.join(version, MANIFEST_FILE), 'w') as f:
+            json.dump({
+                'url': url,
+                'ingested': int(time.time()),
+                'variables': variables,
+                'pack': pack,
+                'reorder': sorted(orders.keys()),
+            }, f)
+
+        previous = os.path.realpath(target) \
+            if os.path.islink(target) else None
+
+        link = version + '.link'
+        os.symlink(os.path.basename(version), link)
+        os.rename(link, target)
+    except:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+
+    # Open handles keep reading the old version until they are closed
+    if previous is not None and previous != version:
+        shutil.rmtree(previous, ignore_errors=True)
+
+    return os.path.join(target, DATA_FILE)
+
+
+def remove(url):
+    """Removes the mirror of a dataset, it is read from its url again"""
+    target = directory(url)
+    if target is None or not os.path.islink(target):
+        return
+
+    version = os.path.realpath(target)
+    os.remove(target)
+    shutil.rmtree(version, ignore_errors=True)
+
+
+def mirrors():
+    """Lists the manifests of the mirrors in MIRROR_DIR"""
+    root = settings.get('MIRROR_DIR')
+    if root is None or not os.path.isdir(root):
+        return []
+
+    result = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.islink(path):
+            continue
+        try:
+            with open(os.path.join(path, MANIFEST_FILE)) as f:
+                result.append(json.load(f))
+        except (IOError, ValueError):
+            pass
+
+    return result
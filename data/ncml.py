@@ -0,0 +1,464 @@
+from netCDF4 import Dataset
+from cachetools import LRUCache
+from xml.etree import ElementTree
+import numpy as np
+import os
+import re
+import threading
+import read_plan
+import settings
+
+NAMESPACE = '{http://www.unidata.ucar.edu/namespaces/netcdf/ncml-2.2}'
+
+# Length of the aggregation dimension in each member file, by path and
+# modification time, so rescanning a growing collection only opens the
+# new files.
+_lengths = LRUCache(maxsize=4096)
+_lengths_lock = threading.Lock()
+
+
+def is_local(url):
+    """Whether url is an NcML file on this machine"""
+    return url is not None and not url.startswith('http') and \
+        url.endswith('.ncml')
+
+
+def _path(location, base):
+    if location.startswith('file:'):
+        location = location[len('file:'):]
+    return os.path.normpath(os.path.join(base, location))
+
+
+def _tag(element):
+    return element.tag.replace(NAMESPACE, '')
+
+
+def _children(element, tag):
+    return [c for c in element if _tag(c) == tag]
+
+
+def _member_length(path, dim):
+    key = (path, os.path.getmtime(path), dim)
+    with _lengths_lock:
+        length = _lengths.get(key)
+
+    if length is None:
+        with Dataset(path, 'r') as ds:
+            length = len(ds.dimensions[dim])
+        with _lengths_lock:
+            _lengths[key] = length
+
+    return length
+
+
+def _scan(element, base):
+    """Lists the files matched by a scan element, sorted by name"""
+    directory = _path(element.get('location'), base)
+    suffix = element.get('suffix')
+    pattern = element.get('regExp')
+    if pattern is not None:
+        pattern = re.compile(pattern)
+    subdirs = element.get('subdirs', 'true') == 'true'
+
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        if not subdirs:
+            del dirs[:]
+        for f in files:
+            path = os.path.join(root, f)
+            if suffix is not None and not f.endswith(suffix):
+                continue
+            if pattern is not None and not pattern.search(path):
+                continue
+            paths.append(path)
+
+    return sorted(paths)
+
+
+def _value(attribute):
+    value = attribute.get('value', '')
+    kind = attribute.get('type', 'String')
+    if kind in ('String', 'string'):
+        return value
+
+    dtype = {
+        'byte': np.int8, 'short': np.int16, 'int': np.int32,
+        'long': np.int64, 'float': np.float32, 'double': np.float64,
+    }.get(kind.lower(), np.float64)
+    values = np.array(value.split(attribute.get('separator')), dtype=dtype)
+    return values[0] if len(values) == 1 else values
+
+
+class _Dimension(object):
+
+    def __init__(self, name, size, unlimited=False):
+        self.name = name
+        self.size = size
+        self.__unlimited = unlimited
+
+    def __len__(self):
+        return self.size
+
+    def isunlimited(self):
+        return self.__unlimited
+
+
+class _Variable(object):
+
+    """A variable of an NcML dataset, with the attributes set in the NcML
+    applied over those of the underlying variable.
+
+    Arguments:
+        name -- the name in the NcML dataset
+        var -- the underlying variable
+        attributes -- dict of attributes set in the NcML
+        remove -- names of attributes removed in the NcML
+    """
+
+    def __init__(self, name, var, attributes=None, remove=()):
+        self.name = name
+        self._var = var
+        self._attributes = attributes or {}
+        self._remove = set(remove)
+
+    def ncattrs(self):
+        names = [a for a in self._var.ncattrs() if a not in self._remove]
+        return names + [a for a in self._attributes if a not in names]
+
+    def getncattr(self, name):
+        if name in self._attributes:
+            return self._attributes[name]
+        if name in self._remove:
+            raise AttributeError(name)
+        return self._var.getncattr(name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._attributes:
+            return self._attributes[name]
+        if name in self._remove:
+            raise AttributeError(name)
+        return getattr(self._var, name)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        return self._var[index]
+
+
+class _JoinedVariable(object):
+
+    """A variable joined along the aggregation dimension of its members
+
+    Members are opened on demand through the handles of the dataset.
+
+    Arguments:
+        handles -- the _Handles of the dataset
+        template -- the variable in the first member, for its metadata
+        name -- the name of the variable in the members
+        axis -- the position of the aggregation dimension
+        paths -- the member files
+        offsets -- the index of the first entry of each member, followed by
+                   the total length
+    """
+
+    def __init__(self, handles, template, name, axis, paths, offsets):
+        self._handles = handles
+        self._template = template
+        self._name = name
+        self._axis = axis
+        self._paths = paths
+        self._offsets = np.asarray(offsets)
+
+        self.dimensions = template.dimensions
+        self.dtype = template.dtype
+        shape = list(template.shape)
+        shape[axis] = int(self._offsets[-1])
+        self.shape = tuple(shape)
+
+    def ncattrs(self):
+        return self._template.ncattrs()
+
+    def getncattr(self, name):
+        return self._template.getncattr(name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._template, name)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def get_var_chunk_cache(self):
+        return self._template.get_var_chunk_cache()
+
+    def set_var_chunk_cache(self, **kwargs):
+        self._handles.chunk_cache[self._name] = kwargs
+        self._template.set_var_chunk_cache(**kwargs)
+
+    def __member(self, m):
+        return self._handles.get(self._paths[m]).variables[self._name]
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        index = index + (slice(None),) * (len(self.shape) - len(index))
+
+        n = self.shape[self._axis]
+        joined = index[self._axis]
+        squeeze = False
+        if isinstance(joined, slice):
+            requested = range(*joined.indices(n))
+        elif hasattr(joined, "__len__"):
+            requested = [int(j) % n for j in joined]
+        else:
+            requested = [int(joined) % n]
+            squeeze = True
+
+        # The axis of the aggregation dimension in the result
+        axis = len([i for i in index[:self._axis]
+                    if isinstance(i, slice) or hasattr(i, "__len__")])
+
+        uniques = sorted(set(requested))
+        members = np.searchsorted(self._offsets, uniques, side='right') - 1
+
+        pieces = []
+        for m in sorted(set(members)):
+            local = [j - int(self._offsets[m])
+                     for j, k in zip(uniques, members) if k == m]
+            i = list(index)
+            i[self._axis] = local
+            pieces.append(np.ma.asarray(
+                read_plan.read(self.__member(m), tuple(i))))
+
+        if not pieces:
+            i = list(index)
+            i[self._axis] = slice(0, 0)
+            return self._template[tuple(i)]
+
+        result = np.ma.concatenate(pieces, axis=axis)
+        if requested != uniques:
+            position = dict((j, p) for p, j in enumerate(uniques))
+            result = result.take([position[j] for j in requested], axis=axis)
+
+        if squeeze:
+            result = result.take(0, axis=axis)
+
+        return result
+
+
+class _Handles(object):
+
+    """An LRU of open member files, closed when they drop out of it"""
+
+    def __init__(self, size):
+        self.__cache = LRUCache(maxsize=max(size, 1))
+        self.chunk_cache = {}
+
+    def get(self, path):
+        ds = self.__cache.get(path)
+        if ds is None:
+            ds = Dataset(path, 'r')
+            for name, kwargs in self.chunk_cache.items():
+                if name in ds.variables:
+                    ds.variables[name].set_var_chunk_cache(**kwargs)
+
+            if len(self.__cache) >= self.__cache.maxsize:
+                old, evicted = self.__cache.popitem()
+                evicted.close()
+            self.__cache[path] = ds
+
+        return ds
+
+    def close(self):
+        while len(self.__cache) > 0:
+            path, ds = self.__cache.popitem()
+            ds.close()
+
+
+class NcmlDataset(object):
+
+    """Reads an NcML dataset straight from its files, without THREDDS
+
+    Supports joinExisting and union aggregations, nested in any way, with
+    members listed as netcdf elements or found with scan elements, and the
+    attribute, variable and remove elements that modify them. Behaves like
+    a read only netCDF4.Dataset for the data backends.
+
+    The first file of a joinExisting aggregation is the template for its
+    metadata and for the variables without the aggregation dimension, as
+    in THREDDS. The other files are opened when they are read from, and
+    kept open in an LRU of NCML_FILE_HANDLES handles.
+
+    Arguments:
+        path -- the NcML file
+    """
+
+    def __init__(self, path):
+        self.filepath = path
+        self.__handles = _Handles(settings.get('NCML_FILE_HANDLES'))
+        self.__open = []
+
+        try:
+            root = ElementTree.parse(path).getroot()
+            variables, dimensions, attributes = self.__element(
+                root, os.path.dirname(os.path.abspath(path)))
+        except Exception:
+            self.close()
+            raise
+
+        self.variables = variables
+        self.dimensions = dimensions
+        self.__attributes = attributes
+
+    def __template(self, path):
+        """Opens a file that stays open as long as the dataset"""
+        ds = Dataset(path, 'r')
+        self.__open.append(ds)
+        return ds
+
+    def __element(self, element, base):
+        """Builds the variables, dimensions and attributes of a netcdf
+        element
+        """
+        variables = {}
+        dimensions = {}
+        attributes = {}
+
+        aggregations = _children(element, 'aggregation')
+        if element.get('location') is not None:
+            ds = self.__template(_path(element.get('location'), base))
+            variables = dict(
+                (k, _Variable(k, v)) for k, v in ds.variables.items())
+            dimensions = dict(
+                (k, _Dimension(k, len(d), d.isunlimited()))
+                for k, d in ds.dimensions.items())
+            attributes = dict((a, ds.getncattr(a)) for a in ds.ncattrs())
+        elif aggregations:
+            variables, dimensions, attributes = self.__aggregation(
+                aggregations[0], base)
+
+        self.__modify(element, variables, attributes)
+
+        return variables, dimensions, attributes
+
+    def __aggregation(self, element, base):
+        kind = element.get('type')
+        if kind == 'union':
+            variables = {}
+            dimensions = {}
+            attributes = {}
+            for member in _children(element, 'netcdf'):
+                v, d, a = self.__element(member, base)
+                for k in v:
+                    variables.setdefault(k, v[k])
+                for k in d:
+                    dimensions.setdefault(k, d[k])
+                for k in a:
+                    attributes.setdefault(k, a[k])
+
+            return variables, dimensions, attributes
+
+        if kind != 'joinExisting':
+            raise ValueError("Unsupported NcML aggregation: %s" % kind)
+
+        return self.__join(element, base)
+
+    def __join(self, element, base):
+        dim = element.get('dimName')
+
+        members = []
+        for child in element:
+            if _tag(child) == 'netcdf':
+                path = _path(child.get('location'), base)
+                ncoords = child.get('ncoords')
+                members.append(
+                    (path, int(ncoords) if ncoords is not None else None))
+            elif _tag(child) == 'scan':
+                members.extend((p, None) for p in _scan(child, base))
+
+        if not members:
+            raise ValueError("NcML aggregation has no members")
+
+        paths = [p for p, n in members]
+        lengths = [n if n is not None else _member_length(p, dim)
+                   for p, n in members]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        template = self.__template(paths[0])
+        variables = {}
+        for name, var in template.variables.items():
+            if dim in var.dimensions:
+                variables[name] = _JoinedVariable(
+                    self.__handles, var, name, var.dimensions.index(dim),
+                    paths, offsets)
+            else:
+                variables[name] = _Variable(name, var)
+
+        dimensions = dict(
+            (k, _Dimension(k, len(d), d.isunlimited()))
+            for k, d in template.dimensions.items())
+        dimensions[dim] = _Dimension(dim, int(offsets[-1]), True)
+        attributes = dict(
+            (a, template.getncattr(a)) for a in template.ncattrs())
+
+        return variables, dimensions, attributes
+
+    def __modify(self, element, variables, attributes):
+        """Applies the attribute, variable and remove elements"""
+        for child in element:
+            tag = _tag(child)
+            if tag == 'attribute':
+                attributes[child.get('name')] = _value(child)
+            elif tag == 'remove' and child.get('type') == 'variable':
+                variables.pop(child.get('name'), None)
+            elif tag == 'remove' and child.get('type') == 'attribute':
+                attributes.pop(child.get('name'), None)
+            elif tag == 'variable':
+                name = child.get('name')
+                var = variables.pop(child.get('orgName', name), None)
+                if var is None:
+                    continue
+
+                added = dict((a.get('name'), _value(a))
+                             for a in _children(child, 'attribute'))
+                removed = [r.get('name') for r in _children(child, 'remove')
+                           if r.get('type') == 'attribute']
+                if added or removed or name != var.name:
+                    var = _Variable(name, var, added, removed)
+                variables[name] = var
+
+    def ncattrs(self):
+        return list(self.__attributes)
+
+    def getncattr(self, name):
+        return self.__attributes[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.__attributes[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def isopen(self):
+        return all(ds.isopen() for ds in self.__open)
+
+    def close(self):
+        self.__handles.close()
+        for ds in self.__open:
+            try:
+                ds.close()
+            except RuntimeError:
+                pass
+        self.__open = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,14 +1,25 @@
-from pykdtree.kdtree import KDTree
-import pyresample
 import numpy as np
-import warnings
 from netcdf_data import NetCDFData
 from pint import UnitRegistry
-from data import Variable, VariableList
-import re
+import shared_store
+import curvilinear
+import settings
+import slab_plan
+import bottom
+import vertical
+import overview
+import executor
 
 RAD_FACTOR = np.pi / 180.0
 EARTH_RADIUS = 6378137.0
+LATLON_PAIRS = [
+    ['nav_lat_u', 'nav_lon_u'],
+    ['nav_lat_v', 'nav_lon_v'],
+    ['nav_lat', 'nav_lon'],
+    ['latitude_u', 'longitude_u'],
+    ['latitude_v', 'longitude_v'],
+    ['latitude', 'longitude'],
+]
 
 
 class Nemo(NetCDFData):
@@ -21,83 +32,140 @@ class Nemo(NetCDFData):
     @property
     def depths(self):
         if self.__depths is None:
-            var = None
-            for v in ['depth', 'deptht']:
-                if v in self._dataset.variables:
-                    var = self._dataset.variables[v]
-                    break
-
-            ureg = UnitRegistry()
-            unit = ureg.parse_units(var.units.lower())
-            self.__depths = ureg.Quantity(
-                var[:], unit
-            ).to(ureg.meters).magnitude
-            self.__depths.flags.writeable = False
+            self.__depths = shared_store.get_or_create(
+                self.url, 'depths', self.__read_depths,
+                [self._dataset.variables[v] for v in ['depth', 'deptht']
+                 if v in self._dataset.variables][:1])
 
         return self.__depths
 
-    @property
-    def variables(self):
-        l = []
-        for name in self._dataset.variables:
-            var = self._dataset.variables[name]
-            if 'long_name' in var.ncattrs():
-                long_name = var.long_name
-            else:
-                long_name = name
+    def __read_depths(self):
+        var = None
+        for v in ['depth', 'deptht']:
+            if v in self._dataset.variables:
+                var = self._dataset.variables[v]
+                break
+
+        ureg = UnitRegistry()
+        unit = ureg.parse_units(var.units.lower())
+        return ureg.Quantity(var[:], unit).to(ureg.meters).magnitude
+
+    def __coordinates(self, latvar, lonvar):
+        if self._coords.get(latvar.name) is None:
+            self._coords[latvar.name] = (
+                shared_store.get_or_create(self.url, latvar.name,
+                                           lambda: latvar[:], [latvar]),
+                shared_store.get_or_create(self.url, lonvar.name,
+                                           lambda: lonvar[:], [lonvar]),
+            )
 
-            if 'units' in var.ncattrs():
-                units = var.units
-            else:
-                units = None
+        return self._coords[latvar.name]
 
-            if 'valid_min' in var.ncattrs():
-                valid_min = float(re.sub(r"[^0-9\.\+,eE]", "",
-                                         str(var.valid_min)))
-                valid_max = float(re.sub(r"[^0-9\,\+,eE]", "",
-                                         str(var.valid_max)))
-            else:
-                valid_min = None
-                valid_max = None
+    def __bottom(self, variable):
+        if self._bottom.get(variable) is None:
+            self._bottom[variable] = bottom.load(
+                self.url, variable, self._dataset.variables[variable])
 
-            l.append(Variable(name, long_name, units, var.dimensions,
-                              valid_min, valid_max))
+        return self._bottom[variable]
 
-        return VariableList(l)
+    def __grid(self, latvar, lonvar, factor=1, step=1):
+        """The grid of a pair of coordinates, or of its overview of a factor,
+        read every step points, see __samples
+        """
+        key = (latvar.name, factor, step)
+        if self._grids.get(key) is None:
+            if factor == 1:
+                lat_in, lon_in = self.__coordinates(latvar, lonvar)
+            else:
+                lat_in = overview.coordinates(self.url, latvar.name, factor)
+                lon_in = overview.coordinates(self.url, lonvar.name, factor)
+
+            if (factor, step) == (1, 1):
+                self._grids[key] = curvilinear.CurvilinearGrid(
+                    self.url, latvar.name, lat_in, lon_in)
+            else:
+                rows = overview.samples(lat_in.shape[0], step)
+                columns = overview.samples(lat_in.shape[1], step)
+                self._samples[key] = (rows, columns)
+                self._grids[key] = curvilinear.CurvilinearGrid(
+                    self.url, "%s/%d/%d" % (latvar.name, factor, step),
+                    lat_in[np.ix_(rows, columns)],
+                    lon_in[np.ix_(rows, columns)])
+
+        return self._grids[key]
+
+    def __samples(self, latvar, factor, step, box):
+        """The rows and columns of an overview, or of the dataset, to read
+        for a slab at a stride
+
+        Arguments:
+            box -- the (miny, maxy, minx, maxx) of the slab in the dataset
+
+        Returns:
+            ys, xs -- the rows and columns to read
+            offset -- the index of the first one in the grid of the stride
+        """
+        rows, columns = self._samples[(latvar.name, factor, step)]
+        miny, maxy, minx, maxx = box
+
+        def limits(samples, low, high):
+            # A point wider, for the cells that straddle the edges
+            first = np.searchsorted(samples, low // factor, 'right') - 2
+            last = np.searchsorted(samples, -(-high // factor)) + 1
+            return max(first, 0), min(last, len(samples))
+
+        y0, y1 = limits(rows, miny, maxy)
+        x0, x1 = limits(columns, minx, maxx)
+
+        return list(rows[y0:y1]), list(columns[x0:x1]), (y0, x0)
+
+    def __level(self, latvar, lonvar, box, resolution, factors):
+        """The level of detail to read a slab at
+
+        Arguments:
+            box -- the (miny, maxy, minx, maxx) of the slab
+            resolution -- the spacing of the target points in metres, None
+                          to read every point
+            factors -- the factors of the overviews that can be read
+
+        Returns:
+            factor -- the overview to read, 1 for the dataset
+            step -- the stride to read it at
+        """
+        if not resolution:
+            return 1, 1
+
+        miny, maxy, minx, maxx = box
+        lat_in, lon_in = self.__coordinates(latvar, lonvar)
+        stride = overview.stride(
+            overview.spacing(lat_in[miny:maxy, minx:maxx],
+                             lon_in[miny:maxy, minx:maxx]),
+            resolution)
+
+        factor = max([f for f in factors if f <= stride] + [1])
+        return factor, max(1, stride // factor)
+
+    def __factors(self, latvar, variables, time, depth):
+        """The overview factors that all of the variables have"""
+        if depth == 'bottom' or vertical.is_metres(depth) or \
+                hasattr(time, "__len__") or \
+                overview.directory(self.url) is None:
+            return []
+
+        epoch = self.epoch_timestamps[time]
+        common = None
+        for v in variables:
+            source = overview.checksum(self.url, self._dataset.variables[v],
+                                       time)
+            f = set(overview.factors(self.url, v, epoch, source))
+            common = f if common is None else common & f
+
+        return sorted(
+            f for f in common
+            if overview.coordinates(self.url, latvar.name, f) is not None)
 
     def __find_index(self, lat, lon, latvar, lonvar, n=1):
-        if self._kdt.get(latvar.name) is None:
-            latvals = latvar[:] * RAD_FACTOR
-            lonvals = lonvar[:] * RAD_FACTOR
-            clat, clon = np.cos(latvals), np.cos(lonvals)
-            slat, slon = np.sin(latvals), np.sin(lonvals)
-            triples = np.array(list(zip(np.ravel(clat * clon),
-                                        np.ravel(clat * slon),
-                                        np.ravel(slat))))
-            self._kdt[latvar.name] = KDTree(triples)
-            del clat, clon
-            del slat, slon
-            del triples
-
-        if not hasattr(lat, "__len__"):
-            lat = [lat]
-            lon = [lon]
-
-        lat = np.array(lat)
-        lon = np.array(lon)
-
-        lat_rad = lat * RAD_FACTOR
-        lon_rad = lon * RAD_FACTOR
-        clat, clon = np.cos(lat_rad), np.cos(lon_rad)
-        slat, slon = np.sin(lat_rad), np.sin(lon_rad)
-        q = np.array([clat * clon, clat * slon, slat]).transpose()
-
-        dist_sq_min, minindex_1d = self._kdt[latvar.name].query(
-            np.float32(q),
-            k=n
-        )
-        iy_min, ix_min = np.unravel_index(minindex_1d, latvar.shape)
-        return iy_min, ix_min, dist_sq_min * EARTH_RADIUS
+        return self.__grid(latvar, lonvar).find_index(lat, lon, n)
 
     def __bounding_box(self, lat, lon, latvar, lonvar, n=10):
         y, x, d = self.__find_index(lat, lon, latvar, lonvar, n)
@@ -124,102 +192,149 @@ class Nemo(NetCDFData):
 
         return miny, maxy, minx, maxx, np.clip(np.amax(d), 5000, 50000)
 
-    def __resample(self, lat_in, lon_in, lat_out, lon_out, var, radius=50000):
-        if len(var.shape) == 3:
-            var = np.rollaxis(var, 0, 3)
-        elif len(var.shape) == 4:
-            var = np.rollaxis(var, 0, 4)
-            var = np.rollaxis(var, 0, 4)
+    def __slabs(self, lat, lon, latvar, lonvar, n=10):
+        """Groups the points into compact slabs, see slab_plan.plan
 
-        origshape = var.shape
-        var = var.reshape([var.shape[0], var.shape[1], -1])
-
-        def weight(r):
-            r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
-            return 1. / r ** 2
-
-        data = var[:]
+        Returns:
+            A list of (points, (miny, maxy, minx, maxx))
+        """
+        y, x, d = self.__find_index(lat, lon, latvar, lonvar, n)
+        y = np.reshape(y, (len(lat), -1))
+        x = np.reshape(x, (len(lat), -1))
+
+        return slab_plan.plan(y, x, latvar.shape)
+
+    def __resample(self, grid, miny, minx, lat_out, lon_out, arrays):
+        """Interpolates slabs to the points lat_out, lon_out, with the
+        CURVILINEAR_INTERPOLATION method
+
+        The arrays are stacked into one multi-channel array, so they share
+        one pass over the weights, each one keeping its own mask.
+
+        Returns:
+            A list with, for each array, the points in the first dimension
+            followed by the time and depth dimensions of the array
+        """
+        shapes = []
+        channels = []
+        for var in arrays:
+            if len(var.shape) == 3:
+                var = np.rollaxis(var, 0, 3)
+            elif len(var.shape) == 4:
+                var = np.rollaxis(var, 0, 4)
+                var = np.rollaxis(var, 0, 4)
+
+            shapes.append(var.shape[2:])
+            channels.append(
+                np.ma.asarray(var).reshape([var.shape[0], var.shape[1], -1]))
+
+        # All variables and depths are interpolated in one pass
+        output = grid.interpolate(
+            np.ma.concatenate(channels, axis=2), lat_out, lon_out,
+            offset=(miny, minx),
+            method=settings.get('CURVILINEAR_INTERPOLATION')
+        )
 
-        masked_lon_in = np.ma.array(lon_in)
-        masked_lat_in = np.ma.array(lat_in)
+        splits = np.cumsum([c.shape[2] for c in channels])[:-1]
+        return [
+            part.reshape((len(lat_out),) + shape)
+            for part, shape in zip(np.split(output, splits, axis=1), shapes)
+        ]
 
-        output_def = pyresample.geometry.SwathDefinition(
-            lons=np.ma.array(lon_out),
-            lats=np.ma.array(lat_out)
-        )
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-
-            if len(data.shape) == 3:
-                output = []
-                # multiple depths
-                for d in range(0, data.shape[2]):
-                    masked_lon_in.mask = masked_lat_in.mask = \
-                        data[:, :, d].view(np.ma.MaskedArray).mask
-                    input_def = pyresample.geometry.SwathDefinition(
-                        lons=masked_lon_in,
-                        lats=masked_lat_in
-                    )
-                    output.append(pyresample.kd_tree.resample_custom(
-                        input_def, data[:, :, d], output_def,
-                        radius_of_influence=float(radius),
-                        neighbours=10,
-                        weight_funcs=weight,
-                        fill_value=None, nprocs=4
-                    ))
-
-                output = np.ma.array(output).transpose()
+    def __read_points(self, latitude, longitude, latvar, lonvar, read,
+                      resolution=None, factors=[]):
+        """Reads and interpolates the points slab by slab
+
+        Slabs are read at a stride, or from an overview, when the target
+        points are far enough apart, see __level.
+
+        Arguments:
+            read -- read(ys, xs, factor) returns a list of arrays read from
+                    the rows ys and columns xs, slices or lists, of the
+                    overview of that factor, or of the dataset for 1
+            resolution -- the spacing of the target points in metres
+            factors -- the overview factors that read can read
+
+        Returns:
+            A list of the interpolated arrays, squeezed
+        """
+        # The slabs are read concurrently, each thread with its own handle
+        slabs = []
+        reads = []
+        for points, box in self.__slabs(latitude, longitude, latvar, lonvar):
+            factor, step = self.__level(latvar, lonvar, box, resolution,
+                                        factors)
+            grid = self.__grid(latvar, lonvar, factor, step)
+            if (factor, step) == (1, 1):
+                miny, maxy, minx, maxx = box
+                ys, xs = slice(miny, maxy), slice(minx, maxx)
+                offset = (miny, minx)
             else:
-                masked_lon_in.mask = masked_lat_in.mask = \
-                    var[:].view(np.ma.MaskedArray).mask
-                input_def = pyresample.geometry.SwathDefinition(
-                    lons=masked_lon_in,
-                    lats=masked_lat_in
-                )
-                output = pyresample.kd_tree.resample_custom(
-                    input_def, data, output_def,
-                    radius_of_influence=float(radius),
-                    neighbours=10,
-                    weight_funcs=weight,
-                    fill_value=None, nprocs=4
-                )
-
-        if len(origshape) == 4:
-            output = output.reshape(origshape[2:])
-
-        return np.squeeze(output)
+                ys, xs, offset = self.__samples(latvar, factor, step, box)
+
+            slabs.append((points, grid, offset))
+            reads.append((self, lambda d, ys=ys, xs=xs, factor=factor:
+                          read(ys, xs, factor)))
+
+        results = None
+        for (points, grid, offset), slab in zip(slabs,
+                                                executor.fetch(reads)):
+            parts = self.__resample(grid, offset[0], offset[1],
+                                    latitude[points], longitude[points],
+                                    slab)
+
+            if results is None:
+                results = [
+                    np.ma.masked_all((len(latitude),) + p.shape[1:],
+                                     dtype=p.dtype)
+                    for p in parts
+                ]
+            for result, part in zip(results, parts):
+                result[points] = part
+
+        return [np.squeeze(r) for r in results]
 
     def __init__(self, url):
         super(Nemo, self).__init__(url)
-        self._kdt = {}
+        self._grids = {}
+        self._samples = {}
+        self._coords = {}
+        self._bottom = {}
 
     def __enter__(self):
         super(Nemo, self).__enter__()
 
         return self
 
+    def preload(self):
+        for p in LATLON_PAIRS:
+            if p[0] in self._dataset.variables:
+                self.__find_index(0, 0,
+                                  self._dataset.variables[p[0]],
+                                  self._dataset.variables[p[1]])
+
+        if set(self.depth_dimensions) & set(self._dataset.variables):
+            self.depths
+
+        # Finding the bottom of every column reads every level, it's done
+        # once here rather than on the first bottom request
+        for name in bottom.variables(self._dataset.variables,
+                                     self.depth_dimensions):
+            self.__bottom(name)
+
     def __latlon_vars(self, variable):
         var = self._dataset.variables[variable]
 
-        pairs = [
-            ['nav_lat_u', 'nav_lon_u'],
-            ['nav_lat_v', 'nav_lon_v'],
-            ['nav_lat', 'nav_lon'],
-            ['latitude_u', 'longitude_u'],
-            ['latitude_v', 'longitude_v'],
-            ['latitude', 'longitude'],
-        ]
-
         if 'coordinates' in var.ncattrs():
             coordinates = var.coordinates.split()
-            for p in pairs:
+            for p in LATLON_PAIRS:
                 if p[0] in coordinates:
                     return (
                         self._dataset.variables[p[0]],
                         self._dataset.variables[p[1]]
                     )
         else:
-            for p in pairs:
+            for p in LATLON_PAIRS:
                 if p[0] in self._dataset.variables:
                     return (
                         self._dataset.variables[p[0]],
@@ -230,6 +345,7 @@ class Nemo(NetCDFData):
 
     def get_raw_point(self, latitude, longitude, depth, time, variable):
         latvar, lonvar = self.__latlon_vars(variable)
+        lat_in, lon_in = self.__coordinates(latvar, lonvar)
         miny, maxy, minx, maxx, radius = self.__bounding_box(
             latitude, longitude, latvar, lonvar, 10)
 
@@ -237,35 +353,16 @@ class Nemo(NetCDFData):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        var = self._dataset.variables[variable]
+        var = self._variable(variable)
 
         if depth == 'bottom':
-            if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
-            else:
-                d = var[time, :, miny:maxy, minx:maxx]
-
-            reshaped = d.reshape([d.shape[0], -1])
-
-            edges = np.array(np.ma.notmasked_edges(reshaped, axis=0))
-            depths = edges[1, 0, :]
-            indices = edges[1, 1, :]
-
-            if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
-                data_in = data_in.reshape(
-                    [data_in.shape[0], data_in.shape[1], -1])
-                data = []
-                for i, t in enumerate(time):
-                    data.append(data_in[i, depths, indices])
-                data = np.ma.array(data).reshape([len(time), d.shape[-2],
-                                                  d.shape[-1]])
-            else:
-                data = np.ma.MaskedArray(np.zeros(d.shape[1:]),
-                                         mask=True,
-                                         dtype=d.dtype)
-                data[np.unravel_index(indices, data.shape)] = \
-                    reshaped[depths, indices]
+            data = bottom.gather(var, time,
+                                 self.__bottom(variable)[miny:maxy,
+                                                         minx:maxx],
+                                 miny, minx)
+        elif len(var.shape) == 4 and vertical.is_metres(depth):
+            data = vertical.read(var, time, self.depths, depth,
+                                 (slice(miny, maxy), slice(minx, maxx)))
         else:
             if len(var.shape) == 4:
                 data = var[time, depth, miny:maxy, minx:maxx]
@@ -273,116 +370,111 @@ class Nemo(NetCDFData):
                 data = var[time, miny:maxy, minx:maxx]
 
         return (
-            latvar[miny:maxy, minx:maxx],
-            lonvar[miny:maxy, minx:maxx],
+            lat_in[miny:maxy, minx:maxx],
+            lon_in[miny:maxy, minx:maxx],
             data
         )
 
     def get_point(self, latitude, longitude, depth, time, variable,
-                  return_depth=False):
-        latvar, lonvar = self.__latlon_vars(variable)
-        miny, maxy, minx, maxx, radius = self.__bounding_box(
-            latitude, longitude, latvar, lonvar, 10)
+                  return_depth=False, resolution=None):
+        if isinstance(variable, list):
+            return self.__get_points(latitude, longitude, depth, time,
+                                     variable, return_depth, resolution)
+
+        return self.__get_points(latitude, longitude, depth, time,
+                                 [variable], return_depth, resolution)[0]
 
+    def __get_points(self, latitude, longitude, depth, time, variables,
+                     return_depth, resolution):
+        """get_point for a list of variables
+
+        Variables on the same grid are read from the same slabs and
+        interpolated together.
+        """
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
-
-        var = self._dataset.variables[variable]
-
-        if depth == 'bottom':
-            if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
-            else:
-                d = var[time, :, miny:maxy, minx:maxx]
-
-            reshaped = d.reshape([d.shape[0], -1])
-
-            edges = np.array(np.ma.notmasked_edges(reshaped, axis=0))
-            depths = edges[1, 0, :]
-            indices = edges[1, 1, :]
-
-            if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
-                data_in = data_in.reshape(
-                    [data_in.shape[0], data_in.shape[1], -1])
-                data = []
-                for i, t in enumerate(time):
-                    di = np.ma.MaskedArray(np.zeros(data_in.shape[-1]),
-                                           mask=True,
-                                           dtype=data_in.dtype)
-                    di[indices] = data_in[i, depths, indices]
-                    data.append(di)
-                data = np.ma.array(data).reshape([len(time), d.shape[-2],
-                                                  d.shape[-1]])
-            else:
-                data = np.ma.MaskedArray(np.zeros(d.shape[1:]),
-                                         mask=True,
-                                         dtype=d.dtype)
-                data[np.unravel_index(indices, data.shape)] = \
-                    reshaped[depths, indices]
-
-            res = self.__resample(
-                latvar[miny:maxy, minx:maxx],
-                lonvar[miny:maxy, minx:maxx],
-                latitude, longitude,
-                data,
-                radius
-            )
-
-            if return_depth:
-                d = self.depths[depths]
-                d = np.zeros(data.shape)
-                d[np.unravel_index(indices, d.shape)] = self.depths[depths]
-
-                dep = self.__resample(
-                    latvar[miny:maxy, minx:maxx],
-                    lonvar[miny:maxy, minx:maxx],
-                    latitude, longitude,
-                    np.reshape(d, data.shape),
-                    radius
-                )
-
-        else:
-            if len(var.shape) == 4:
-                data = var[time, depth, miny:maxy, minx:maxx]
+        latitude = np.asarray(latitude)
+        longitude = np.asarray(longitude)
+
+        grids = []
+        for v in variables:
+            latvar, lonvar = self.__latlon_vars(v)
+            for g in grids:
+                if g[0].name == latvar.name:
+                    g[2].append(v)
+                    break
             else:
-                data = var[time, miny:maxy, minx:maxx]
-            res = self.__resample(
-                latvar[miny:maxy, minx:maxx],
-                lonvar[miny:maxy, minx:maxx],
-                latitude, longitude,
-                data,
-                radius
-            )
-
-            if return_depth:
-                dep = self.depths[depth]
-                dep = np.tile(dep, len(latitude))
-                if hasattr(time, "__len__"):
-                    dep = np.array([dep] * len(time))
-
-        if return_depth:
-            return res, dep
-        else:
-            return res
+                grids.append((latvar, lonvar, [v]))
+
+        results = {}
+        for latvar, lonvar, names in grids:
+            factors = self.__factors(latvar, names, time, depth)
+
+            def read(ys, xs, factor):
+                arrays = []
+                for v in names:
+                    var = self._variable(v)
+                    if factor > 1:
+                        arrays.append(overview.read(
+                            self.url, v, factor, self.epoch_timestamps[time],
+                            depth, ys, xs))
+                    elif depth == 'bottom':
+                        index = self.__bottom(v)[ys, xs]
+                        arrays.append(
+                            bottom.gather(var, time, index, ys.start,
+                                          xs.start))
+
+                        if return_depth:
+                            d = bottom.depth(self.depths, index)
+                            if hasattr(time, "__len__"):
+                                d = np.ma.array([d] * len(time))
+                            arrays.append(d)
+                    elif len(var.shape) == 4 and vertical.is_metres(depth):
+                        arrays.append(vertical.read(
+                            var, time, self.depths, depth, (ys, xs)))
+                    elif len(var.shape) == 4:
+                        arrays.append(var[time, depth, ys, xs])
+                    else:
+                        arrays.append(var[time, ys, xs])
+
+                return arrays
+
+            # The bottom index maps are only read at full resolution
+            parts = self.__read_points(
+                latitude, longitude, latvar, lonvar, read,
+                resolution if depth != 'bottom' else None, factors)
+            for v in names:
+                res = parts.pop(0)
+                if not return_depth:
+                    results[v] = res
+                    continue
+
+                if depth == 'bottom':
+                    dep = parts.pop(0)
+                else:
+                    dep = vertical.metres(self.depths, depth)
+                    dep = np.tile(dep, len(latitude))
+                    if hasattr(time, "__len__"):
+                        dep = np.array([dep] * len(time))
+
+                results[v] = (res, dep)
+
+        return [results[v] for v in variables]
 
     def get_profile(self, latitude, longitude, time, variable):
         latvar, lonvar = self.__latlon_vars(variable)
-        miny, maxy, minx, maxx, radius = self.__bounding_box(
-            latitude, longitude, latvar, lonvar, 10)
 
         if not hasattr(latitude, "__len__"):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
-
-        var = self._dataset.variables[variable]
-        res = self.__resample(
-            latvar[miny:maxy, minx:maxx],
-            lonvar[miny:maxy, minx:maxx],
-            [latitude], [longitude],
-            var[time, :, miny:maxy, minx:maxx],
-            radius
-        )
+        latitude = np.asarray(latitude)
+        longitude = np.asarray(longitude)
+
+        # The variable of the handle of the thread that reads the slab
+        res = self.__read_points(
+            latitude, longitude, latvar, lonvar,
+            lambda ys, xs, factor: [
+                self._variable(variable)[time, :, ys, xs]])[0]
 
         return res, np.squeeze([self.depths] * len(latitude))
@@ -1,42 +1,171 @@
-from netCDF4 import Dataset, netcdftime
-from data import Data
-from cachetools import TTLCache
-import pytz
-import numpy as np
+from data import Data, Variable, VariableList
+import threading
+import re
+import overview
+import pool
+import slab_cache
+import timestamps
 
 
 class NetCDFData(Data):
 
     def __init__(self, url):
-        self._dataset = None
-        self.__timestamp_cache = TTLCache(1, 3600)
+        self.__local = threading.local()
+        self.__timestamps = timestamps.Timestamps(3600)
+        self.__catalog = (None, None)
         super(NetCDFData, self).__init__(url)
 
+    @property
+    def _dataset(self):
+        return getattr(self.__local, 'dataset', None)
+
     def __enter__(self):
-        self._dataset = Dataset(self.url, 'r')
+        # The instance is shared between threads, each thread gets its own
+        # pooled handle. Nested with blocks in a thread share the handle.
+        depth = getattr(self.__local, 'depth', 0)
+        if depth == 0:
+            self.__local.dataset = pool.acquire(self.url)
+        self.__local.depth = depth + 1
 
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self._dataset.close()
+        self.__local.depth -= 1
+        if self.__local.depth == 0:
+            # A handle that raised an I/O error may be broken, don't keep it
+            pool.release(
+                self.__local.dataset,
+                discard=exc_type is not None and
+                issubclass(exc_type, (IOError, RuntimeError))
+            )
+            self.__local.dataset = None
+
+    def _time_variable(self):
+        for v in ['time', 'time_counter']:
+            if v in self._dataset.variables:
+                return self._dataset.variables[v]
+
+        return None
+
+    def _time_decoder(self, var):
+        """Returns the function that converts values of the time variable
+        to epoch seconds
+        """
+        if 'calendar' in var.ncattrs():
+            return timestamps.numeric_decoder(var.units, var.calendar)
+        else:
+            return timestamps.numeric_decoder(var.units)
+
+    def __refresh_timestamps(self):
+        var = self._time_variable()
+        self.__timestamps.refresh(var, self._time_decoder(var))
+
+        return self.__timestamps
 
     @property
     def timestamps(self):
-        if self.__timestamp_cache.get("timestamps") is None:
-            var = None
-            for v in ['time', 'time_counter']:
-                if v in self._dataset.variables:
-                    var = self._dataset.variables[v]
-                    break
-
-            t = netcdftime.utime(var.units)
-            timestamps = np.array(
-                map(
-                    lambda ts: t.num2date(ts).replace(tzinfo=pytz.UTC),
-                    var[:]
-                )
-            )
-            timestamps.flags.writeable = False
-            self.__timestamp_cache["timestamps"] = timestamps
+        return self.__refresh_timestamps().datetimes
+
+    @property
+    def epoch_timestamps(self):
+        """The timestamps as an int64 array of seconds since 1970-01-01 UTC"""
+        return self.__refresh_timestamps().epoch
+
+    def timestamps_json(self, quantum=None):
+        """The timestamps serialized for the timestamps API
+
+        Arguments:
+            quantum -- 'month' to snap each timestamp to the 15th of its month
+        """
+        return self.__refresh_timestamps().json(quantum)
+
+    def _variable(self, variable):
+        """Returns a variable whose slab reads go through the block cache
+
+        Blocks are cached by time index. Forecast aggregations that drop
+        their oldest times shift those indices, so the first timestamp is
+        part of the cache key. Forecast reruns rewrite the values of the
+        same times, through to the last one, so the checksum of the last
+        time step is too, see overview.checksum.
+        """
+        var = self._dataset.variables[variable]
+
+        leading = set(self.depth_dimensions + ['time', 'time_counter'])
+        spatial = 0
+        for d in reversed(var.dimensions):
+            if d in leading:
+                break
+            spatial += 1
+
+        generation = None
+        if self._time_variable() is not None and \
+                len(self.epoch_timestamps) > 0:
+            generation = self.epoch_timestamps[0]
+            if var.dimensions and \
+                    var.dimensions[0] in ['time', 'time_counter'] and \
+                    len(var) > 0:
+                generation = (generation, overview.checksum(
+                    self.url, var, len(var) - 1))
+
+        return slab_cache.CachedVariable((self.url, variable, generation),
+                                         var, spatial)
+
+    def _include_variable(self, var):
+        """Whether a netCDF variable is listed in variables"""
+        return True
+
+    def __build_catalog(self):
+        l = []
+        for name in self._dataset.variables:
+            var = self._dataset.variables[name]
+            attrs = var.ncattrs()
+            if not self._include_variable(var):
+                continue
+
+            if 'long_name' in attrs:
+                long_name = var.long_name
+            else:
+                long_name = name
+
+            if 'units' in attrs:
+                units = var.units
+            else:
+                units = None
+
+            if 'valid_min' in attrs:
+                valid_min = float(re.sub(r"[^0-9\.\+\-eE]", "",
+                                         str(var.valid_min)))
+                valid_max = float(re.sub(r"[^0-9\.\+\-eE]", "",
+                                         str(var.valid_max)))
+
+                # The valid range of packed data, e.g. of a packed mirror,
+                # is in packed units
+                if 'scale_factor' in attrs:
+                    valid_min *= float(var.scale_factor)
+                    valid_max *= float(var.scale_factor)
+                if 'add_offset' in attrs:
+                    valid_min += float(var.add_offset)
+                    valid_max += float(var.add_offset)
+            else:
+                valid_min = None
+                valid_max = None
+
+            l.append(Variable(name, long_name, units, var.dimensions,
+                              valid_min, valid_max))
+
+        return VariableList(l)
+
+    @property
+    def variables(self):
+        """The variable catalog of the dataset
+
+        Built once, and rebuilt only if the set of variables in the dataset
+        changes.
+        """
+        names = tuple(self._dataset.variables)
+        catalog_names, catalog = self.__catalog
+        if catalog is None or catalog_names != names:
+            catalog = self.__build_catalog()
+            self.__catalog = (names, catalog)
 
-        return self.__timestamp_cache.get("timestamps")
+        return catalog
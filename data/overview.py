@@ -0,0 +1,323 @@
+import numpy as np
+import hashlib
+import itertools
+import os
+import time as clock
+import grid_index
+import pool
+import settings
+import shared_store
+
+EARTH_RADIUS = 6378137.0
+
+# Points sampled along each axis to estimate the spacing of a grid
+SPACING_SAMPLES = 64
+
+# Points sampled along each horizontal axis of a time step to check that
+# its overviews were built from the current source
+SOURCE_SAMPLES = 16
+
+# Seconds a checksum of the source is trusted for before it's read again
+SOURCE_CHECK_INTERVAL = 60
+
+_sources = {}
+
+
+def spacing(lat, lon):
+    """The median distance between neighbouring points of a 2-D grid
+
+    Large grids are sampled, SPACING_SAMPLES points along each axis.
+
+    Returns:
+        The distance in metres, or None if lat isn't a 2-D grid
+    """
+    lat = np.ma.getdata(lat)
+    lon = np.ma.getdata(lon)
+    if np.ndim(lat) != 2 or min(np.shape(lat)) < 2:
+        return None
+
+    sy = max(1, lat.shape[0] // SPACING_SAMPLES)
+    sx = max(1, lat.shape[1] // SPACING_SAMPLES)
+    lat = lat[::sy, ::sx]
+    lon = lon[::sy, ::sx]
+    if min(lat.shape) < 2:
+        return None
+
+    xyz = grid_index.to_xyz(lat, lon, np.float64).reshape(lat.shape + (3,))
+    dy = np.linalg.norm(xyz[1:] - xyz[:-1], axis=-1) / sy
+    dx = np.linalg.norm(xyz[:, 1:] - xyz[:, :-1], axis=-1) / sx
+
+    return float(np.median(np.concatenate((dy.ravel(), dx.ravel())))) * \
+        EARTH_RADIUS
+
+
+def stride(source, target, samples=None):
+    """The stride to read a grid at for target points of some spacing
+
+    Arguments:
+        source -- the spacing of the source grid, in metres
+        target -- the spacing of the target points, in metres
+        samples -- the source points kept per target point along each
+                   axis, defaults to LOD_SAMPLES_PER_PIXEL
+
+    Returns:
+        1 to read every point, n to read every nth point
+    """
+    if samples is None:
+        samples = settings.get('LOD_SAMPLES_PER_PIXEL')
+    if not samples or not source or not target:
+        return 1
+
+    return max(1, int(target / (source * samples)))
+
+
+def samples(n, step):
+    """The indices read along a dimension of n points at a stride
+
+    The last point is always read, so the grid still reaches its edge.
+    """
+    index = np.arange(0, n, step)
+    if index[-1] != n - 1:
+        index = np.append(index, n - 1)
+
+    return index
+
+
+def coarsen(data, factor):
+    """The means of factor x factor blocks of the last two dimensions
+
+    Masked points are left out of the means, blocks with no unmasked point
+    are masked. Partial blocks at the edges are kept.
+    """
+    data = np.ma.asarray(data)
+    lead = data.shape[:-2]
+    ny, nx = data.shape[-2:]
+    cy = -(-ny // factor)
+    cx = -(-nx // factor)
+
+    padded = np.ma.masked_all(lead + (cy * factor, cx * factor),
+                              dtype=np.float64)
+    padded[..., :ny, :nx] = data
+
+    blocks = padded.reshape(lead + (cy, factor, cx, factor))
+    total = blocks.sum(axis=-1).sum(axis=-2)
+    count = blocks.count(axis=-1).sum(axis=-2)
+
+    return np.ma.masked_where(count == 0, total / np.maximum(count, 1))
+
+
+def coarsen_coordinates(lat, lon, factor):
+    """The centres of factor x factor blocks of a 2-D grid"""
+    xyz = grid_index.to_xyz(lat, lon, np.float64).reshape(
+        np.shape(lat) + (3,))
+    x, y, z = [np.ma.getdata(coarsen(xyz[..., i], factor)) for i in range(3)]
+
+    return (np.degrees(np.arctan2(z, np.hypot(x, y))),
+            np.degrees(np.arctan2(y, x)))
+
+
+def directory(url):
+    """The overview directory of a dataset, None if OVERVIEW_DIR isn't set"""
+    if settings.get('OVERVIEW_DIR') is None or url is None:
+        return None
+
+    return os.path.join(settings.get('OVERVIEW_DIR'),
+                        hashlib.sha1(url).hexdigest())
+
+
+def _path(url, factor, name, entry):
+    return os.path.join(directory(url), str(factor), name, entry + '.npy')
+
+
+def _checksum(var, time):
+    """A checksum of a time step of a variable
+
+    Forecast reruns rewrite the same timestamps, so each overview records
+    the checksum of the time step it was built from. It covers
+    SOURCE_SAMPLES points along each horizontal axis of the first level,
+    and the last point, so the time step isn't read in full.
+    """
+    lead = (time,) + (0,) * max(0, len(var.shape) - 3)
+    step = tuple(slice(None, None, max(1, -(-n // SOURCE_SAMPLES)))
+                 for n in var.shape[len(lead):])
+    last = (time,) + tuple(n - 1 for n in var.shape[1:])
+
+    result = hashlib.sha1()
+    for index in (lead + step, last):
+        result.update(np.ascontiguousarray(
+            np.ma.getdata(var[index])).tobytes())
+
+    return result.hexdigest()
+
+
+def checksum(url, var, time):
+    """The checksum of a time step of a source variable, see _checksum
+
+    Checksums are kept for SOURCE_CHECK_INTERVAL seconds, so a rerun is
+    noticed that long after it's written at most.
+
+    Arguments:
+        url -- the dataset url
+        var -- the netCDF variable
+        time -- the time index
+    """
+    key = (url, var.name, time)
+    checked, result = _sources.get(key, (None, None))
+    if checked is None or clock.time() - checked > SOURCE_CHECK_INTERVAL:
+        result = _checksum(var, time)
+        _sources[key] = (clock.time(), result)
+
+    return result
+
+
+def _source(url, factor, variable, epoch):
+    """The checksum an overview was built from, None if it has none"""
+    try:
+        return str(np.load(
+            _path(url, factor, variable, str(int(epoch)) + '.source'))[()])
+    except (IOError, ValueError):
+        return None
+
+
+def factors(url, variable, epoch, source=None):
+    """The factors of the overviews of a variable at a time
+
+    Arguments:
+        url -- the dataset url
+        variable -- the variable name
+        epoch -- the timestamp, in seconds since the epoch
+        source -- the checksum of the time step, see checksum. Overviews
+                  built from another source, e.g. an earlier run of a
+                  forecast, are left out.
+
+    Returns:
+        A sorted list of factors, empty if there are no overviews
+    """
+    root = directory(url)
+    if root is None or not os.path.isdir(root):
+        return []
+
+    return sorted(
+        int(f) for f in os.listdir(root)
+        if f.isdigit() and
+        os.path.exists(_path(url, f, variable, str(int(epoch)))) and
+        (source is None or _source(url, f, variable, epoch) == source)
+    )
+
+
+def coordinates(url, name, factor):
+    """Memory maps a coarsened coordinate array, None if there isn't one"""
+    try:
+        return np.load(_path(url, factor, 'coords', name), mmap_mode='r')
+    except (IOError, ValueError):
+        return None
+
+
+def read(url, variable, factor, epoch, depth, ys, xs):
+    """Reads a slab of an overview
+
+    Arguments:
+        url -- the dataset url
+        variable -- the variable name
+        factor -- the factor of the overview
+        epoch -- the timestamp, in seconds since the epoch
+        depth -- the level, ignored for variables without levels
+        ys, xs -- the rows and columns of the coarsened grid, lists
+
+    Returns:
+        A masked array
+    """
+    data = np.load(_path(url, factor, variable, str(int(epoch))),
+                   mmap_mode='r')
+    if data.ndim == 3:
+        data = data[depth]
+    data = data[np.ix_(ys, xs)]
+
+    return np.ma.masked_invalid(np.array(data))
+
+
+def build(url, variables, pairs, factors, epochs, times=None):
+    """Writes the overviews of some variables of a dataset
+
+    Each time step of each variable is coarsened by each factor and stored
+    as a float32 array, NaN where masked, with the checksum of the time
+    step and next to the coarsened coordinates of the grid. The source is
+    read one time and level at a time.
+
+    Arguments:
+        url -- the dataset url, as the dataset was opened with
+        variables -- the names of the variables
+        pairs -- the names of the (latitude, longitude) variables of the
+                 grids, those in the dataset are coarsened
+        factors -- the factors to coarsen by, e.g. [4, 16]
+        epochs -- the timestamps of the dataset, in seconds since the epoch
+        times -- the time indices to build, defaults to all of them
+    """
+    if directory(url) is None:
+        raise ValueError("OVERVIEW_DIR isn't set")
+
+    if times is None:
+        times = range(len(epochs))
+
+    src = pool.acquire(url)
+    try:
+        for latname, lonname in pairs:
+            if latname not in src.variables or \
+                    len(src.variables[latname].shape) != 2:
+                continue
+
+            lat = np.ma.getdata(src.variables[latname][:])
+            lon = np.ma.getdata(src.variables[lonname][:])
+            for f in factors:
+                clat, clon = coarsen_coordinates(lat, lon, f)
+                shared_store.save(_path(url, f, 'coords', latname), clat)
+                shared_store.save(_path(url, f, 'coords', lonname), clon)
+
+        for name in variables:
+            var = src.variables[name]
+            lead = var.shape[1:-2]
+            for t in times:
+                # Taken first, a rerun written during the build leaves a
+                # checksum that doesn't match
+                source = _checksum(var, t)
+
+                coarse = dict((f, []) for f in factors)
+                for l in itertools.product(*[range(n) for n in lead]):
+                    level = np.ma.asarray(var[(t,) + l])
+                    for f in factors:
+                        coarse[f].append(coarsen(level, f))
+
+                for f in factors:
+                    data = np.ma.array(coarse[f])
+                    data = data.reshape(lead + data.shape[-2:])
+                    shared_store.save(
+                        _path(url, f, name, str(int(epochs[t]))),
+                        data.astype(np.float32).filled(np.nan))
+                    shared_store.save(
+                        _path(url, f, name, str(int(epochs[t])) + '.source'),
+                        np.array(source))
+    finally:
+        pool.release(src)
+
+
+def prune(url, epochs):
+    """Removes the overviews of times that are no longer in the dataset
+
+    Arguments:
+        url -- the dataset url
+        epochs -- the timestamps of the dataset, in seconds since the epoch
+    """
+    root = directory(url)
+    if root is None or not os.path.isdir(root):
+        return
+
+    keep = set(str(int(e)) for e in epochs)
+    for factor in os.listdir(root):
+        for name in os.listdir(os.path.join(root, factor)):
+            if name == 'coords':
+                continue
+
+            path = os.path.join(root, factor, name)
+            for entry in os.listdir(path):
+                if entry.split('.')[0] not in keep:
+                    os.remove(os.path.join(path, entry))
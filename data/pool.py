@@ -0,0 +1,178 @@
+from netCDF4 import Dataset
+import os
+import threading
+import time
+import settings
+import ncml
+
+_pool = None
+
+
+def _open(url):
+    if ncml.is_local(url):
+        return ncml.NcmlDataset(url)
+
+    return Dataset(url, 'r')
+
+
+class DatasetPool(object):
+
+    """A pool of open netCDF4 Dataset handles, keyed by url
+
+    Opening an OPeNDAP url costs a DDS/DAS round trip, so handles are kept
+    open after use and handed out again to the next request for the same
+    url. A handle is only used by one caller at a time; concurrent requests
+    for the same url get their own handles.
+
+    A handle keeps the metadata it read when it was opened, e.g. the times
+    of an OPeNDAP aggregation, or the version a mirror symlink pointed to.
+    Handles are reopened once they are max_age seconds old, even if they
+    are never idle for long.
+
+    Arguments:
+        size -- the maximum number of idle handles kept open
+        idle_timeout -- idle handles older than this many seconds are closed
+        max_age -- handles opened more than this many seconds ago are
+                   closed when they are released or found idle, None to
+                   keep them
+        opener -- function that opens a url, defaults to netCDF4.Dataset,
+                  or NcmlDataset for local NcML files
+    """
+
+    def __init__(self, size=16, idle_timeout=300, opener=None,
+                 max_age=None):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.__opener = opener or _open
+        self.__lock = threading.Lock()
+        self.__reset()
+
+    def __reset(self):
+        # Handles inherited from a parent process are not ours to use or
+        # close.
+        self.__pid = os.getpid()
+        self.__idle = []
+        self.__in_use = {}
+
+    def __check_pid(self):
+        if self.__pid != os.getpid():
+            self.__reset()
+
+    @staticmethod
+    def __healthy(handle):
+        try:
+            return handle.isopen()
+        except Exception:
+            return False
+
+    @staticmethod
+    def __close(handle):
+        try:
+            handle.close()
+        except Exception:
+            pass
+
+    def __old(self, opened, now):
+        return self.max_age is not None and now - opened > self.max_age
+
+    def __expire(self, now):
+        """Removes expired and excess idle handles, returns them"""
+        expired = [h for h in self.__idle
+                   if now - h[2] > self.idle_timeout or self.__old(h[3], now)]
+        self.__idle = [h for h in self.__idle if h not in expired]
+
+        excess = len(self.__idle) - self.size
+        if excess > 0:
+            expired.extend(self.__idle[:excess])
+            self.__idle = self.__idle[excess:]
+
+        return [h[1] for h in expired]
+
+    def acquire(self, url):
+        """Returns an open handle for url, reusing an idle one if possible"""
+        handle = None
+        with self.__lock:
+            self.__check_pid()
+            stale = self.__expire(time.time())
+
+            for i in range(len(self.__idle) - 1, -1, -1):
+                if self.__idle[i][0] == url:
+                    entry = self.__idle.pop(i)
+                    handle = (entry[1], entry[3])
+                    break
+
+        for h in stale:
+            self.__close(h)
+
+        if handle is not None and not self.__healthy(handle[0]):
+            self.__close(handle[0])
+            handle = None
+
+        if handle is None:
+            handle = (self.__opener(url), time.time())
+
+        with self.__lock:
+            self.__in_use[id(handle[0])] = (url, handle[1])
+
+        return handle[0]
+
+    def release(self, handle, discard=False):
+        """Returns a handle to the pool
+
+        Arguments:
+            handle -- a handle returned by acquire
+            discard -- close the handle instead of keeping it
+        """
+        with self.__lock:
+            self.__check_pid()
+            now = time.time()
+            url, opened = self.__in_use.pop(id(handle), (None, None))
+            if url is None or discard or self.size <= 0 or \
+                    self.__old(opened, now):
+                stale = [handle]
+            else:
+                self.__idle.append((url, handle, now, opened))
+                stale = self.__expire(now)
+
+        for h in stale:
+            self.__close(h)
+
+    def clear(self):
+        """Closes all idle handles"""
+        with self.__lock:
+            self.__check_pid()
+            idle = self.__idle
+            self.__idle = []
+
+        for h in idle:
+            self.__close(h[1])
+
+    @property
+    def idle(self):
+        with self.__lock:
+            self.__check_pid()
+            return len(self.__idle)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = DatasetPool(settings.get('DATASET_POOL_SIZE'),
+                            settings.get('DATASET_POOL_IDLE_TIMEOUT'),
+                            max_age=settings.get('DATASET_POOL_MAX_AGE'))
+
+    return _pool
+
+
+def acquire(url):
+    return _get_pool().acquire(url)
+
+
+def release(handle, discard=False):
+    _get_pool().release(handle, discard)
+
+
+def clear():
+    if _pool is not None:
+        _pool.clear()
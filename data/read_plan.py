@@ -0,0 +1,181 @@
+import numpy as np
+import itertools
+import settings
+
+
+def _is_list(i):
+    return not isinstance(i, slice) and hasattr(i, "__len__")
+
+
+def runs(values):
+    """Splits sorted unique indices into evenly spaced runs
+
+    Arguments:
+        values -- sorted, unique integers
+
+    Returns:
+        A list of (first, last, step) positions into values, each one a run
+        that can be read as a single strided slice
+    """
+    result = []
+    i = 0
+    while i < len(values):
+        j = i
+        if i + 1 < len(values):
+            step = values[i + 1] - values[i]
+            j = i + 1
+            while j + 1 < len(values) and values[j + 1] - values[j] == step:
+                j += 1
+        else:
+            step = 1
+
+        result.append((i, j + 1, step))
+        i = j + 1
+
+    return result
+
+
+def slices(values, max_entries=None):
+    """Plans the reads of a list of indices along one dimension
+
+    Arguments:
+        values -- sorted, unique integers
+        max_entries -- the maximum number of indices in one read
+
+    Returns:
+        A list of (read, positions) pairs, where read is the slice to read
+        from the variable and positions the slice of values it covers
+    """
+    result = []
+    for first, last, step in runs(values):
+        size = max_entries or (last - first)
+        for k in range(first, last, size):
+            end = min(k + size, last)
+            result.append((
+                slice(values[k], values[end - 1] + 1, step),
+                slice(k, end)
+            ))
+
+    return result
+
+
+def read(var, index, chunk_bytes=None):
+    """Reads var[index], where index may contain lists of indices
+
+    netCDF4, and OPeNDAP in particular, are much slower with lists of
+    indices than with slices. Each list is split into contiguous or strided
+    slices, and the first list is read in chunks of at most chunk_bytes.
+
+    Arguments:
+        var -- the netCDF variable
+        index -- a tuple of integers, slices and lists of integers
+        chunk_bytes -- defaults to the READ_CHUNK_BYTES setting
+
+    Returns:
+        The same masked array as var[index]
+    """
+    if not isinstance(index, tuple):
+        index = (index,)
+    index = index + (slice(None),) * (len(var.shape) - len(index))
+
+    lists = [d for d, i in enumerate(index) if _is_list(i)]
+    if not lists:
+        return var[index]
+
+    requested = dict(
+        (d, [int(j) % var.shape[d] for j in index[d]]) for d in lists)
+    uniques = dict((d, sorted(set(requested[d]))) for d in lists)
+    if any(len(u) == 0 for u in uniques.values()):
+        return var[index]
+
+    # The axis of each dimension in the result, integers drop theirs
+    axis = {}
+    for d, i in enumerate(index):
+        if d in lists or isinstance(i, slice):
+            axis[d] = len(axis)
+
+    # Size of one entry along the first list dimension
+    entry = np.dtype(var.dtype).itemsize
+    for d, i in enumerate(index):
+        if d == lists[0]:
+            continue
+        if d in lists:
+            entry *= len(uniques[d])
+        elif isinstance(i, slice):
+            entry *= len(range(*i.indices(var.shape[d])))
+
+    if chunk_bytes is None:
+        chunk_bytes = settings.get('READ_CHUNK_BYTES')
+    max_entries = max(1, int(chunk_bytes // max(entry, 1)))
+
+    plans = [
+        slices(uniques[d], max_entries if d == lists[0] else None)
+        for d in lists
+    ]
+
+    result = None
+    for plan in itertools.product(*plans):
+        i = list(index)
+        for d, (s, positions) in zip(lists, plan):
+            i[d] = s
+        data = np.ma.asarray(var[tuple(i)])
+
+        if result is None:
+            shape = list(data.shape)
+            for d in lists:
+                shape[axis[d]] = len(uniques[d])
+            result = np.ma.masked_all(shape, dtype=data.dtype)
+
+        target = [slice(None)] * result.ndim
+        for d, (s, positions) in zip(lists, plan):
+            target[axis[d]] = positions
+        result[tuple(target)] = data
+
+    # Back to the requested order, with any repeated indices
+    for d in lists:
+        if requested[d] != uniques[d]:
+            position = dict((j, p) for p, j in enumerate(uniques[d]))
+            result = result.take([position[j] for j in requested[d]],
+                                 axis=axis[d])
+
+    return result
+
+
+def gather(var, index, points, max_gap=None):
+    """Reads some points of the last dimension of a variable
+
+    Points closer together than max_gap are read in one slice, so a
+    scattered set of points costs a few reads rather than one per point or
+    one over the whole range.
+
+    Arguments:
+        var -- the netCDF variable
+        index -- a tuple indexing the leading dimensions
+        points -- sorted, unique indices into the last dimension
+        max_gap -- defaults to the GATHER_MAX_GAP setting
+
+    Returns:
+        var[index + (points,)], with the points in the last dimension
+    """
+    if max_gap is None:
+        max_gap = settings.get('GATHER_MAX_GAP')
+
+    points = np.asarray(points, dtype=np.int64)
+    if len(points) == 0:
+        return np.ma.asarray(var[index + (slice(0, 0),)])
+
+    # Runs of points with gaps of at most max_gap
+    breaks = np.flatnonzero(np.diff(points) > max_gap + 1) + 1
+    starts = points[np.concatenate([[0], breaks])]
+    stops = points[np.concatenate([breaks - 1, [len(points) - 1]])] + 1
+
+    pieces = [np.ma.asarray(var[index + (slice(a, b),)])
+              for a, b in zip(starts, stops)]
+    data = np.ma.concatenate(pieces, axis=-1) if len(pieces) > 1 \
+        else pieces[0]
+
+    # Position of each point in the concatenated runs
+    run = np.searchsorted(starts, points, side='right') - 1
+    offsets = np.concatenate([[0], np.cumsum(stops - starts)[:-1]])
+
+    return data[..., offsets[run] + points - starts[run]]
@@ -0,0 +1,198 @@
+import numpy as np
+import resampling
+
+RAD_FACTOR = np.pi / 180.0
+
+
+class RegularGrid(object):
+
+    """Index arithmetic on a grid with 1-D latitude and longitude axes
+
+    The axes are sorted, and longitudes wrapped to [0, 360), once when the
+    grid is created. Lookups are then vectorized searchsorted calls, with no
+    tree to build.
+
+    Arguments:
+        lat -- the 1-D latitude axis
+        lon -- the 1-D longitude axis
+        latsort, lonsort -- optional precomputed argsorts of the latitude
+                            axis and of the wrapped longitude axis
+    """
+
+    def __init__(self, lat, lon, latsort=None, lonsort=None):
+        lat = np.ma.getdata(lat)
+        lon = np.mod(np.ma.getdata(lon) + 360, 360)
+
+        if latsort is None:
+            latsort = np.argsort(lat)
+        if lonsort is None:
+            lonsort = np.argsort(lon)
+
+        self.latsort = latsort
+        self.lonsort = lonsort
+        self.__lat_axis = lat
+        self.__lon_axis = lon
+        self.lat = lat[latsort]
+        self.lon = lon[lonsort]
+
+        # The longitude axis is periodic if it goes all the way around,
+        # i.e. the gap across 360 is no bigger than the grid spacing.
+        if len(self.lon) > 1:
+            spacing = np.median(np.diff(self.lon))
+            gap = self.lon[0] + 360 - self.lon[-1]
+            self.periodic = gap <= 1.5 * spacing
+        else:
+            self.periodic = False
+
+    @property
+    def shape(self):
+        return (len(self.lat), len(self.lon))
+
+    @staticmethod
+    def __bracket(axis, value, periodic=False):
+        """Finds the positions in the sorted axis on either side of each
+        value, and the fractional distance between them.
+
+        Returns:
+            lo, hi -- positions in the sorted axis
+            frac -- the fractional distance from lo to hi, in [0, 1]
+            valid -- False for values outside of a non-periodic axis
+        """
+        n = len(axis)
+        if n < 2:
+            zeros = np.zeros(value.shape, dtype=int)
+            return zeros, zeros, np.zeros(value.shape), \
+                np.ones(value.shape, dtype=bool)
+
+        i = np.searchsorted(axis, value, side='right') - 1
+        if periodic:
+            below = i < 0
+            above = i >= n - 1
+            lo = np.where(below, n - 1, i)
+            hi = np.where(above, 0, i + 1)
+            lo_value = axis[lo] - np.where(below, 360, 0)
+            hi_value = axis[hi] + np.where(above, 360, 0)
+            valid = np.ones(value.shape, dtype=bool)
+        else:
+            lo = np.clip(i, 0, n - 2)
+            hi = lo + 1
+            lo_value = axis[lo]
+            hi_value = axis[hi]
+            valid = (value >= axis[0]) & (value <= axis[-1])
+
+        span = hi_value - lo_value
+        frac = np.clip(
+            (value - lo_value) / np.where(span > 0, span, 1), 0, 1)
+
+        return lo, hi, frac, valid
+
+    def __brackets(self, lat, lon):
+        lat = np.ravel(lat).astype(float)
+        lon = np.mod(np.ravel(lon).astype(float) + 360, 360)
+
+        y0, y1, fy, vy = self.__bracket(self.lat, lat)
+        x0, x1, fx, vx = self.__bracket(self.lon, lon, self.periodic)
+
+        return (self.latsort[y0], self.latsort[y1], fy,
+                self.lonsort[x0], self.lonsort[x1], fx, vy & vx)
+
+    def find_index(self, lat, lon):
+        """Finds the nearest grid point along each axis
+
+        Points outside of the grid are clamped to its edge.
+
+        Arguments:
+            lat, lon -- the query point(s)
+
+        Returns:
+            The y and x indices into the original (unsorted) axes
+        """
+        y0, y1, fy, x0, x1, fx, valid = self.__brackets(lat, lon)
+
+        return np.where(fy < 0.5, y0, y1), np.where(fx < 0.5, x0, x1)
+
+    def neighbours(self, lat, lon, offset=(0, 0), shape=None,
+                   method='bilinear', columns=None):
+        """Finds the four surrounding grid points and their weights
+
+        Arguments:
+            lat, lon -- the target points
+            offset -- the (y, x) index of the first point of the slab the
+                      weights will be applied to
+            shape -- the (y, x) shape of that slab, defaults to the rest of
+                     the grid
+            method -- 'bilinear', or 'idw' for inverse distance weighting
+            columns -- the longitude index of each column of the slab, for
+                       slabs that wrap around a periodic axis. The x of
+                       offset is then ignored.
+
+        Returns:
+            A resampling.Neighbours with indices into the flattened slab.
+            Corners outside of the slab get no weight.
+        """
+        if shape is None:
+            shape = (self.shape[0] - offset[0], self.shape[1] - offset[1])
+
+        y0, y1, fy, x0, x1, fx, valid = self.__brackets(lat, lon)
+
+        y_index = np.column_stack((y0, y0, y1, y1))
+        x_index = np.column_stack((x0, x1, x0, x1))
+
+        if method == 'bilinear':
+            weight = np.column_stack((
+                (1 - fy) * (1 - fx),
+                (1 - fy) * fx,
+                fy * (1 - fx),
+                fy * fx,
+            ))
+        elif method == 'idw':
+            # Equirectangular distances to the corners, in degrees
+            lat = np.ravel(lat)[:, np.newaxis]
+            lon = np.ravel(lon)[:, np.newaxis]
+            dy = self.__lat_axis[y_index] - lat
+            dx = (np.mod(self.__lon_axis[x_index] - lon + 180, 360) - 180) * \
+                np.cos(lat * RAD_FACTOR)
+            weight = resampling.inverse_square(np.hypot(dy, dx))
+        else:
+            raise ValueError("Unknown interpolation method: %s" % method)
+
+        ys = y_index - offset[0]
+        if columns is None:
+            xs = x_index - offset[1]
+        else:
+            position = np.empty(len(self.lon), dtype=int)
+            position.fill(-1)
+            position[columns] = np.arange(len(columns))
+            xs = position[x_index]
+        inside = (ys >= 0) & (ys < shape[0]) & (xs >= 0) & (xs < shape[1])
+        weight = np.where(inside, weight, 0)
+        index = np.where(inside, ys * shape[1] + xs, 0)
+
+        found = valid & (weight.sum(axis=1) > 0)
+
+        return resampling.Neighbours(found, index[found], weight[found])
+
+    def interpolate(self, data, lat, lon, offset=(0, 0), method='bilinear',
+                    columns=None):
+        """Interpolates a slab of the grid to the target points
+
+        Arguments:
+            data -- a (y, x, ...) slab of the grid, trailing dimensions are
+                    interpolated together as channels
+            lat, lon -- the target points
+            offset -- the (y, x) index of the first point of the slab
+            method -- 'bilinear' or 'idw'
+            columns -- the longitude index of each column, see neighbours
+
+        Returns:
+            A masked array with the shape of lat followed by the trailing
+            dimensions of data
+        """
+        info = self.neighbours(lat, lon, offset, data.shape[:2], method,
+                               columns)
+        channels = data.shape[2:]
+
+        output = info.apply(
+            np.ma.asarray(data).reshape((data.shape[0] * data.shape[1], -1)))
+
+        return output.reshape(np.shape(lat) + channels)
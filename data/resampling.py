@@ -0,0 +1,232 @@
+import pyresample
+import numpy as np
+import hashlib
+import threading
+import warnings
+from cachetools import LRUCache
+import settings
+import compute
+
+_neighbour_cache = None
+# The cache is shared by the threads of the fetch executor
+_lock = threading.Lock()
+
+
+def inverse_square(r):
+    r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
+    return 1. / r ** 2
+
+
+def _cache():
+    global _neighbour_cache
+    if _neighbour_cache is None:
+        _neighbour_cache = LRUCache(
+            maxsize=settings.get('RESAMPLE_CACHE_SIZE'),
+            getsizeof=lambda n: n.nbytes
+        )
+
+    return _neighbour_cache
+
+
+def _get(key):
+    with _lock:
+        return _cache().get(key)
+
+
+def _put(key, neighbours):
+    with _lock:
+        _cache()[key] = neighbours
+
+
+def cached(key, factory):
+    """Returns the Neighbours cached under key, calling factory() to find
+    them if they aren't cached.
+    """
+    result = _get(key)
+    if result is None:
+        result = factory()
+        _put(key, result)
+
+    return result
+
+
+class Neighbours(object):
+
+    """Neighbour indices and normalized weights from a set of source points
+    to a set of target points.
+
+    Arguments:
+        valid_output -- boolean array over the target points that have at
+                        least one source point within the radius
+        index -- (valid_output.sum(), k) indices into the flattened source
+        weight -- (valid_output.sum(), k) weights, each row sums to 1
+    """
+
+    def __init__(self, valid_output, index, weight):
+        self.valid_output = valid_output
+        self.index = index
+        self.weight = weight
+
+    @property
+    def nbytes(self):
+        return self.valid_output.nbytes + self.index.nbytes + \
+            self.weight.nbytes
+
+    def apply(self, data):
+        """Applies the weights to the flattened source data
+
+        Source points that are masked in a channel are left out of that
+        channel and the weights of the remaining neighbours are renormalized,
+        so every level of a 3-D field can share the neighbours found over the
+        union of their valid points.
+
+        Arguments:
+            data -- an array with the source points in the first dimension,
+                    any remaining dimensions are treated as channels
+
+        Returns:
+            A masked array with the target points in the first dimension
+        """
+        mask = np.ma.getmaskarray(data)
+        data = np.ma.getdata(data)
+        output = np.ma.masked_all(
+            (len(self.valid_output),) + data.shape[1:],
+            dtype=np.result_type(data.dtype, self.weight.dtype)
+        )
+
+        if self.index.size > 0:
+            valid = ~mask[self.index]
+            gathered = np.where(valid, data[self.index], 0)
+            weight = self.weight.reshape(
+                self.weight.shape + (1,) * (gathered.ndim - 2)) * valid
+
+            norm = weight.sum(axis=1)
+            found = norm > 0
+            values = np.sum(gathered * weight, axis=1) / np.where(found, norm,
+                                                                  1)
+            output[self.valid_output] = np.ma.masked_array(values,
+                                                           mask=~found)
+
+        return output
+
+
+def _key(lat_in, lon_in, valid, lat_out, lon_out, radius, neighbours,
+         weight_func):
+    h = hashlib.sha1()
+    for a in [lat_in, lon_in, lat_out, lon_out]:
+        h.update(np.ascontiguousarray(np.ma.getdata(a)).tobytes())
+    h.update(np.packbits(valid).tobytes())
+    h.update("%f|%d|%s" % (radius, neighbours, weight_func.__name__))
+
+    return h.hexdigest()
+
+
+def find_neighbours(lat_in, lon_in, valid, lat_out, lon_out, radius=50000,
+                    neighbours=10, weight_func=inverse_square):
+    """Finds the neighbours and weights for resampling
+
+    The result is cached, so repeated calls with the same source points,
+    source mask and target points, e.g. the same tile at another time step,
+    don't repeat the neighbour search.
+
+    Arguments:
+        lat_in, lon_in -- the coordinates of the source points, any shape
+        valid -- boolean array, False for source points to ignore
+        lat_out, lon_out -- the coordinates of the target points, any shape
+        radius -- the radius of influence in metres
+        neighbours -- the maximum number of neighbours per target point
+        weight_func -- function from distance to weight
+    """
+    lat_in = np.ravel(lat_in)
+    lon_in = np.ravel(lon_in)
+    valid = np.ravel(valid)
+    lat_out = np.ravel(lat_out)
+    lon_out = np.ravel(lon_out)
+
+    key = _key(lat_in, lon_in, valid, lat_out, lon_out, radius, neighbours,
+               weight_func)
+    result = _get(key)
+    if result is not None:
+        return result
+
+    source_index = np.flatnonzero(valid)
+    result = Neighbours(np.zeros(lat_out.shape, dtype=bool),
+                        np.zeros((0, neighbours), dtype=int),
+                        np.zeros((0, neighbours)))
+    if len(source_index) > 0:
+        input_def = pyresample.geometry.SwathDefinition(
+            lons=lon_in[source_index],
+            lats=lat_in[source_index]
+        )
+        output_def = pyresample.geometry.SwathDefinition(
+            lons=lon_out,
+            lats=lat_out
+        )
+
+        with warnings.catch_warnings(), compute.slots() as nprocs:
+            warnings.simplefilter("ignore", UserWarning)
+            valid_input, valid_output, index, distance = \
+                pyresample.kd_tree.get_neighbour_info(
+                    input_def, output_def,
+                    radius_of_influence=float(radius),
+                    neighbours=neighbours,
+                    nprocs=nprocs
+                )
+
+        index = index.reshape(len(index), -1)
+        distance = distance.reshape(len(distance), -1)
+
+        # index refers to the valid input points, the number of valid
+        # points marks a missing neighbour.
+        lookup = source_index[valid_input]
+        if len(lookup) == 0:
+            _put(key, result)
+            return result
+
+        missing = index >= len(lookup)
+        index = lookup[np.where(missing, 0, index)]
+
+        distance = np.where(missing, 1, distance)
+        weight = np.where(missing, 0, weight_func(distance))
+        norm = weight.sum(axis=1)
+
+        found = norm > 0
+        weight = weight[found] / norm[found][:, np.newaxis]
+        index = index[found]
+        valid_output = valid_output.copy()
+        valid_output[valid_output] = found
+
+        result = Neighbours(valid_output, index, weight)
+
+    _put(key, result)
+    return result
+
+
+def resample(lat_in, lon_in, lat_out, lon_out, data, radius=50000,
+             neighbours=10, weight_func=inverse_square):
+    """Inverse distance weighted resampling
+
+    The neighbour search is done once over the source points that are valid
+    in any channel, e.g. any depth level, and all channels are resampled
+    together. Masked source points are ignored, target points with no
+    unmasked source point within the radius are masked.
+
+    Arguments:
+        lat_in, lon_in -- the coordinates of the source points
+        lat_out, lon_out -- the coordinates of the target points
+        data -- the source data, with the shape of lat_in followed by any
+                number of channel dimensions
+
+    Returns:
+        A masked array with the shape of lat_out followed by the channel
+        dimensions of data
+    """
+    channels = np.shape(data)[np.ndim(lat_in):]
+    data = np.ma.asarray(data).reshape((np.size(lat_in), -1))
+
+    info = find_neighbours(
+        lat_in, lon_in, ~np.ma.getmaskarray(data).all(axis=1),
+        lat_out, lon_out, radius, neighbours, weight_func
+    )
+
+    return info.apply(data).reshape(np.shape(lat_out) + channels)
@@ -0,0 +1,42 @@
+_settings = {
+    'CACHE_DIR': '/tmp/oceannavigator',
+    'SHARED_STORE_DIR': '/dev/shm/oceannavigator',
+    'RESAMPLE_CACHE_SIZE': 64 * 1024 * 1024,
+    'DATASET_POOL_SIZE': 16,
+    'DATASET_POOL_IDLE_TIMEOUT': 300,
+    'DATASET_POOL_MAX_AGE': 900,
+    'SLAB_CACHE_SIZE': 256 * 1024 * 1024,
+    'SLAB_BLOCK_POINTS': 64 * 64,
+    'SLAB_CACHE_SHARED': False,
+    'SLAB_CACHE_SHARED_MIN_FREE': 0.25,
+    'SLAB_CACHE_SHARED_SIZE': 1024 * 1024 * 1024,
+    'READ_CHUNK_BYTES': 64 * 1024 * 1024,
+    'CHUNK_CACHE_SIZE': 32 * 1024 * 1024,
+    'NCML_FILE_HANDLES': 32,
+    'MIRROR_DIR': None,
+    'LAZY_MEMORY_LIMIT': 256 * 1024 * 1024,
+    'GATHER_MAX_GAP': 256,
+    'SLAB_OVERREAD_RATIO': 4,
+    'CURVILINEAR_INTERPOLATION': 'bilinear',
+    'FETCH_THREADS': 8,
+    'FETCH_DATASET_THREADS': 4,
+    'COMPUTE_PROCESSES': 12,
+    'COMPUTE_THREADS': None,
+    'LOD_SAMPLES_PER_PIXEL': 2,
+    'OVERVIEW_DIR': None,
+}
+
+
+def configure(config):
+    """Copies the data layer settings out of an application config
+
+    The data package doesn't depend on Flask, so the application pushes the
+    keys it knows about in here at startup. Unknown keys are ignored.
+    """
+    for key in _settings:
+        if key in config:
+            _settings[key] = config[key]
+
+
+def get(key):
+    return _settings.get(key)
@@ -0,0 +1,126 @@
+import numpy as np
+import hashlib
+import os
+import shutil
+import tempfile
+import settings
+import mirror
+
+
+# Points sampled along each dimension of a source variable for its checksum
+CHECKSUM_SAMPLES = 64
+
+
+def _directory():
+    return settings.get('SHARED_STORE_DIR')
+
+
+def _path(url, name, source=''):
+    key = hashlib.sha1("%s|%s|%s" % (url, name, source)).hexdigest()
+    return os.path.join(_directory(), key + '.npy')
+
+
+def checksum(*variables):
+    """A checksum of the source variables of a published array
+
+    The store outlives the workers, so arrays are published under the
+    checksum of what they were built from, and a changed grid is read
+    again. The checksum covers the shapes, and CHECKSUM_SAMPLES points
+    along each dimension, the last one included, so the variables aren't
+    read in full.
+
+    Arguments:
+        variables -- netCDF variables
+    """
+    result = hashlib.sha1()
+    for var in variables:
+        shape = tuple(var.shape)
+        result.update(repr(shape))
+        if len(shape) == 0 or 0 in shape:
+            continue
+
+        step = tuple(slice(None, None, max(1, -(-n // CHECKSUM_SAMPLES)))
+                     for n in shape)
+        last = tuple(n - 1 for n in shape)
+        for index in (step, last):
+            result.update(np.ascontiguousarray(
+                np.ma.getdata(var[index])).tobytes())
+
+    return result.hexdigest()
+
+
+def save(path, array):
+    """Atomically writes an array to a .npy file
+
+    The array is written to a temporary file in the same directory and
+    renamed into place, so readers never see a partially written file.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    f, tmpname = tempfile.mkstemp(dir=directory, suffix='.npy')
+    with os.fdopen(f, 'wb') as out:
+        np.save(out, array)
+    os.rename(tmpname, path)
+
+
+def get(url, name, source=''):
+    """Attaches to a published array, returns None if there isn't one
+
+    Arguments:
+        source -- the checksum of the source of the array, see checksum
+    """
+    if _directory() is None:
+        return None
+
+    try:
+        return np.load(_path(url, name, source), mmap_mode='r')
+    except (IOError, ValueError):
+        return None
+
+
+def put(url, name, array, source=''):
+    """Publishes a static array for a dataset
+
+    The mask of masked arrays is dropped, coordinate arrays are stored as
+    plain data. Returns a read-only memory mapped view of the stored array,
+    or the array itself if the store isn't available.
+    """
+    array = np.ma.getdata(array)
+
+    if _directory() is not None:
+        try:
+            save(_path(url, name, source), array)
+        except (IOError, OSError):
+            pass
+        else:
+            return get(url, name, source)
+
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+def get_or_create(url, name, factory, sources=[]):
+    """Returns the published array, calling factory() to build and publish
+    it if it doesn't exist yet. Local mirrors come with their coordinates
+    precomputed, those are used as they are.
+
+    Arguments:
+        sources -- the netCDF variables the array is built from, the array
+                   is built again when they change
+    """
+    source = checksum(*sources) if sources else ''
+    array = get(url, name, source)
+    if array is None:
+        array = mirror.sidecar(url, 'coords', name)
+    if array is None:
+        array = put(url, name, factory(), source)
+
+    return array
+
+
+def clear():
+    if _directory() is not None:
+        shutil.rmtree(_directory(), ignore_errors=True)
@@ -0,0 +1,384 @@
+import numpy as np
+import hashlib
+import itertools
+import os
+import threading
+from cachetools import LRUCache
+import settings
+import shared_store
+import read_plan
+
+_cache = None
+_lock = threading.Lock()
+
+# Bytes this process has written to the shared tier since it last trimmed
+# it
+_written = 0
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=settings.get('SLAB_CACHE_SIZE'),
+            getsizeof=lambda b: b.data.nbytes + b.mask.nbytes
+        )
+
+    return _cache
+
+
+def clear():
+    with _lock:
+        if _cache is not None:
+            _cache.clear()
+
+
+def _shared_path(key):
+    return os.path.join(settings.get('SHARED_STORE_DIR'), 'slabs',
+                        hashlib.sha1(repr(key)).hexdigest())
+
+
+def _shared_get(key):
+    if not settings.get('SLAB_CACHE_SHARED') or \
+            settings.get('SHARED_STORE_DIR') is None:
+        return None
+
+    path = _shared_path(key)
+    try:
+        block = np.ma.masked_array(np.load(path + '.data.npy', mmap_mode='r'),
+                                   mask=np.load(path + '.mask.npy'))
+    except (IOError, ValueError):
+        return None
+
+    # Recently used blocks are trimmed last
+    try:
+        os.utime(path + '.data.npy', None)
+    except OSError:
+        pass
+
+    return block
+
+
+def _shared_trim(directory):
+    """Removes the least recently used blocks of the shared tier until it
+    fits in SLAB_CACHE_SHARED_SIZE bytes
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith('.data.npy'):
+            continue
+
+        path = os.path.join(directory, name[:-len('.data.npy')])
+        try:
+            data = os.stat(path + '.data.npy')
+            mask = os.stat(path + '.mask.npy')
+        except OSError:
+            continue
+        entries.append((data.st_mtime, data.st_size + mask.st_size, path))
+
+    total = sum(size for used, size, path in entries)
+    for used, size, path in sorted(entries):
+        if total <= settings.get('SLAB_CACHE_SHARED_SIZE'):
+            break
+
+        # The data first, a reader that finds it may still find the mask
+        for suffix in ['.data.npy', '.mask.npy']:
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+        total -= size
+
+
+def _shared_put(key, block):
+    if not settings.get('SLAB_CACHE_SHARED') or \
+            settings.get('SHARED_STORE_DIR') is None:
+        return
+
+    path = _shared_path(key)
+    try:
+        # Leave room for the rest of the shared store
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        stat = os.statvfs(directory)
+        if stat.f_bavail < stat.f_blocks * settings.get(
+                'SLAB_CACHE_SHARED_MIN_FREE'):
+            return
+
+        # The mask is written first, a reader that finds the data file
+        # always finds the mask too.
+        shared_store.save(path + '.mask.npy', np.ma.getmaskarray(block))
+        shared_store.save(path + '.data.npy', np.ma.getdata(block))
+
+        # The tier is trimmed each time the process has written a
+        # sixteenth of its size
+        global _written
+        with _lock:
+            _written += block.data.nbytes + block.mask.nbytes
+            trim = _written > settings.get('SLAB_CACHE_SHARED_SIZE') // 16
+            if trim:
+                _written = 0
+        if trim:
+            _shared_trim(directory)
+    except (IOError, OSError):
+        pass
+
+
+def _get(key):
+    with _lock:
+        block = _get_cache().get(key)
+
+    if block is None:
+        block = _shared_get(key)
+        if block is not None:
+            _put(key, block, shared=False)
+
+    return block
+
+
+def _put(key, block, shared=True):
+    block = np.ma.masked_array(np.ma.getdata(block),
+                               mask=np.ma.getmaskarray(block))
+    with _lock:
+        _get_cache()[key] = block
+
+    if shared:
+        _shared_put(key, block)
+
+
+def block_shape(spatial, chunks=None):
+    """The shape of a block over the trailing spatial dimensions
+
+    Arguments:
+        spatial -- the number of trailing spatial dimensions
+        chunks -- the netCDF4 chunk sizes of those dimensions, if any. Blocks
+                  are then whole multiples of the chunks, so each compressed
+                  chunk is decompressed for one block only.
+    """
+    edge = int(round(settings.get('SLAB_BLOCK_POINTS') ** (1.0 / spatial)))
+    edge = max(edge, 1)
+    if chunks is None:
+        return (edge,) * spatial
+
+    return tuple(c * max(1, int(round(float(edge) / c))) for c in chunks)
+
+
+def chunking(var):
+    """The chunk sizes of a netCDF variable, or None if it isn't chunked"""
+    try:
+        chunks = var.chunking()
+    except (AttributeError, RuntimeError):
+        return None
+
+    if chunks == 'contiguous' or chunks is None:
+        return None
+
+    return list(chunks)
+
+
+def _normalize(index, shape):
+    """Turns each element of index into a list of non-negative integers,
+    and notes which dimensions are dropped from the result.
+    """
+    if not isinstance(index, tuple):
+        index = (index,)
+    index = index + (slice(None),) * (len(shape) - len(index))
+
+    values = []
+    squeeze = []
+    for i, n in zip(index, shape):
+        if isinstance(i, slice):
+            values.append(range(*i.indices(n)))
+            squeeze.append(False)
+        elif hasattr(i, "__len__"):
+            values.append([int(j) % n for j in i])
+            squeeze.append(False)
+        else:
+            values.append([int(i) % n])
+            squeeze.append(True)
+
+    return values, squeeze
+
+
+def read(key, var, index, spatial, chunks=None):
+    """Reads var[index] through the block cache
+
+    The trailing spatial dimensions are split into blocks of block_shape.
+    Each leading dimension, e.g. time and depth, is split into single
+    entries. Missing blocks are read from var, spatial block by spatial
+    block, and added to the cache.
+
+    Arguments:
+        key -- identifies the variable in the cache, e.g. (url, name)
+        var -- the netCDF variable
+        index -- a tuple with an integer, slice, or list of integers for each
+                 leading dimension, and a step 1 slice for each spatial
+                 dimension
+        spatial -- the number of trailing spatial dimensions
+        chunks -- the chunk sizes of var, see chunking
+
+    Returns:
+        The same masked array as var[index]
+    """
+    values, squeeze = _normalize(index, var.shape)
+    lead = len(var.shape) - spatial
+    shape = block_shape(spatial, chunks[lead:] if chunks else None)
+
+    for v in values[lead:]:
+        if len(v) > 1 and np.any(np.diff(v) != 1):
+            raise ValueError("Spatial dimensions must be read contiguously")
+
+    if any(len(v) == 0 for v in values):
+        return np.ma.asarray(var[index])
+
+    # Created with the dtype of the first block, which can differ from
+    # var.dtype for packed variables
+    result = None
+
+    # Position of each leading value in the result
+    positions = [dict((j, p) for p, j in enumerate(v))
+                 for v in values[:lead]]
+    leading = list(itertools.product(*[sorted(set(v))
+                                       for v in values[:lead]]))
+
+    block_ranges = [
+        range(v[0] // size, v[-1] // size + 1)
+        for v, size in zip(values[lead:], shape)
+    ]
+    for block in itertools.product(*block_ranges):
+        bounds = [
+            (b * size, min((b + 1) * size, n))
+            for b, size, n in zip(block, shape, var.shape[lead:])
+        ]
+
+        blocks = {}
+        missing = []
+        for l in leading:
+            data = _get((key, l, block))
+            if data is None:
+                missing.append(l)
+            else:
+                blocks[l] = data
+
+        if missing:
+            fetched = _fetch(key, var, missing, block, bounds,
+                             chunks[:lead] if chunks else None)
+            for l in missing:
+                blocks[l] = fetched[l]
+
+        # The part of the block that falls inside the request
+        window = []
+        target = []
+        for v, (lo, hi) in zip(values[lead:], bounds):
+            start = max(v[0], lo)
+            stop = min(v[-1] + 1, hi)
+            window.append(slice(start - lo, stop - lo))
+            target.append(slice(start - v[0], stop - v[0]))
+
+        for l, data in blocks.items():
+            if result is None:
+                result = np.ma.masked_all([len(v) for v in values],
+                                          dtype=data.dtype)
+            position = tuple(p[j] for p, j in zip(positions, l))
+            result[position + tuple(target)] = data[tuple(window)]
+
+    # Repeated leading values
+    for d, v in enumerate(values[:lead]):
+        if len(set(v)) != len(v):
+            order = [positions[d][j] for j in v]
+            result = result.take(order, axis=d)
+
+    return result.reshape([len(v) for v, s in zip(values, squeeze) if not s])
+
+
+def _fetch(key, var, missing, block, bounds, chunks=None):
+    """Reads the missing leading entries of a spatial block from var
+
+    The values of each leading dimension are read as contiguous or strided
+    slices in chunks of bounded size, see read_plan.read. Where a leading
+    dimension is chunked, the read is rounded out to whole chunks if that
+    at most doubles it; the other entries are decompressed anyway, so they
+    are cached too.
+    """
+    spatial = tuple(slice(lo, hi) for lo, hi in bounds)
+    values = [sorted(set(l[d] for l in missing))
+              for d in range(len(missing[0]))]
+
+    if chunks is not None:
+        for d, c in enumerate(chunks):
+            if c <= 1:
+                continue
+            rounded = sorted(set(
+                j for v in values[d]
+                for j in range(v // c * c, min((v // c + 1) * c,
+                                                var.shape[d]))
+            ))
+            if len(rounded) <= 2 * len(values[d]):
+                values[d] = rounded
+
+    data = read_plan.read(var, tuple(values) + spatial)
+
+    reads = {}
+    for l in itertools.product(*[enumerate(v) for v in values]):
+        entry = tuple(j for p, j in l)
+        reads[entry] = data[tuple(p for p, j in l)]
+        _put((key, entry, block), reads[entry])
+
+    return reads
+
+
+class CachedVariable(object):
+
+    """Wraps a netCDF variable so reads of spatial slabs go through the
+    block cache. Anything else is passed through to the variable.
+
+    Blocks follow the chunk layout of the variable, and the HDF5 chunk cache
+    of the variable is grown to CHUNK_CACHE_SIZE so chunks shared by
+    neighbouring blocks are only decompressed once.
+
+    Blocks are decompressed in the thread that reads them. netCDF4 releases
+    the GIL while it reads, but HDF5 isn't built thread-safe, so reads of
+    local files are serialized, see executor._local_lock, and a pool of
+    decompression threads would only queue on that lock.
+
+    Arguments:
+        key -- identifies the variable in the cache
+        var -- the netCDF variable
+        spatial -- the number of trailing spatial dimensions
+    """
+
+    def __init__(self, key, var, spatial):
+        self._key = key
+        self._var = var
+        self._spatial = spatial
+        self._chunks = chunking(var)
+
+        if self._chunks is not None:
+            size, nelems, preemption = var.get_var_chunk_cache()
+            if size < settings.get('CHUNK_CACHE_SIZE'):
+                var.set_var_chunk_cache(size=settings.get('CHUNK_CACHE_SIZE'))
+
+    def __getattr__(self, name):
+        return getattr(self._var, name)
+
+    def __len__(self):
+        return len(self._var)
+
+    def __cacheable(self, index):
+        if self._spatial == 0 or not isinstance(index, tuple) or \
+                len(index) != len(self._var.shape):
+            return False
+
+        for i in index[len(index) - self._spatial:]:
+            if not isinstance(i, slice) or i.step not in (None, 1):
+                return False
+
+        return True
+
+    def __getitem__(self, index):
+        if self.__cacheable(index):
+            return read(self._key, self._var, index, self._spatial,
+                        self._chunks)
+        else:
+            return read_plan.read(self._var, index)
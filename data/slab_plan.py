@@ -0,0 +1,195 @@
+import numpy as np
+import settings
+
+# Points whose slabs cover the box around all of them closely enough are
+# read in that one box. Coverage is measured on a grid of up to this many
+# cells along each side of the box.
+DENSITY_CELLS = 64
+
+# Groups are only merged pairwise up to this many, each merge costs the
+# square of the number of groups
+MERGE_GROUPS = 256
+
+
+def _area(box):
+    return (box[..., 1] - box[..., 0]) * (box[..., 3] - box[..., 2])
+
+
+def _union(a, b):
+    return [min(a[0], b[0]), max(a[1], b[1]),
+            min(a[2], b[2]), max(a[3], b[3])]
+
+
+def boxes(y, x, shape):
+    """The slab each point needs, around the grid points near it
+
+    The box is padded by a quarter of its size per side, and by 2 more
+    grid points if it spans fewer than 2, the same limits as the single
+    bounding box of the points used to have.
+
+    Arguments:
+        y, x -- (npoints, n) grid indices of the neighbours of each point
+        shape -- the shape of the grid
+
+    Returns:
+        (npoints, 4) miny, maxy, minx, maxx, to be read as [miny:maxy,
+        minx:maxx]
+    """
+    y = np.reshape(y, (np.shape(y)[0], -1))
+    x = np.reshape(x, (np.shape(x)[0], -1))
+
+    def limits(data, limit):
+        mn = data.min(axis=1).astype(np.float64)
+        mx = data.max(axis=1).astype(np.float64)
+        d = mx - mn
+
+        small = d < 2
+        mn[small] -= 2
+        mx[small] += 2
+
+        mn = np.clip((mn - d / 4.0).astype(np.int64), 0, limit)
+        mx = np.clip((mx + d / 4.0).astype(np.int64), 0, limit)
+
+        return mn, mx
+
+    miny, maxy = limits(y, shape[0])
+    minx, maxx = limits(x, shape[1])
+
+    return np.column_stack((miny, maxy, minx, maxx))
+
+
+def _dense(needed, ratio):
+    """Whether the box around all of the slabs reads at most ratio times
+    the area they cover
+
+    The cover is counted in coarse cells, from the corners and centre of
+    each slab, so slabs larger than a cell are undercounted.
+    """
+    miny, minx = needed[:, 0].min(), needed[:, 2].min()
+    ny = needed[:, 1].max() - miny
+    nx = needed[:, 3].max() - minx
+    cell = max(1, -(-max(ny, nx) // DENSITY_CELLS))
+
+    covered = np.zeros((-(-ny // cell) + 1, -(-nx // cell) + 1), dtype=bool)
+    ys = [needed[:, 0], (needed[:, 0] + needed[:, 1]) // 2, needed[:, 1] - 1]
+    xs = [needed[:, 2], (needed[:, 2] + needed[:, 3]) // 2, needed[:, 3] - 1]
+    for y in ys:
+        for x in xs:
+            covered[np.clip((y - miny) // cell, 0, covered.shape[0] - 1),
+                    np.clip((x - minx) // cell, 0, covered.shape[1] - 1)] = True
+
+    return covered.size <= ratio * covered.sum()
+
+
+def _merge(groups, ratio):
+    """Merges groups pairwise, cheapest first, while the merged slab reads
+    at most ratio times the grid points its members need
+    """
+    box = np.array([g[0] for g in groups], dtype=np.int64)
+    useful = np.array([g[1] for g in groups], dtype=np.float64)
+    members = [g[2] for g in groups]
+
+    def cost(i):
+        union = np.column_stack((
+            np.minimum(box[:, 0], box[i, 0]),
+            np.maximum(box[:, 1], box[i, 1]),
+            np.minimum(box[:, 2], box[i, 2]),
+            np.maximum(box[:, 3], box[i, 3]),
+        ))
+        return _area(union) / np.maximum(useful + useful[i], 1)
+
+    costs = np.array([cost(i) for i in range(len(groups))])
+    np.fill_diagonal(costs, np.inf)
+    alive = np.ones(len(groups), dtype=bool)
+
+    while True:
+        i, j = np.unravel_index(np.argmin(costs), costs.shape)
+        if costs[i, j] > ratio:
+            break
+
+        box[i] = _union(box[i], box[j])
+        useful[i] += useful[j]
+        members[i].extend(members[j])
+
+        alive[j] = False
+        costs[j, :] = np.inf
+        costs[:, j] = np.inf
+
+        row = cost(i)
+        row[~alive] = np.inf
+        row[i] = np.inf
+        costs[i, :] = row
+        costs[:, i] = row
+
+    return [(box[k], useful[k], members[k]) for k in np.flatnonzero(alive)]
+
+
+def plan(y, x, shape, ratio=None):
+    """Clusters points into compact slabs
+
+    A single box around all of the points of a long transect, or of
+    scattered stations, is mostly points that aren't needed. Instead, the
+    points are grouped so that each group's slab reads at most ratio times
+    the grid points its members need.
+
+    Points that cover their box densely, e.g. the grid of an area, are
+    read in that box. Otherwise consecutive points are grouped first, as
+    transects come in path order, then groups are merged while the
+    cheapest merge stays under the ratio, if there are at most
+    MERGE_GROUPS of them.
+
+    Arguments:
+        y, x -- (npoints, n) grid indices of the neighbours of each point
+        shape -- the shape of the grid
+        ratio -- the over-read allowed, defaults to SLAB_OVERREAD_RATIO
+
+    Returns:
+        A list of (points, (miny, maxy, minx, maxx)), points being the
+        indices of the points resampled from that slab
+    """
+    if ratio is None:
+        ratio = settings.get('SLAB_OVERREAD_RATIO')
+
+    needed = boxes(y, x, shape)
+    if len(needed) == 0:
+        return []
+
+    if _dense(needed, ratio):
+        return [(np.arange(len(needed)),
+                 (int(needed[:, 0].min()), int(needed[:, 1].max()),
+                  int(needed[:, 2].min()), int(needed[:, 3].max())))]
+
+    # What each slab adds to the one before it, consecutive points along a
+    # path share most of their slabs
+    overlap = np.column_stack((
+        np.maximum(needed[1:, 0], needed[:-1, 0]),
+        np.minimum(needed[1:, 1], needed[:-1, 1]),
+        np.maximum(needed[1:, 2], needed[:-1, 2]),
+        np.minimum(needed[1:, 3], needed[:-1, 3]),
+    ))
+    shared = np.zeros(len(needed))
+    shared[1:] = np.clip(overlap[:, 1] - overlap[:, 0], 0, None) * \
+        np.clip(overlap[:, 3] - overlap[:, 2], 0, None)
+    areas = _area(needed)
+    added = np.maximum(areas - shared, 1).tolist()
+    areas = areas.tolist()
+
+    groups = []
+    for i, box in enumerate(needed.tolist()):
+        if groups:
+            group = groups[-1]
+            union = _union(group[0], box)
+            if (union[1] - union[0]) * (union[3] - union[2]) <= \
+                    ratio * (group[1] + added[i]):
+                group[0] = union
+                group[1] += added[i]
+                group[2].append(i)
+                continue
+
+        groups.append([box, areas[i], [i]])
+
+    if 1 < len(groups) <= MERGE_GROUPS:
+        groups = _merge(groups, ratio)
+
+    return [(np.array(sorted(g[2])), tuple(int(v) for v in g[0]))
+            for g in groups]
@@ -0,0 +1,125 @@
+import unittest
+import bottom
+import settings
+import numpy as np
+import shutil
+import tempfile
+
+
+class CountingVariable(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return self.data[index]
+
+
+class FakeVariable(object):
+
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+
+
+class TestBottom(unittest.TestCase):
+
+    def setUp(self):
+        data = np.arange(2 * 3 * 4 * 5, dtype=np.float32).reshape(2, 3, 4, 5)
+        mask = np.zeros(data.shape, dtype=bool)
+        mask[:, 2, :, :2] = True
+        mask[:, 1:, 0, :] = True
+        mask[:, :, 3, 4] = True
+        self.var = np.ma.masked_array(data, mask=mask)
+
+        self.directory = tempfile.mkdtemp()
+        self.old_directory = settings.get('CACHE_DIR')
+        settings.configure({'CACHE_DIR': self.directory})
+
+    def tearDown(self):
+        settings.configure({'CACHE_DIR': self.old_directory})
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_bottom_index(self):
+        index = bottom.bottom_index(self.var)
+
+        self.assertEqual(index.shape, (4, 5))
+        np.testing.assert_array_equal(index[0], [0] * 5)
+        np.testing.assert_array_equal(index[1], [1, 1, 2, 2, 2])
+        self.assertEqual(index[3, 4], -1)
+
+    def test_load(self):
+        a = bottom.load('url', 'votemper', self.var)
+        var = CountingVariable(self.var)
+        b = bottom.load('url', 'votemper', var)
+
+        # Only sampled for the checksum
+        self.assertEqual(var.reads, 1)
+        self.assertIsInstance(b, np.memmap)
+        np.testing.assert_array_equal(a, b)
+
+    def test_load_changed(self):
+        bottom.load('url', 'votemper', self.var)
+
+        # The same url with another land mask, then another grid
+        self.var[:, 1, 1, 1] = np.ma.masked
+        index = bottom.load('url', 'votemper', self.var)
+        self.assertEqual(index[1, 1], 0)
+
+        var = np.ma.masked_array(np.zeros((2, 3, 6, 5)))
+        self.assertEqual(bottom.load('url', 'votemper', var).shape, (6, 5))
+
+    def test_gather(self):
+        index = bottom.bottom_index(self.var)
+        data = bottom.gather(self.var, 1, index[1:, 1:], 1, 1)
+
+        self.assertEqual(data.shape, (3, 4))
+        self.assertEqual(data[0, 0], self.var[1, 1, 1, 1])
+        self.assertEqual(data[0, 1], self.var[1, 2, 1, 2])
+        self.assertTrue(data.mask[2, 3])
+
+    def test_gather_times(self):
+        index = bottom.bottom_index(self.var)
+        data = bottom.gather(self.var, [0, 1], index, 0, 0)
+
+        self.assertEqual(data.shape, (2, 4, 5))
+        self.assertEqual(data[1, 1, 3], self.var[1, 2, 1, 3])
+        self.assertEqual(data[0, 0, 0], self.var[0, 0, 0, 0])
+
+    def test_depth(self):
+        d = bottom.depth([5, 10, 20], [[0, 2], [-1, 1]])
+
+        np.testing.assert_array_equal(d.data[0], [5, 20])
+        self.assertTrue(d.mask[1, 0])
+        self.assertEqual(d[1, 1], 10)
+
+    def test_gather_levels(self):
+        var = CountingVariable(self.var)
+        index = bottom.bottom_index(self.var)
+        data = bottom.gather(var, 0, index, 0, 0)
+
+        # The first level alone, then levels 1 and 2 together
+        self.assertEqual(var.reads, 2)
+        expected = bottom.gather(self.var, 0, index, 0, 0)
+        np.testing.assert_array_equal(data.mask, expected.mask)
+        np.testing.assert_array_equal(data.compressed(), expected.compressed())
+        self.assertEqual(data[1, 3], self.var[0, 2, 1, 3])
+
+    def test_groups(self):
+        index = np.array([[0, 0, 1], [1, 1, 1], [10, 10, -1]])
+
+        self.assertEqual(bottom._groups(index),
+                         [(0, 1, (0, 2, 0, 3)), (10, 10, (2, 3, 0, 2))])
+
+    def test_variables(self):
+        variables = {
+            'votemper': FakeVariable(('time', 'deptht', 'y', 'x')),
+            'sossheig': FakeVariable(('time', 'y', 'x')),
+            'bathy': FakeVariable(('deptht', 'time', 'y', 'x')),
+        }
+
+        self.assertEqual(bottom.variables(variables, ['deptht']),
+                         ['votemper'])
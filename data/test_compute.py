@@ -0,0 +1,48 @@
+import unittest
+import threading
+import compute
+import settings
+
+
+class TestCompute(unittest.TestCase):
+
+    def setUp(self):
+        self.old = {k: settings.get(k)
+                    for k in ['COMPUTE_THREADS', 'COMPUTE_PROCESSES']}
+
+    def tearDown(self):
+        settings.configure(self.old)
+
+    def test_threads(self):
+        settings.configure({'COMPUTE_THREADS': 3})
+        self.assertEqual(compute.threads(), 3)
+
+        settings.configure({'COMPUTE_THREADS': None,
+                            'COMPUTE_PROCESSES': 100000})
+        self.assertEqual(compute.threads(), 1)
+
+    def test_budget(self):
+        budget = compute.Budget(4)
+        self.assertEqual(budget.acquire(3), 3)
+        self.assertEqual(budget.acquire(3), 1)
+        self.assertEqual(budget.free, 0)
+
+        granted = []
+        t = threading.Thread(target=lambda: granted.append(budget.acquire()))
+        t.start()
+        t.join(0.05)
+        self.assertEqual(granted, [])
+
+        budget.release(3)
+        t.join()
+        self.assertEqual(granted, [1])
+        self.assertEqual(budget.free, 2)
+
+    def test_slots(self):
+        settings.configure({'COMPUTE_THREADS': 2})
+        with compute.slots() as first:
+            self.assertEqual(first, 2)
+
+        with compute.slots(1) as first:
+            with compute.slots() as second:
+                self.assertEqual((first, second), (1, 1))
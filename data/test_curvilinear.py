@@ -0,0 +1,81 @@
+import unittest
+import curvilinear
+import settings
+import numpy as np
+import shutil
+import tempfile
+
+
+def grid_point(j, i):
+    """A sheared and slightly curved grid, in the manner of ORCA"""
+    return 40 + 0.1 * j + 0.02 * i, -60 + 0.1 * i - 0.03 * j + 0.001 * i * j
+
+
+class TestCurvilinearGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = settings.get('CACHE_DIR')
+        settings.configure({'CACHE_DIR': self.directory})
+
+        j, i = np.meshgrid(np.arange(20.0), np.arange(30.0), indexing='ij')
+        lat, lon = grid_point(j, i)
+        self.grid = curvilinear.CurvilinearGrid('test', 'lat', lat, lon)
+        self.data = np.ma.masked_array(3 * j + 2 * i)
+
+        self.j = np.array([3.25, 10.5, 18.9])
+        self.i = np.array([5.75, 20.1, 28.5])
+        self.lat, self.lon = grid_point(self.j, self.i)
+
+    def tearDown(self):
+        settings.configure({'CACHE_DIR': self.old})
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_locate(self):
+        j, i, fy, fx, valid = self.grid.locate(self.lat, self.lon)
+
+        np.testing.assert_array_equal(j, [3, 10, 18])
+        np.testing.assert_array_equal(i, [5, 20, 28])
+        np.testing.assert_allclose(fy, self.j % 1, atol=1e-3)
+        np.testing.assert_allclose(fx, self.i % 1, atol=1e-3)
+        self.assertTrue(valid.all())
+
+    def test_bilinear(self):
+        out = self.grid.interpolate(self.data, self.lat, self.lon)
+
+        np.testing.assert_allclose(out, 3 * self.j + 2 * self.i, atol=1e-2)
+
+    def test_offset(self):
+        out = self.grid.interpolate(self.data[2:12, 4:22], self.lat,
+                                    self.lon, offset=(2, 4))
+
+        np.testing.assert_allclose(out[:2], 3 * self.j[:2] + 2 * self.i[:2],
+                                   atol=1e-2)
+        self.assertTrue(out.mask[2])
+
+    def test_nearest(self):
+        out = self.grid.interpolate(self.data, self.lat, self.lon,
+                                    method='nearest')
+
+        y, x, d = self.grid.find_index(self.lat, self.lon)
+        np.testing.assert_array_equal(out, self.data[y, x])
+
+    def test_idw(self):
+        lat, lon = grid_point(5, 7)
+        out = self.grid.interpolate(self.data, [lat], [lon], method='idw')
+
+        np.testing.assert_allclose(out, [29], atol=1e-6)
+
+    def test_outside(self):
+        out = self.grid.interpolate(self.data, [60], [-60])
+
+        self.assertTrue(out.mask.all())
+
+    def test_masked_corner(self):
+        data = self.data.copy()
+        data[3, 5] = np.ma.masked
+
+        out = self.grid.interpolate(data, self.lat[:1], self.lon[:1])
+
+        self.assertFalse(out.mask[0])
+        self.assertTrue(20 < out[0] < 23)
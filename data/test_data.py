@@ -0,0 +1,39 @@
+import unittest
+from data import Variable, VariableList
+
+
+class TestVariableList(unittest.TestCase):
+
+    def setUp(self):
+        self.variables = VariableList([
+            Variable('votemper', 'Temperature', 'Kelvin', ('time', 'y', 'x')),
+            Variable('vosaline', 'Salinity', 'PSU', ('time', 'y', 'x')),
+        ])
+
+    def test_getitem(self):
+        self.assertEqual(self.variables['vosaline'].name, 'Salinity')
+        self.assertEqual(self.variables[0].key, 'votemper')
+        self.assertIs(self.variables[self.variables[1]], self.variables[1])
+
+        with self.assertRaises(IndexError):
+            self.variables['missing']
+
+    def test_contains(self):
+        self.assertTrue('votemper' in self.variables)
+        self.assertFalse('missing' in self.variables)
+        self.assertTrue(self.variables[0] in self.variables)
+
+    def test_modified(self):
+        self.variables.append(Variable('vozocrtx', 'Velocity', 'm/s', ()))
+        self.assertTrue('vozocrtx' in self.variables)
+
+        del self.variables[0]
+        self.assertFalse('votemper' in self.variables)
+
+        self.variables[0] = Variable('sossheig', 'Height', 'm', ())
+        self.assertFalse('vosaline' in self.variables)
+        self.assertEqual(self.variables['sossheig'].unit, 'm')
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.variables[0].extra = 1
@@ -0,0 +1,113 @@
+import unittest
+import threading
+import time
+import executor
+import settings
+
+
+class FakeData(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.lock = threading.Lock()
+        self.open = 0
+        self.most = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.open += 1
+            self.most = max(self.most, self.open)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.lock:
+            self.open -= 1
+
+
+class TestExecutor(unittest.TestCase):
+
+    def test_order(self):
+        a = FakeData('a')
+        b = FakeData('b')
+
+        def read(value, delay):
+            def f(d):
+                time.sleep(delay)
+                return (d.url, value)
+            return f
+
+        result = executor.fetch([
+            (a, read(0, 0.05)),
+            (b, read(1, 0)),
+            (a, read(2, 0.02)),
+        ])
+        self.assertEqual(result, [('a', 0), ('b', 1), ('a', 2)])
+        self.assertEqual(a.open, 0)
+        self.assertEqual(executor.fetch([]), [])
+
+    def test_error(self):
+        a = FakeData('error')
+
+        def fail(d):
+            raise KeyError('variable')
+
+        with self.assertRaises(KeyError):
+            executor.fetch([(a, lambda d: 1), (a, fail)])
+
+        self.assertEqual(a.open, 0)
+
+    def test_dataset_limit(self):
+        old = settings.get('FETCH_DATASET_THREADS')
+        try:
+            settings.configure({'FETCH_DATASET_THREADS': 2})
+            a = FakeData('limit')
+
+            def read(d):
+                time.sleep(0.02)
+                return d.url
+
+            result = executor.fetch([(a, read)] * 6)
+            self.assertEqual(result, ['limit'] * 6)
+            self.assertLessEqual(a.most, 2)
+        finally:
+            settings.configure({'FETCH_DATASET_THREADS': old})
+
+    def test_local(self):
+        # Local files are read one at a time, OPeNDAP urls overlap
+        local = [FakeData('/data/a.nc'), FakeData('/data/b.nc')]
+        remote = FakeData('http://example.com/remote')
+        running = []
+        most = []
+        lock = threading.Lock()
+
+        def read(d):
+            with lock:
+                running.append(d.url)
+                most.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(d.url)
+
+        executor.fetch([(d, read) for d in local * 2])
+        self.assertEqual(max(most), 1)
+
+        del most[:]
+        executor.fetch([(remote, read)] * 3)
+        self.assertGreater(max(most), 1)
+
+    def test_nested(self):
+        # A read can fetch, even when every thread is busy
+        a = FakeData('http://example.com/nested')
+
+        def read(d):
+            return sum(executor.fetch([(a, lambda d: 1)] * 3))
+
+        threads = threading.active_count()
+        self.assertEqual(
+            executor.fetch([(a, read)] * (settings.get('FETCH_THREADS') + 1)),
+            [3] * (settings.get('FETCH_THREADS') + 1))
+
+        # The threads are kept for the next batch
+        executor.fetch([(a, read)] * 2)
+        self.assertLessEqual(threading.active_count(),
+                             threads + settings.get('FETCH_THREADS'))
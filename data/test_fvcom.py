@@ -2,6 +2,11 @@ import unittest
 import fvcom
 import datetime
 import pytz
+import numpy as np
+import os
+import shutil
+import tempfile
+from netCDF4 import Dataset
 
 
 class TestFvcom(unittest.TestCase):
@@ -43,10 +48,17 @@ class TestFvcom(unittest.TestCase):
                 45.3, -64.0, 0, 0, 'temp'
             )
 
-        self.assertEqual(len(lat.ravel()), 156)
-        self.assertEqual(len(lon.ravel()), 156)
-        self.assertEqual(len(data.ravel()), 156)
-        self.assertAlmostEqual(data[75], 6.90, places=1)
+            # The nearest nodes, not every node in their index range
+            index, d = n._Fvcom__find_index(45.3, -64.0, False, 10)
+            points = np.unique(index)
+            full = n._dataset.variables['temp'][0, 0,
+                                                points[0]:points[-1] + 1]
+
+        self.assertEqual(len(lat.ravel()), 10)
+        self.assertEqual(len(lon.ravel()), 10)
+        self.assertEqual(len(data.ravel()), 10)
+        self.assertAlmostEqual(full[75], 6.90, places=1)
+        np.testing.assert_array_equal(data, full[points - points[0]])
 
     def test_get_profile(self):
         with fvcom.Fvcom('data/testdata/fvcom_test.nc') as n:
@@ -75,3 +87,70 @@ class TestFvcom(unittest.TestCase):
             # List is immutable
             with self.assertRaises(ValueError):
                 n.timestamps[0] = 0
+
+
+class TestFvcomDepths(unittest.TestCase):
+
+    def setUp(self):
+        # A strip of triangles, with the levels moving with zeta
+        self.directory = tempfile.mkdtemp()
+        self.url = os.path.join(self.directory, 'mesh.nc')
+        lat = np.tile([45.0, 45.1], 5)
+        lon = np.repeat(np.arange(5) * 0.1 - 64, 2)
+        self.nv = np.array([[i, i + 1, i + 2] for i in range(8)]).T
+        self.h = np.arange(10, 20, dtype=np.float32)
+        self.siglay = np.outer([-0.25, -0.75], np.ones(10)).astype(np.float32)
+        self.zeta = np.array([np.linspace(0, 1, 10), np.linspace(1, 0, 10)],
+                             dtype=np.float32)
+        with Dataset(self.url, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('node', 10)
+            ds.createDimension('nele', 8)
+            ds.createDimension('three', 3)
+            ds.createDimension('siglay', 2)
+            ds.createVariable('lat', 'f4', ('node',))[:] = lat
+            ds.createVariable('lon', 'f4', ('node',))[:] = lon
+            ds.createVariable('latc', 'f4', ('nele',))[:] = \
+                lat[self.nv].mean(axis=0)
+            ds.createVariable('lonc', 'f4', ('nele',))[:] = \
+                lon[self.nv].mean(axis=0)
+            ds.createVariable('nv', 'i4', ('three', 'nele'))[:] = self.nv + 1
+            ds.createVariable('h', 'f4', ('node',))[:] = self.h
+            ds.createVariable('siglay', 'f4', ('siglay', 'node'))[:] = \
+                self.siglay
+            ds.createVariable('zeta', 'f4', ('time', 'node'))[:] = self.zeta
+            u = ds.createVariable('u', 'f4', ('time', 'siglay', 'nele'))
+            u.coordinates = 'latc lonc'
+            u[:] = np.zeros((2, 2, 8))
+
+        self.lat = lat[self.nv].mean(axis=0)
+        self.lon = lon[self.nv].mean(axis=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def expected(self, time):
+        # z = -(sigma * (h + zeta) + zeta), as read in full
+        zeta = self.zeta[time]
+        return -1 * (self.siglay * (self.h + zeta) + zeta)
+
+    def test_column_depths(self):
+        nodes = np.array([1, 4, 9])
+        with fvcom.Fvcom(self.url) as n:
+            z = n._Fvcom__column_depths('siglay', 1, nodes)
+            np.testing.assert_allclose(z, self.expected(1)[:, nodes],
+                                       rtol=1e-6)
+
+            z = n._Fvcom__column_depths('siglay', [0, 1], nodes)
+            self.assertEqual(z.shape, (2, 2, 3))
+            for t in [0, 1]:
+                np.testing.assert_allclose(z[:, t], self.expected(t)[:, nodes],
+                                           rtol=1e-6)
+
+    def test_element_depths(self):
+        with fvcom.Fvcom(self.url) as n:
+            p, d = n.get_profile(self.lat[2:5], self.lon[2:5], 1, 'u')
+
+        # The mean of the depths at the corners of each element
+        expected = self.expected(1)[:, self.nv[:, 2:5]].mean(axis=1)
+        np.testing.assert_allclose(d, expected.T, rtol=1e-5)
@@ -0,0 +1,62 @@
+import unittest
+import grid_index
+import settings
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+class TestGridIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache_dir = settings.get('CACHE_DIR')
+        settings.configure({'CACHE_DIR': self.cache_dir})
+
+        self.lat, self.lon = np.meshgrid(
+            np.linspace(40, 50, 11),
+            np.linspace(-60, -50, 21),
+            indexing='ij'
+        )
+
+    def tearDown(self):
+        settings.configure({'CACHE_DIR': self.old_cache_dir})
+        shutil.rmtree(self.cache_dir)
+
+    def test_to_xyz(self):
+        xyz = grid_index.to_xyz(self.lat, self.lon)
+
+        self.assertEqual(xyz.shape, (self.lat.size, 3))
+        self.assertEqual(xyz.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(xyz, axis=1), 1,
+                                   rtol=1e-6)
+
+        xyz = grid_index.to_xyz(0, 90)
+        np.testing.assert_allclose(xyz, [[0, 1, 0]], atol=1e-6)
+
+    def test_triples_persisted(self):
+        triples = grid_index.load_triples('url', 'nav_lat',
+                                          self.lat, self.lon)
+        self.assertIsInstance(triples, np.memmap)
+
+        files = os.listdir(os.path.join(self.cache_dir, 'grid_index'))
+        self.assertEqual(len(files), 1)
+
+        # Same grid, same file
+        grid_index.load_triples('url', 'nav_lat', self.lat, self.lon)
+        files = os.listdir(os.path.join(self.cache_dir, 'grid_index'))
+        self.assertEqual(len(files), 1)
+
+        # Different coordinates, different key
+        grid_index.load_triples('url', 'nav_lat', self.lat + 1, self.lon)
+        files = os.listdir(os.path.join(self.cache_dir, 'grid_index'))
+        self.assertEqual(len(files), 2)
+
+    def test_kdtree(self):
+        kdt = grid_index.kdtree('url', 'nav_lat', self.lat, self.lon)
+        d, i = kdt.query(grid_index.to_xyz(45.1, -55.1), k=1)
+        iy, ix = np.unravel_index(i, self.lat.shape)
+
+        self.assertEqual(iy[0], 5)
+        self.assertEqual(ix[0], 10)
@@ -0,0 +1,100 @@
+import unittest
+import lazy
+import settings
+import numpy as np
+
+
+class FakeVariable(object):
+    dimensions = ('time', 'depth', 'y', 'x')
+
+    def __init__(self, shape):
+        self.shape = shape
+
+
+class FakeData(object):
+    url = 'fake'
+    depth_dimensions = ['depth']
+    profile_depths_by_time = False
+
+    def __init__(self, shape=(20, 5, 10, 10)):
+        self.reads = []
+        self.shape = shape
+
+    def _variable(self, variable):
+        return FakeVariable(self.shape)
+
+    def get_point(self, latitude, longitude, depth, time, variable,
+                  return_depth=False, resolution=None):
+        self.reads.append(list(time))
+        values = np.ma.array([[t * 10 + p for t in time]
+                              for p in range(len(latitude))])
+        depths = np.ma.array([[depth] * len(latitude) for t in time])
+        if return_depth:
+            return values, depths
+        return values
+
+    def get_profile(self, latitude, longitude, time, variable):
+        self.reads.append(list(time))
+        return (np.ma.array([[t] * 5 for t in time]),
+                np.arange(5))
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        self.old = settings.get('LAZY_MEMORY_LIMIT')
+        self.fake = FakeData()
+        self.dataset = lazy.LazyData(self.fake)
+
+    def tearDown(self):
+        settings.configure({'LAZY_MEMORY_LIMIT': self.old})
+
+    def test_chunks(self):
+        self.assertEqual(lazy._chunks(5, 10), [(0, 5)])
+        self.assertEqual(lazy._chunks(10, 4), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(lazy._chunks(8, 4), [(0, 4), (4, 8)])
+        self.assertEqual(lazy._chunks(3, 1), [(0, 3)])
+
+    def test_unchunked(self):
+        values = self.dataset.get_point([0, 1], [0, 1], 0, range(20), 'v')
+
+        self.assertEqual(values.shape, (2, 20))
+        self.assertEqual(len(self.fake.reads), 1)
+
+    def test_point(self):
+        # Four times of one level fit
+        settings.configure({'LAZY_MEMORY_LIMIT': 4 * 800})
+        values = self.dataset.get_point([0, 1], [0, 1], 3, range(20), 'v')
+
+        self.assertGreater(len(self.fake.reads), 1)
+        self.assertTrue(all(len(r) <= 4 for r in self.fake.reads))
+        np.testing.assert_array_equal(values[1], np.arange(20) * 10 + 1)
+
+        # The depths aren't laid out the same way by every backend
+        del self.fake.reads[:]
+        values, depths = self.dataset.get_point([0, 1], [0, 1], 3,
+                                                range(20), 'v',
+                                                return_depth=True)
+        self.assertEqual(len(self.fake.reads), 1)
+        self.assertEqual(depths.shape, (20, 2))
+
+    def test_few_points(self):
+        # A year of hourly data at a point of a large grid is one read
+        self.fake = FakeData((8760, 50, 1021, 1442))
+        self.dataset = lazy.LazyData(self.fake)
+
+        self.dataset.get_point([0], [0], 0, range(8760), 'v')
+        self.dataset.get_profile(0, 0, range(8760), 'v')
+        self.assertEqual(len(self.fake.reads), 2)
+
+    def test_profile(self):
+        settings.configure({'LAZY_MEMORY_LIMIT': 4 * 4000})
+        values, depths = self.dataset.get_profile(0, 0, range(20), 'v')
+
+        self.assertGreater(len(self.fake.reads), 1)
+        np.testing.assert_array_equal(values[:, 0], np.arange(20))
+        np.testing.assert_array_equal(depths, np.arange(5))
+
+    def test_delegated(self):
+        self.assertEqual(self.dataset.depth_dimensions, ['depth'])
+        self.assertEqual(self.dataset.url, 'fake')
@@ -3,6 +3,10 @@ import mercator
 import numpy as np
 import datetime
 import pytz
+import os
+import shutil
+import tempfile
+from netCDF4 import Dataset
 
 
 class TestMercator(unittest.TestCase):
@@ -78,3 +82,59 @@ class TestMercator(unittest.TestCase):
             # List is immutable
             with self.assertRaises(ValueError):
                 n.timestamps[0] = 0
+
+
+class TestMercatorSeam(unittest.TestCase):
+
+    def setUp(self):
+        # A global -180..175 axis, the values smooth across the seam
+        self.directory = tempfile.mkdtemp()
+        self.url = os.path.join(self.directory, 'global.nc')
+        lat = np.arange(-10, 11, 5.0)
+        lon = np.arange(-180, 180, 5.0)
+        with Dataset(self.url, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('depth', 2)
+            ds.createDimension('lat', len(lat))
+            ds.createDimension('lon', len(lon))
+            t = ds.createVariable('time', 'f8', ('time',))
+            t.units = 'seconds since 1950-01-01 00:00:00'
+            t[:] = [0, 3600, 7200]
+            d = ds.createVariable('depth', 'f4', ('depth',))
+            d.units = 'm'
+            d[:] = [0, 10]
+            ds.createVariable('lat', 'f4', ('lat',))[:] = lat
+            ds.createVariable('lon', 'f4', ('lon',))[:] = lon
+            var = ds.createVariable('votemper', 'f4',
+                                    ('time', 'depth', 'lat', 'lon'))
+            var[:] = (np.cos(np.radians(lon)) +
+                      np.arange(2)[:, np.newaxis, np.newaxis] * 10 +
+                      np.arange(3)[:, np.newaxis, np.newaxis, np.newaxis] *
+                      100 + 0 * lat[:, np.newaxis])
+
+        # 178 is bilinear in longitude between 175 and 180
+        self.expected = 0.4 * np.cos(np.radians(175)) + \
+            0.6 * np.cos(np.radians(180))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_seam(self):
+        with mercator.Mercator(self.url) as n:
+            for lon in [178, -182]:
+                self.assertAlmostEqual(n.get_point(0, lon, 0, 0, 'votemper'),
+                                       self.expected, places=5)
+
+            p, d = n.get_profile(0, 178, 1, 'votemper')
+            np.testing.assert_allclose(p, self.expected + [100, 110],
+                                       rtol=1e-5)
+
+    def test_profile_times(self):
+        with mercator.Mercator(self.url) as n:
+            p, d = n.get_profile(0, 178, [0, 2], 'votemper')
+
+        self.assertEqual(p.shape, (2, 2))
+        self.assertFalse(np.ma.is_masked(p))
+        np.testing.assert_allclose(
+            p, self.expected + np.array([[0, 10], [200, 210]]),
+            rtol=1e-5)
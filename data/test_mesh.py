@@ -0,0 +1,105 @@
+import unittest
+import mesh
+import settings
+import numpy as np
+import shutil
+import tempfile
+
+
+class TestTriangleMesh(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = settings.get('CACHE_DIR')
+        settings.configure({'CACHE_DIR': self.directory})
+
+        # Two triangles over a square, nv 1-based in (3, nele) as in FVCOM
+        self.lat = np.array([45.0, 45.0, 45.1, 45.1])
+        self.lon = np.array([-64.0, -63.9, -64.0, -63.9])
+        nv = np.array([[1, 2, 4], [1, 4, 3]]).T
+        self.mesh = mesh.TriangleMesh('test', self.lat, self.lon, nv)
+
+    def tearDown(self):
+        settings.configure({'CACHE_DIR': self.old})
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_locate(self):
+        element, weight = self.mesh.locate(
+            np.array([45.02, 45.08, 46.0]), np.array([-63.92, -63.98, -64.0]))
+
+        np.testing.assert_array_equal(element, [0, 1, -1])
+        np.testing.assert_allclose(weight.sum(axis=1)[:2], 1)
+
+        element, weight = self.mesh.locate(45.0, -63.9)
+        np.testing.assert_allclose(weight[0], [0, 1, 0], atol=1e-6)
+
+    def test_locate_elongated(self):
+        # A long, thin element along a coast, next to a strip of small
+        # ones, all of whose centres are nearer the point than its own
+        lat = [45.0, 45.0, 45.001] + [45.005] * 6 + [45.015] * 6
+        lon = [-64.0, -63.0, -64.0] + list(-64 + 0.01 * np.arange(6)) * 2
+        nv = [[0, 1, 2]]
+        for i in range(5):
+            nv += [[3 + i, 4 + i, 9 + i], [4 + i, 10 + i, 9 + i]]
+        m = mesh.TriangleMesh('elongated', np.array(lat), np.array(lon),
+                              np.array(nv))
+
+        element, weight = m.locate(45.0002, -63.99)
+        np.testing.assert_array_equal(element, [0])
+        np.testing.assert_allclose(weight.sum(axis=1), 1)
+
+        element, weight = m.locate(45.002, -63.5)
+        np.testing.assert_array_equal(element, [-1])
+
+    def test_node(self):
+        lat = np.array([45.03, 45.07, 45.05])
+        lon = np.array([-63.95, -63.99, -63.91])
+        neighbours = self.mesh.neighbours(lat, lon)
+
+        # Linear fields are interpolated exactly
+        values = self.lat * 10 + self.lon
+        np.testing.assert_allclose(neighbours.apply(values),
+                                   lat * 10 + lon, rtol=1e-6)
+
+    def test_element(self):
+        neighbours = self.mesh.neighbours(np.array([45.02, 45.08]),
+                                          np.array([-63.92, -63.98]),
+                                          'element')
+
+        np.testing.assert_array_equal(
+            neighbours.apply(np.array([5.0, 7.0])), [5, 7])
+
+    def test_centre(self):
+        neighbours = self.mesh.neighbours(np.array([45.02]),
+                                          np.array([-63.92]), 'centre')
+
+        np.testing.assert_allclose(
+            neighbours.apply(np.array([0.0, 3.0, 0.0, 6.0])), [3])
+
+    def test_outside(self):
+        neighbours = self.mesh.neighbours(np.array([45.05, 50]),
+                                          np.array([-63.95, -60]))
+
+        result = neighbours.apply(np.arange(4.0))
+        self.assertFalse(result.mask[0])
+        self.assertTrue(result.mask[1])
+
+    def test_compact(self):
+        neighbours = self.mesh.neighbours(np.array([45.02]),
+                                          np.array([-63.92]))
+        points, local = mesh.compact(neighbours)
+
+        np.testing.assert_array_equal(points, [0, 1, 3])
+        values = np.arange(4.0) * 2
+        np.testing.assert_allclose(local.apply(values[points]),
+                                   neighbours.apply(values))
+
+    def test_hilbert_order(self):
+        lat, lon = np.meshgrid(np.arange(8.0), np.arange(8.0), indexing='ij')
+        order = mesh.hilbert_order(lat.ravel(), lon.ravel(), bits=3)
+
+        self.assertEqual(sorted(order), range(64))
+        # Consecutive points along the curve are neighbours on the grid
+        step = np.abs(np.diff(lat.ravel()[order])) + \
+            np.abs(np.diff(lon.ravel()[order]))
+        np.testing.assert_array_equal(step, 1)
@@ -0,0 +1,184 @@
+import unittest
+import mirror
+import settings
+import numpy as np
+import os
+import shutil
+import tempfile
+from netCDF4 import Dataset
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = settings.get('MIRROR_DIR')
+        settings.configure({
+            'MIRROR_DIR': os.path.join(self.directory, 'mirror')
+        })
+
+        self.url = os.path.join(self.directory, 'source.nc')
+        self.data = np.ma.masked_array(
+            np.random.RandomState(0).uniform(-2, 30, (2, 3, 10, 12)))
+        self.data[:, 2, 4, 5] = np.ma.masked
+        with Dataset(self.url, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('depth', 3)
+            ds.createDimension('y', 10)
+            ds.createDimension('x', 12)
+            ds.title = 'Source'
+            ds.createVariable('time', 'f8', ('time',))[:] = [0, 24]
+            ds.createVariable('depth', 'f4', ('depth',))[:] = [0, 10, 20]
+            ds.createVariable('nav_lat', 'f8', ('y', 'x'))[:] = \
+                np.arange(120).reshape(10, 12)
+            v = ds.createVariable('votemper', 'f8',
+                                  ('time', 'depth', 'y', 'x'),
+                                  fill_value=1e20)
+            v.units = 'degC'
+            v[:] = self.data
+            s = ds.createVariable('sossheig', 'f8', ('time', 'y', 'x'))
+            s[:] = self.data[:, 0]
+
+    def tearDown(self):
+        settings.configure({'MIRROR_DIR': self.old})
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_lookup(self):
+        self.assertIsNone(mirror.lookup(self.url))
+
+        path = mirror.ingest(self.url)
+
+        self.assertEqual(mirror.lookup(self.url), path)
+        self.assertEqual(mirror.mirrors()[0]['url'], self.url)
+
+        mirror.remove(self.url)
+        self.assertIsNone(mirror.lookup(self.url))
+
+    def test_ingest(self):
+        path = mirror.ingest(self.url, variables=['votemper'])
+
+        with Dataset(path, 'r') as ds:
+            self.assertEqual(ds.title, 'Source')
+            self.assertNotIn('sossheig', ds.variables)
+
+            var = ds.variables['votemper']
+            self.assertEqual(var.dtype, np.float32)
+            self.assertEqual(var.chunking(), [1, 1, 10, 12])
+            self.assertEqual(var.units, 'degC')
+            np.testing.assert_array_equal(var[:].mask, self.data.mask)
+            np.testing.assert_allclose(var[:], self.data, rtol=1e-6)
+
+            self.assertEqual(ds.variables['nav_lat'].dtype, np.float64)
+
+    def test_pack(self):
+        path = mirror.ingest(self.url, pack=True)
+
+        with Dataset(path, 'r') as ds:
+            var = ds.variables['votemper']
+            self.assertEqual(var.dtype, np.int16)
+            np.testing.assert_array_equal(var[:].mask, self.data.mask)
+            np.testing.assert_allclose(var[:], self.data, atol=1e-3)
+
+    def test_pack_valid_range(self):
+        url = os.path.join(self.directory, 'range.nc')
+        with Dataset(url, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('x', 4)
+            ds.createVariable('time', 'f8', ('time',))[:] = [0]
+            v = ds.createVariable('votemper', 'f8', ('time', 'x'))
+            v.valid_min = -2.0
+            v.valid_max = 35.0
+            v.set_auto_mask(False)
+            v[:] = [[-2, 1, 20, 40]]
+
+        path = mirror.ingest(url, pack=True)
+
+        with Dataset(path, 'r') as ds:
+            var = ds.variables['votemper']
+            self.assertEqual(var.valid_min, -32767)
+            self.assertEqual(var.valid_max, 32767)
+
+            # Values outside the valid range are missing in the source too
+            np.testing.assert_allclose(var[0, :3], [-2, 1, 20], atol=1e-3)
+            np.testing.assert_array_equal(var[:].mask,
+                                          [[False, False, False, True]])
+
+        # Some datasets store the range as text
+        self.assertEqual(mirror._number('35 degC'), 35.0)
+        self.assertIsNone(mirror._number('none'))
+
+    def test_sidecars(self):
+        path = mirror.ingest(self.url)
+
+        np.testing.assert_array_equal(
+            mirror.sidecar(path, 'coords', 'nav_lat'),
+            np.arange(120).reshape(10, 12))
+
+        index = mirror.sidecar(path, 'bottom', 'votemper')
+        self.assertEqual(index[4, 5], 1)
+        self.assertEqual(index[0, 0], 2)
+
+        self.assertIsNone(mirror.sidecar(self.url, 'coords', 'nav_lat'))
+
+    def test_reingest(self):
+        first = os.path.realpath(mirror.ingest(self.url))
+        second = os.path.realpath(mirror.ingest(self.url))
+
+        self.assertNotEqual(first, second)
+        self.assertFalse(os.path.exists(first))
+
+    def test_reorder(self):
+        # A strip of triangles with the nodes in a scattered order
+        url = os.path.join(self.directory, 'mesh.nc')
+        order = np.random.RandomState(1).permutation(10)
+        lat = np.tile([45.0, 45.1], 5)[order]
+        lon = np.repeat(np.arange(5) * 0.1 - 64, 2)[order]
+        position = np.argsort(order)
+        nv = np.array([[position[i], position[i + 1], position[i + 2]]
+                       for i in range(8)]).T + 1
+        nbe = np.array([[i, i + 2 if i < 7 else 0, 0]
+                        for i in range(8)]).T
+        nbsn = np.array([[position[i - 1] + 1 if i > 0 else 0,
+                          position[i + 1] + 1 if i < 9 else 0, 0]
+                         for i in order]).T
+        with Dataset(url, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('node', 10)
+            ds.createDimension('nele', 8)
+            ds.createDimension('three', 3)
+            ds.createVariable('lat', 'f4', ('node',))[:] = lat
+            ds.createVariable('lon', 'f4', ('node',))[:] = lon
+            ds.createVariable('latc', 'f4', ('nele',))[:] = \
+                lat[nv - 1].mean(axis=0)
+            ds.createVariable('lonc', 'f4', ('nele',))[:] = \
+                lon[nv - 1].mean(axis=0)
+            ds.createVariable('nv', 'i4', ('three', 'nele'))[:] = nv
+            # The neighbours of each element and node, 0 for none
+            ds.createVariable('nbe', 'i4', ('three', 'nele'))[:] = nbe
+            ds.createVariable('nbsn', 'i4', ('three', 'node'))[:] = nbsn
+            ds.createVariable('temp', 'f4', ('time', 'node'))[:] = \
+                [lat * lon]
+
+        path = mirror.ingest(url, reorder=True)
+
+        node = mirror.sidecar(path, 'order', 'node')
+        self.assertEqual(sorted(node), range(10))
+        with Dataset(path, 'r') as ds:
+            np.testing.assert_allclose(ds.variables['lat'][:], lat[node])
+            np.testing.assert_allclose(ds.variables['temp'][0],
+                                       (lat * lon)[node], rtol=1e-6)
+            # The elements still have the same corners
+            nele = mirror.sidecar(path, 'order', 'nele')
+            stored = ds.variables['nv'][:] - 1
+            np.testing.assert_allclose(ds.variables['lat'][:][stored],
+                                       lat[nv - 1][:, nele])
+
+            # So do the neighbours, in the stored numbering
+            for name, index, source in [('nbe', nele, nbe),
+                                        ('nbsn', node, nbsn)]:
+                stored = ds.variables[name][:]
+                np.testing.assert_array_equal(stored == 0,
+                                              source[:, index] == 0)
+                np.testing.assert_array_equal(
+                    index[stored[stored > 0] - 1] + 1,
+                    source[:, index][stored > 0])
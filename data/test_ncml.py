@@ -0,0 +1,101 @@
+import unittest
+import ncml
+import numpy as np
+import os
+import shutil
+import tempfile
+from netCDF4 import Dataset
+
+NCML = """<?xml version="1.0" encoding="UTF-8"?>
+<netcdf xmlns="http://www.unidata.ucar.edu/namespaces/netcdf/ncml-2.2">
+  <attribute name="title" value="Test aggregation" />
+  <aggregation type="union">
+    <netcdf>
+      <aggregation dimName="time" type="joinExisting">
+        <scan location="temp/" suffix=".nc" />
+      </aggregation>
+    </netcdf>
+    <netcdf>
+      <aggregation dimName="time" type="joinExisting">
+        <netcdf location="salt/salt_0.nc" ncoords="3" />
+        <netcdf location="file:salt/salt_1.nc" />
+      </aggregation>
+    </netcdf>
+  </aggregation>
+  <variable name="temperature" orgName="votemper">
+    <attribute name="units" value="degC" />
+  </variable>
+</netcdf>
+"""
+
+
+class TestNcml(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.temp = np.arange(5 * 4 * 6, dtype=np.float32).reshape(5, 4, 6)
+        self.salt = -self.temp
+
+        for name, var, data, splits in [('temp', 'votemper', self.temp,
+                                         [(0, 2), (2, 5)]),
+                                        ('salt', 'vosaline', self.salt,
+                                         [(0, 3), (3, 5)])]:
+            os.mkdir(os.path.join(self.directory, name))
+            for i, (start, stop) in enumerate(splits):
+                path = os.path.join(self.directory, name,
+                                    '%s_%d.nc' % (name, i))
+                with Dataset(path, 'w') as ds:
+                    ds.createDimension('time', None)
+                    ds.createDimension('y', 4)
+                    ds.createDimension('x', 6)
+                    t = ds.createVariable('time', 'f8', ('time',))
+                    t.units = 'hours since 2017-01-01 00:00:00'
+                    t[:] = np.arange(start, stop)
+                    ds.createVariable('depth', 'f4', ('y', 'x'))[:] = i
+                    v = ds.createVariable(var, 'f4', ('time', 'y', 'x'))
+                    v.units = 'Kelvin'
+                    v[:] = data[start:stop]
+
+        self.path = os.path.join(self.directory, 'aggregated.ncml')
+        with open(self.path, 'w') as f:
+            f.write(NCML)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_is_local(self):
+        self.assertTrue(ncml.is_local('/data/aggregated.ncml'))
+        self.assertFalse(ncml.is_local(
+            'http://localhost:8080/thredds/dodsC/aggregated.ncml'))
+        self.assertFalse(ncml.is_local('/data/file.nc'))
+
+    def test_structure(self):
+        with ncml.NcmlDataset(self.path) as ds:
+            self.assertEqual(
+                sorted(ds.variables),
+                ['depth', 'temperature', 'time', 'vosaline'])
+            self.assertEqual(len(ds.dimensions['time']), 5)
+            self.assertEqual(ds.title, 'Test aggregation')
+            self.assertEqual(ds.variables['temperature'].units, 'degC')
+            self.assertEqual(ds.variables['vosaline'].units, 'Kelvin')
+            self.assertEqual(ds.variables['vosaline'].shape, (5, 4, 6))
+            self.assertEqual(ds.variables['temperature'].dimensions,
+                             ('time', 'y', 'x'))
+
+            # From the first file
+            np.testing.assert_array_equal(ds.variables['depth'][:], 0)
+
+    def test_read(self):
+        with ncml.NcmlDataset(self.path) as ds:
+            temp = ds.variables['temperature']
+            salt = ds.variables['vosaline']
+            time = ds.variables['time']
+
+            np.testing.assert_array_equal(time[:], np.arange(5))
+            np.testing.assert_array_equal(temp[:], self.temp)
+            np.testing.assert_array_equal(temp[1:4, 2, 1:3],
+                                          self.temp[1:4, 2, 1:3])
+            np.testing.assert_array_equal(temp[3], self.temp[3])
+            np.testing.assert_array_equal(salt[[4, 0, 2], 1],
+                                          self.salt[[4, 0, 2], 1])
+            np.testing.assert_array_equal(salt[-1, :, 0], self.salt[-1, :, 0])
@@ -1,8 +1,16 @@
 import unittest
 import nemo
+import settings
 import numpy as np
 import datetime
 import pytz
+import os
+import shutil
+import tempfile
+import threading
+import overview
+import pool
+from netCDF4 import Dataset
 
 
 class TestNemo(unittest.TestCase):
@@ -28,9 +36,56 @@ class TestNemo(unittest.TestCase):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             self.assertAlmostEqual(
                 n.get_point(13.0, -149.0, 0, 0, 'votemper'),
-                299.18, places=2
+                299.17, places=2
             )
 
+    def test_get_points(self):
+        with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+            points = n.get_point(np.array([13.0, 14.0, 12.0]),
+                                 np.array([-149.0, -148.0, -150.0]),
+                                 0, 0, 'votemper')
+
+            self.assertEqual(points.shape, (3,))
+            self.assertAlmostEqual(points[0], 299.17, places=2)
+            self.assertAlmostEqual(
+                points[1], n.get_point(14.0, -148.0, 0, 0, 'votemper'))
+
+    def test_interpolation(self):
+        old = settings.get('CURVILINEAR_INTERPOLATION')
+        try:
+            with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+                settings.configure({'CURVILINEAR_INTERPOLATION': 'idw'})
+                self.assertAlmostEqual(
+                    n.get_point(13.0, -149.0, 0, 0, 'votemper'),
+                    299.18, places=2
+                )
+
+                # The value at the nearest grid point
+                settings.configure({'CURVILINEAR_INTERPOLATION': 'nearest'})
+                self.assertAlmostEqual(
+                    n.get_point(13.0, -149.0, 0, 0, 'votemper'),
+                    299.1794, places=4
+                )
+        finally:
+            settings.configure({'CURVILINEAR_INTERPOLATION': old})
+
+    def test_get_point_metres(self):
+        with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+            self.assertAlmostEqual(
+                n.get_point(13.0, -149.0, float(n.depths[10]), 0,
+                            'votemper'),
+                n.get_point(13.0, -149.0, 10, 0, 'votemper')
+            )
+
+            p, d = n.get_profile(13.0, -149.0, 0, 'votemper')
+            r, dep = n.get_point(13.0, -149.0, 100.0, 0, 'votemper',
+                                 return_depth=True)
+            self.assertAlmostEqual(r, np.interp(100.0, d, p), places=4)
+            self.assertEqual(dep, 100.0)
+
+            self.assertTrue(np.ma.is_masked(
+                n.get_point(13.0, -149.0, 10000.0, 0, 'votemper')))
+
     def test_get_raw_point(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             lat, lon, data = n.get_raw_point(
@@ -45,11 +100,55 @@ class TestNemo(unittest.TestCase):
     def test_get_profile(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             p, d = n.get_profile(13.0, -149.0, 0, 'votemper')
-            self.assertAlmostEqual(p[0], 299.18, places=2)
-            self.assertAlmostEqual(p[10], 299.16, places=2)
-            self.assertAlmostEqual(p[20], 296.46, places=2)
+            self.assertAlmostEqual(p[0], 299.17, places=2)
+            self.assertAlmostEqual(p[10], 299.15, places=2)
+            self.assertAlmostEqual(p[20], 296.48, places=2)
             self.assertTrue(np.ma.is_masked(p[49]))
 
+    def test_get_profile_slabs(self):
+        with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+            threads = []
+            variable = n._variable
+
+            def record(name):
+                threads.append(threading.current_thread())
+                return variable(name)
+
+            n._variable = record
+            p, d = n.get_profile([13.0, 35.0], [-149.0, -125.0], 0,
+                                 'votemper')
+            del n._variable
+
+            # Each slab is read from the handle of the thread reading it
+            self.assertEqual(len(threads), 2)
+            self.assertNotIn(threading.current_thread(), threads)
+            np.testing.assert_array_equal(
+                p[0], n.get_profile(13.0, -149.0, 0, 'votemper')[0])
+            np.testing.assert_array_equal(
+                p[1], n.get_profile(35.0, -125.0, 0, 'votemper')[0])
+
+    def test_rerun(self):
+        directory = tempfile.mkdtemp()
+        url = os.path.join(directory, 'nemo.nc')
+        shutil.copy('data/testdata/nemo_test.nc', url)
+        try:
+            with nemo.Nemo(url) as n:
+                key = n._variable('votemper')._key
+
+            # A rerun rewrites the same times
+            pool.clear()
+            overview._sources.clear()
+            with Dataset(url, 'a') as ds:
+                ds.variables['votemper'][-1, 0, 0, 0] = 280.0
+
+            with nemo.Nemo(url) as n:
+                self.assertNotEqual(n._variable('votemper')._key, key)
+                self.assertEqual(n._variable('votemper')._key[:2],
+                                 key[:2])
+        finally:
+            pool.clear()
+            shutil.rmtree(directory, ignore_errors=True)
+
     def test_bottom_point(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             self.assertAlmostEqual(
@@ -66,7 +165,45 @@ class TestNemo(unittest.TestCase):
                 )
             )
             r = n.get_area(a, 0, 0, 'votemper')
-            self.assertAlmostEqual(r[5, 5], 301.28, places=2)
+            self.assertAlmostEqual(r[5, 5], 301.27, places=2)
+
+    def test_get_area_variables(self):
+        with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+            a = np.array(
+                np.meshgrid(
+                    np.linspace(5, 10, 10),
+                    np.linspace(-150, -160, 10)
+                )
+            )
+            first, second = n.get_area(a, 0, 0, ['votemper', 'votemper'])
+            np.testing.assert_array_equal(first, second)
+            np.testing.assert_array_equal(
+                first, n.get_area(a, 0, 0, 'votemper'))
+
+            r = n.get_area(a, 'bottom', 0, ['votemper'], return_depth=True)
+            self.assertEqual(len(r), 1)
+            self.assertEqual(r[0][1].shape, (10, 10))
+
+    def test_get_area_stride(self):
+        old = settings.get('LOD_SAMPLES_PER_PIXEL')
+        try:
+            with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+                a = np.array(
+                    np.meshgrid(
+                        np.linspace(-20, 40, 32),
+                        np.linspace(-170, -120, 32)
+                    )
+                )
+                settings.configure({'LOD_SAMPLES_PER_PIXEL': None})
+                full = n.get_area(a, 0, 0, 'votemper')
+
+                # Every 7th point of the grid
+                settings.configure({'LOD_SAMPLES_PER_PIXEL': 1})
+                r = n.get_area(a, 0, 0, 'votemper')
+                self.assertEqual(r.count(), full.count())
+                self.assertLess(np.ma.abs(r - full).mean(), 0.1)
+        finally:
+            settings.configure({'LOD_SAMPLES_PER_PIXEL': old})
 
     def test_get_path_profile(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
@@ -82,15 +219,15 @@ class TestNemo(unittest.TestCase):
     def test_get_timeseries_point(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             r = n.get_timeseries_point(13.0, -149.0, 0, 0, 1, 'votemper')
-            self.assertAlmostEqual(r[0], 299.18, places=2)
+            self.assertAlmostEqual(r[0], 299.17, places=2)
             self.assertAlmostEqual(r[1], 299.72, places=2)
 
     def test_get_timeseries_profile(self):
         with nemo.Nemo('data/testdata/nemo_test.nc') as n:
             r, d = n.get_timeseries_profile(13.0, -149.0, 0, 1, 'votemper')
-            self.assertAlmostEqual(r[0, 0], 299.18, places=2)
-            self.assertAlmostEqual(r[0, 10], 299.16, places=2)
-            self.assertAlmostEqual(r[0, 20], 296.46, places=2)
+            self.assertAlmostEqual(r[0, 0], 299.17, places=2)
+            self.assertAlmostEqual(r[0, 10], 299.15, places=2)
+            self.assertAlmostEqual(r[0, 20], 296.48, places=2)
             self.assertTrue(np.ma.is_masked(r[0, 49]))
 
             self.assertNotEqual(r[0, 0], r[1, 0])
@@ -0,0 +1,99 @@
+import unittest
+import numpy as np
+import shutil
+import tempfile
+import nemo
+import overview
+import settings
+
+
+class TestOverview(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.old = {k: settings.get(k)
+                    for k in ['OVERVIEW_DIR', 'LOD_SAMPLES_PER_PIXEL']}
+        settings.configure({'OVERVIEW_DIR': self.dir})
+
+    def tearDown(self):
+        settings.configure(self.old)
+        shutil.rmtree(self.dir)
+
+    def test_spacing(self):
+        # 0.1 degrees of latitude is about 11 km
+        lat, lon = np.meshgrid(np.linspace(0, 1, 11), np.linspace(0, 1, 11),
+                               indexing='ij')
+        self.assertAlmostEqual(overview.spacing(lat, lon) / 1000, 11.1,
+                               places=0)
+        self.assertIsNone(overview.spacing(lat[0], lon[0]))
+
+    def test_stride(self):
+        self.assertEqual(overview.stride(1000, 10000, 2), 5)
+        self.assertEqual(overview.stride(1000, 1000, 2), 1)
+        self.assertEqual(overview.stride(None, 10000, 2), 1)
+
+    def test_samples(self):
+        np.testing.assert_array_equal(overview.samples(10, 3), [0, 3, 6, 9])
+        np.testing.assert_array_equal(overview.samples(9, 3), [0, 3, 6, 8])
+
+    def test_coarsen(self):
+        data = np.ma.arange(5 * 4, dtype=float).reshape((5, 4))
+        data[0, 0] = np.ma.masked
+
+        result = overview.coarsen(data, 2)
+        self.assertEqual(result.shape, (3, 2))
+        self.assertAlmostEqual(result[0, 0], (1 + 4 + 5) / 3.0)
+        self.assertAlmostEqual(result[2, 1], (18 + 19) / 2.0)
+
+        data[4] = np.ma.masked
+        self.assertTrue(np.ma.is_masked(overview.coarsen(data, 2)[2, 0]))
+
+    def test_coarsen_coordinates(self):
+        lat, lon = np.meshgrid(np.arange(4.0), np.arange(170.0, 178.0, 2),
+                               indexing='ij')
+        clat, clon = overview.coarsen_coordinates(lat, lon, 2)
+
+        self.assertEqual(clat.shape, (2, 2))
+        self.assertAlmostEqual(clat[0, 0], 0.5, places=2)
+        self.assertAlmostEqual(clon[1, 1], 175.0, places=2)
+
+    def test_build(self):
+        with nemo.Nemo('data/testdata/nemo_test.nc') as n:
+            epochs = n.epoch_timestamps
+            overview.build(n.url, ['votemper'], nemo.LATLON_PAIRS, [2],
+                           epochs, [0])
+
+            self.assertEqual(overview.factors(n.url, 'votemper', epochs[0]),
+                             [2])
+            self.assertEqual(overview.factors(n.url, 'votemper', epochs[1]),
+                             [])
+            self.assertEqual(
+                overview.coordinates(n.url, 'nav_lat', 2).shape, (38, 51))
+
+            # Overviews of an earlier run of the same times aren't used
+            var = n._dataset.variables['votemper']
+            source = overview.checksum(n.url, var, 0)
+            self.assertEqual(
+                overview.factors(n.url, 'votemper', epochs[0], source), [2])
+            self.assertEqual(
+                overview.factors(n.url, 'votemper', epochs[0], 'rerun'), [])
+            self.assertNotEqual(overview.checksum(n.url, var, 1), source)
+
+            data = overview.read(n.url, 'votemper', 2, epochs[0], 0,
+                                 [10, 11], [10, 11])
+            full = n._dataset.variables['votemper'][0, 0, 20:24, 20:24]
+            self.assertAlmostEqual(data[0, 0], full[:2, :2].mean(), places=3)
+
+            # An area read from the overview is close to the full grid
+            area = np.array(np.meshgrid(np.linspace(-20, 40, 32),
+                                        np.linspace(-170, -120, 32)))
+            settings.configure({'LOD_SAMPLES_PER_PIXEL': None})
+            expected = n.get_area(area, 0, 0, 'votemper')
+            settings.configure({'LOD_SAMPLES_PER_PIXEL': 1})
+            result = n.get_area(area, 0, 0, 'votemper')
+            self.assertEqual(result.count(), expected.count())
+            self.assertLess(np.ma.abs(result - expected).mean(), 0.05)
+
+            overview.prune(n.url, epochs[1:])
+            self.assertEqual(overview.factors(n.url, 'votemper', epochs[0]),
+                             [])
@@ -0,0 +1,107 @@
+import unittest
+import pool
+import time
+
+
+class FakeHandle(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.open = True
+
+    def isopen(self):
+        return self.open
+
+    def close(self):
+        self.open = False
+
+
+class TestDatasetPool(unittest.TestCase):
+
+    def setUp(self):
+        self.opened = []
+
+        def opener(url):
+            self.opened.append(url)
+            return FakeHandle(url)
+
+        self.pool = pool.DatasetPool(size=2, idle_timeout=60, opener=opener)
+
+    def test_reuse(self):
+        a = self.pool.acquire('a')
+        self.pool.release(a)
+        b = self.pool.acquire('a')
+
+        self.assertIs(a, b)
+        self.assertEqual(self.opened, ['a'])
+
+    def test_concurrent(self):
+        a = self.pool.acquire('a')
+        b = self.pool.acquire('a')
+
+        self.assertIsNot(a, b)
+        self.assertEqual(self.opened, ['a', 'a'])
+
+    def test_size(self):
+        handles = [self.pool.acquire(url) for url in ['a', 'b', 'c']]
+        for h in handles:
+            self.pool.release(h)
+
+        self.assertEqual(self.pool.idle, 2)
+        self.assertFalse(handles[0].open)
+        self.assertTrue(handles[2].open)
+
+    def test_idle_timeout(self):
+        self.pool.idle_timeout = 0
+        a = self.pool.acquire('a')
+        self.pool.release(a)
+        time.sleep(0.01)
+        b = self.pool.acquire('a')
+
+        self.assertIsNot(a, b)
+        self.assertFalse(a.open)
+
+    def test_max_age(self):
+        self.pool.max_age = 0
+        a = self.pool.acquire('a')
+        time.sleep(0.01)
+
+        # Busy handles are reopened too, once they are released
+        self.pool.release(a)
+        self.assertFalse(a.open)
+        self.assertEqual(self.pool.idle, 0)
+
+        self.pool.max_age = 60
+        b = self.pool.acquire('a')
+        self.pool.release(b)
+        self.pool.max_age = 0
+        time.sleep(0.01)
+        c = self.pool.acquire('a')
+
+        self.assertIsNot(b, c)
+        self.assertFalse(b.open)
+        self.assertEqual(self.opened, ['a', 'a', 'a'])
+
+    def test_health_check(self):
+        a = self.pool.acquire('a')
+        self.pool.release(a)
+        a.open = False
+        b = self.pool.acquire('a')
+
+        self.assertIsNot(a, b)
+        self.assertTrue(b.open)
+
+    def test_discard(self):
+        a = self.pool.acquire('a')
+        self.pool.release(a, discard=True)
+
+        self.assertFalse(a.open)
+        self.assertEqual(self.pool.idle, 0)
+
+    def test_clear(self):
+        a = self.pool.acquire('a')
+        self.pool.release(a)
+        self.pool.clear()
+
+        self.assertFalse(a.open)
+        self.assertEqual(self.pool.idle, 0)
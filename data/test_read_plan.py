@@ -0,0 +1,84 @@
+import unittest
+import read_plan
+import numpy as np
+
+
+class RecordingVariable(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = []
+
+    def __getitem__(self, index):
+        self.reads.append(index)
+        return self.data[index]
+
+
+class TestReadPlan(unittest.TestCase):
+
+    def setUp(self):
+        data = np.arange(48 * 3 * 4, dtype=np.float32).reshape(48, 3, 4)
+        self.var = RecordingVariable(np.ma.masked_greater(data, 500))
+
+    def test_runs(self):
+        self.assertEqual(read_plan.runs([1, 2, 3, 4]), [(0, 4, 1)])
+        self.assertEqual(read_plan.runs([0, 6, 12, 13, 14]),
+                         [(0, 3, 6), (3, 5, 1)])
+        self.assertEqual(read_plan.runs([5]), [(0, 1, 1)])
+        self.assertEqual(read_plan.runs([]), [])
+
+    def test_slices(self):
+        self.assertEqual(read_plan.slices([0, 6, 12], 2), [
+            (slice(0, 7, 6), slice(0, 2)),
+            (slice(12, 13, 6), slice(2, 3)),
+        ])
+
+    def test_range(self):
+        result = read_plan.read(self.var, (range(10, 40), 1, slice(None)))
+
+        np.testing.assert_array_equal(result, self.var.data[10:40, 1])
+        self.assertEqual(len(self.var.reads), 1)
+        self.assertEqual(self.var.reads[0][0], slice(10, 40, 1))
+
+    def test_strided(self):
+        result = read_plan.read(self.var, (range(0, 48, 6), slice(None)))
+
+        np.testing.assert_array_equal(result, self.var.data[0:48:6])
+        self.assertEqual(len(self.var.reads), 1)
+
+    def test_chunked(self):
+        # One time step of (3, 4) float32 is 48 bytes
+        result = read_plan.read(self.var, (range(48), slice(None)),
+                                chunk_bytes=48 * 10)
+
+        np.testing.assert_array_equal(result.mask, self.var.data.mask)
+        np.testing.assert_array_equal(result.filled(0),
+                                      self.var.data.filled(0))
+        self.assertEqual(len(self.var.reads), 5)
+
+    def test_order(self):
+        index = [7, 3, 3, -1]
+        result = read_plan.read(self.var, (index, 2, 1))
+
+        np.testing.assert_array_equal(result, self.var.data[index, 2, 1])
+
+    def test_two_lists(self):
+        result = read_plan.read(self.var, ([0, 1, 5], [0, 2], 3))
+
+        np.testing.assert_array_equal(
+            result, self.var.data[[0, 1, 5]][:, [0, 2], 3])
+
+    def test_gather(self):
+        result = read_plan.gather(self.var, (slice(None), 1), [0, 1, 3],
+                                  max_gap=0)
+
+        np.testing.assert_array_equal(result, self.var.data[:, 1, [0, 1, 3]])
+        self.assertEqual(len(self.var.reads), 2)
+
+        var = RecordingVariable(np.arange(100.0).reshape(2, 50))
+        result = read_plan.gather(var, (1,), [3, 5, 30, 33], max_gap=4)
+
+        np.testing.assert_array_equal(result, [53, 55, 80, 83])
+        self.assertEqual(var.reads, [(1, slice(3, 6)), (1, slice(30, 34))])
@@ -0,0 +1,86 @@
+import unittest
+import regular_grid
+import numpy as np
+
+
+class TestRegularGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.lat = np.linspace(-45, 45, 10)
+        self.lon = np.arange(-180, 180, 10.0)
+        self.grid = regular_grid.RegularGrid(self.lat, self.lon)
+
+        lat, lon = np.meshgrid(self.lat, np.mod(self.lon + 360, 360),
+                               indexing='ij')
+        self.data = np.ma.masked_array(lat + 0.1 * lon)
+
+    def test_periodic(self):
+        self.assertTrue(self.grid.periodic)
+        self.assertFalse(
+            regular_grid.RegularGrid(self.lat, self.lon[:10]).periodic)
+
+    def test_find_index(self):
+        y, x = self.grid.find_index([-45, 44, 0], [-180, 179, 6])
+
+        np.testing.assert_array_equal(y, [0, 9, 5])
+        np.testing.assert_array_equal(x, [0, 0, 19])
+
+    def test_find_index_clamped(self):
+        y, x = self.grid.find_index(80, 10)
+
+        np.testing.assert_array_equal(y, [9])
+        np.testing.assert_array_equal(x, [19])
+
+    def test_bilinear(self):
+        out = self.grid.interpolate(self.data, [0, 5], [15, 22.5])
+
+        np.testing.assert_allclose(out, [1.5, 7.25])
+
+    def test_wrap(self):
+        out = self.grid.interpolate(self.data, [5], [355])
+
+        # Halfway between 350 and 0/360
+        np.testing.assert_allclose(out, [5 + 35 / 2.0])
+
+    def test_offset(self):
+        out = self.grid.interpolate(self.data[4:7, 19:22], [0, 5], [15, 22.5],
+                                    offset=(4, 19))
+
+        np.testing.assert_allclose(out, [1.5, 7.25])
+
+    def test_columns(self):
+        # A slab across the seam, the last columns then the first ones
+        columns = [34, 35, 0, 1]
+        out = self.grid.interpolate(self.data[4:7, columns], [5], [355],
+                                    offset=(4, 0), columns=columns)
+
+        np.testing.assert_allclose(out, [5 + 35 / 2.0])
+
+    def test_outside(self):
+        out = self.grid.interpolate(self.data, [80], [10])
+
+        self.assertTrue(out.mask.all())
+
+    def test_masked_corner(self):
+        data = self.data.copy()
+        data[5, 19] = np.ma.masked
+
+        out = self.grid.interpolate(data, [5], [12.5])
+
+        self.assertFalse(np.ma.is_masked(out))
+        np.testing.assert_allclose(out, [5 + 2])
+
+    def test_channels(self):
+        data = np.ma.dstack([self.data, self.data + 1])
+
+        out = self.grid.interpolate(data, [0, 5], [15, 22.5])
+
+        self.assertEqual(out.shape, (2, 2))
+        np.testing.assert_allclose(out[:, 1], out[:, 0] + 1)
+
+    def test_idw(self):
+        out = self.grid.interpolate(self.data, [5, 0], [20, 15],
+                                    method='idw')
+
+        np.testing.assert_allclose(out[0], 7, rtol=1e-6)
+        self.assertLess(abs(out[1] - 1.5), 0.5)
@@ -0,0 +1,86 @@
+import unittest
+import resampling
+import numpy as np
+
+
+class TestResampling(unittest.TestCase):
+
+    def setUp(self):
+        self.lat, self.lon = np.meshgrid(
+            np.linspace(40, 41, 11),
+            np.linspace(-60, -59, 11),
+            indexing='ij'
+        )
+        self.data = np.ma.masked_array(self.lat * 10 + self.lon)
+
+    def test_resample_on_source_point(self):
+        out = resampling.resample(self.lat, self.lon,
+                                  np.array([40.5]), np.array([-59.5]),
+                                  self.data)
+
+        self.assertEqual(out.shape, (1,))
+        self.assertAlmostEqual(out[0], 405 - 59.5, places=3)
+
+    def test_resample_shape(self):
+        lat_out, lon_out = np.meshgrid(np.linspace(40.2, 40.8, 3),
+                                       np.linspace(-59.8, -59.2, 4),
+                                       indexing='ij')
+        out = resampling.resample(self.lat, self.lon, lat_out, lon_out,
+                                  self.data)
+
+        self.assertEqual(out.shape, (3, 4))
+        self.assertFalse(np.ma.is_masked(out))
+
+    def test_masked_source(self):
+        data = self.data.copy()
+        data.data[5, 5] = 1e20
+        data[5, 5] = np.ma.masked
+
+        out = resampling.resample(self.lat, self.lon,
+                                  np.array([40.5]), np.array([-59.5]),
+                                  data)
+
+        self.assertLess(abs(out[0] - (405 - 59.5)), 1)
+
+    def test_out_of_range(self):
+        out = resampling.resample(self.lat, self.lon,
+                                  np.array([0.0]), np.array([0.0]),
+                                  self.data)
+
+        self.assertTrue(out.mask.all())
+
+    def test_cached(self):
+        valid = np.ones(self.lat.shape, dtype=bool)
+        a = resampling.find_neighbours(self.lat, self.lon, valid,
+                                       np.array([40.5]), np.array([-59.5]))
+        b = resampling.find_neighbours(self.lat, self.lon, valid,
+                                       np.array([40.5]), np.array([-59.5]))
+
+        self.assertIs(a, b)
+        np.testing.assert_allclose(a.weight.sum(axis=1), 1)
+
+    def test_apply_channels(self):
+        valid = np.ones(self.lat.shape, dtype=bool)
+        info = resampling.find_neighbours(self.lat, self.lon, valid,
+                                          np.array([40.5, 40.6]),
+                                          np.array([-59.5, -59.4]))
+        data = np.dstack([self.data, self.data * 2]).reshape(-1, 2)
+
+        out = info.apply(data)
+
+        self.assertEqual(out.shape, (2, 2))
+        np.testing.assert_allclose(out[:, 1], out[:, 0] * 2)
+
+    def test_resample_levels(self):
+        data = np.ma.dstack([self.data, self.data + 1, self.data + 2])
+        data[:, :6, 2] = np.ma.masked
+
+        out = resampling.resample(self.lat, self.lon,
+                                  np.array([40.5, 40.5]),
+                                  np.array([-59.5, -59.95]),
+                                  data)
+
+        self.assertEqual(out.shape, (2, 3))
+        np.testing.assert_allclose(out[:, 1], out[:, 0] + 1)
+        self.assertFalse(out.mask[0, 2])
+        self.assertGreater(out[0, 2], out[0, 0] + 2)
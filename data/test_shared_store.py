@@ -0,0 +1,90 @@
+import unittest
+import shared_store
+import settings
+import numpy as np
+import shutil
+import tempfile
+
+
+class TestSharedStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old_directory = settings.get('SHARED_STORE_DIR')
+        settings.configure({'SHARED_STORE_DIR': self.directory})
+
+    def tearDown(self):
+        settings.configure({'SHARED_STORE_DIR': self.old_directory})
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_missing(self):
+        self.assertIsNone(shared_store.get('url', 'nav_lat'))
+
+    def test_put_get(self):
+        a = np.ma.masked_array(np.arange(10.0), mask=[0] * 9 + [1])
+        stored = shared_store.put('url', 'nav_lat', a)
+
+        self.assertIsInstance(stored, np.memmap)
+        self.assertFalse(stored.flags.writeable)
+        np.testing.assert_array_equal(stored, np.arange(10.0))
+
+        np.testing.assert_array_equal(shared_store.get('url', 'nav_lat'),
+                                      np.arange(10.0))
+        self.assertIsNone(shared_store.get('url', 'nav_lon'))
+        self.assertIsNone(shared_store.get('other', 'nav_lat'))
+
+    def test_get_or_create(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return np.ones(5)
+
+        shared_store.get_or_create('url', 'depths', factory)
+        a = shared_store.get_or_create('url', 'depths', factory)
+
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_array_equal(a, np.ones(5))
+
+    def test_sources(self):
+        # The array is built again when its source changes
+        source = np.arange(10.0)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return np.array(source)
+
+        shared_store.get_or_create('url', 'nav_lat', factory, [source])
+        shared_store.get_or_create('url', 'nav_lat', factory, [source])
+        self.assertEqual(len(calls), 1)
+
+        source[5] = -1
+        a = shared_store.get_or_create('url', 'nav_lat', factory, [source])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(a[5], -1)
+
+    def test_checksum(self):
+        a = np.arange(1000.0).reshape(10, 100)
+        self.assertEqual(shared_store.checksum(a), shared_store.checksum(a))
+        self.assertNotEqual(shared_store.checksum(a),
+                            shared_store.checksum(a.reshape(100, 10)))
+
+        # The last point is always part of the sample
+        b = a.copy()
+        b[-1, -1] = 0
+        self.assertNotEqual(shared_store.checksum(a),
+                            shared_store.checksum(b))
+
+    def test_clear(self):
+        shared_store.put('url', 'nav_lat', np.ones(5))
+        shared_store.clear()
+        self.assertIsNone(shared_store.get('url', 'nav_lat'))
+
+    def test_unavailable(self):
+        settings.configure({'SHARED_STORE_DIR': None})
+        a = shared_store.put('url', 'nav_lat', np.ones(5))
+
+        np.testing.assert_array_equal(a, np.ones(5))
+        self.assertFalse(a.flags.writeable)
+        self.assertIsNone(shared_store.get('url', 'nav_lat'))
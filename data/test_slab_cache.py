@@ -0,0 +1,144 @@
+import unittest
+import slab_cache
+import settings
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+class CountingVariable(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return self.data[index]
+
+
+class TestSlabCache(unittest.TestCase):
+
+    def setUp(self):
+        self.old_points = settings.get('SLAB_BLOCK_POINTS')
+        settings.configure({'SLAB_BLOCK_POINTS': 16})
+        slab_cache.clear()
+
+        data = np.arange(3 * 4 * 10 * 10, dtype=np.float32)
+        data = np.ma.masked_greater(data.reshape(3, 4, 10, 10), 430)
+        self.var = CountingVariable(data)
+
+    def tearDown(self):
+        settings.configure({'SLAB_BLOCK_POINTS': self.old_points})
+        slab_cache.clear()
+
+    def assertRead(self, index):
+        result = slab_cache.read('key', self.var, index, 2)
+        expected = self.var.data[index]
+
+        self.assertEqual(result.shape, expected.shape)
+        np.testing.assert_array_equal(result.mask,
+                                      np.ma.getmaskarray(expected))
+        np.testing.assert_array_equal(result.filled(0), expected.filled(0))
+
+    def test_read(self):
+        self.assertRead((1, 2, slice(3, 9), slice(2, 5)))
+        self.assertRead((1, slice(None), slice(3, 9), slice(2, 5)))
+        self.assertRead(([0, 2], 1, slice(0, 10), slice(5, 6)))
+        self.assertRead(([2, 0, 2], 3, slice(0, 10), slice(5, 6)))
+        self.assertRead((-1, -1, slice(8, 10), slice(0, 10)))
+
+    def test_cached(self):
+        slab_cache.read('key', self.var, (1, 2, slice(3, 9), slice(2, 5)), 2)
+        reads = self.var.reads
+        slab_cache.read('key', self.var, (1, 2, slice(4, 8), slice(2, 4)), 2)
+
+        self.assertEqual(self.var.reads, reads)
+
+        slab_cache.read('other', self.var, (1, 2, slice(4, 8), slice(2, 4)),
+                        2)
+        self.assertGreater(self.var.reads, reads)
+
+    def test_block_shape(self):
+        self.assertEqual(slab_cache.block_shape(2), (4, 4))
+        self.assertEqual(slab_cache.block_shape(2, [3, 10]), (3, 10))
+        self.assertEqual(slab_cache.block_shape(2, [1, 2]), (4, 4))
+
+    def test_chunked(self):
+        index = (1, 2, slice(3, 9), slice(2, 5))
+        result = slab_cache.read('key', self.var, index, 2, [2, 4, 5, 5])
+        np.testing.assert_array_equal(result, self.var.data[index])
+
+        # The rest of the time and depth chunks were read along with it
+        reads = self.var.reads
+        slab_cache.read('key', self.var, (0, 2, slice(3, 9), slice(2, 5)), 2,
+                        [2, 4, 5, 5])
+        self.assertEqual(self.var.reads, reads)
+
+        # Rounding out to whole depth chunks would more than double the read
+        slab_cache.clear()
+        slab_cache.read('key', self.var, (1, 2, slice(3, 9), slice(2, 5)), 2,
+                        [1, 4, 5, 5])
+        reads = self.var.reads
+        slab_cache.read('key', self.var, (1, 3, slice(3, 9), slice(2, 5)), 2,
+                        [1, 4, 5, 5])
+        self.assertGreater(self.var.reads, reads)
+
+    def test_cached_variable(self):
+        var = slab_cache.CachedVariable('key', self.var, 2)
+
+        self.assertEqual(var.shape, self.var.shape)
+        np.testing.assert_array_equal(var[0, 0, 0:2, 0:2],
+                                      self.var.data[0, 0, 0:2, 0:2])
+        np.testing.assert_array_equal(var[0, 0, 0, 0:2],
+                                      self.var.data[0, 0, 0, 0:2])
+
+    def test_shared(self):
+        directory = tempfile.mkdtemp()
+        old = settings.get('SHARED_STORE_DIR')
+        settings.configure({'SHARED_STORE_DIR': directory,
+                            'SLAB_CACHE_SHARED': True})
+        try:
+            self.assertRead((2, 3, slice(0, 10), slice(0, 10)))
+            reads = self.var.reads
+            slab_cache.clear()
+            self.assertRead((2, 3, slice(0, 10), slice(0, 10)))
+
+            self.assertEqual(self.var.reads, reads)
+        finally:
+            settings.configure({'SHARED_STORE_DIR': old,
+                                'SLAB_CACHE_SHARED': False})
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def test_shared_trim(self):
+        directory = tempfile.mkdtemp()
+        old = settings.get('SHARED_STORE_DIR')
+        old_size = settings.get('SLAB_CACHE_SHARED_SIZE')
+        settings.configure({'SHARED_STORE_DIR': directory,
+                            'SLAB_CACHE_SHARED': True})
+        try:
+            block = np.ma.masked_array(np.zeros(100))
+            for i, key in enumerate(['a', 'b', 'c']):
+                slab_cache._shared_put(key, block)
+                path = slab_cache._shared_path(key) + '.data.npy'
+                os.utime(path, (1000 * (i + 1), 1000 * (i + 1)))
+            self.assertIsNotNone(slab_cache._shared_get('a'))
+
+            slabs = os.path.join(directory, 'slabs')
+            entry = sum(os.path.getsize(os.path.join(slabs, f))
+                        for f in os.listdir(slabs)) // 3
+            settings.configure({'SLAB_CACHE_SHARED_SIZE': 2 * entry})
+            slab_cache._shared_trim(slabs)
+
+            self.assertIsNotNone(slab_cache._shared_get('a'))
+            self.assertIsNone(slab_cache._shared_get('b'))
+            self.assertIsNotNone(slab_cache._shared_get('c'))
+            self.assertEqual(len(os.listdir(slabs)), 4)
+        finally:
+            settings.configure({'SHARED_STORE_DIR': old,
+                                'SLAB_CACHE_SHARED': False,
+                                'SLAB_CACHE_SHARED_SIZE': old_size})
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,66 @@
+import unittest
+import slab_plan
+import numpy as np
+
+
+class TestSlabPlan(unittest.TestCase):
+
+    def neighbours(self, y, x):
+        # A 3x3 block of grid points around each point
+        dy, dx = np.meshgrid([-1, 0, 1], [-1, 0, 1], indexing='ij')
+        return (np.asarray(y)[:, np.newaxis] + dy.ravel(),
+                np.asarray(x)[:, np.newaxis] + dx.ravel())
+
+    def test_boxes(self):
+        y, x = self.neighbours([10, 0], [20, 99])
+        box = slab_plan.boxes(y, x, (100, 100))
+
+        np.testing.assert_array_equal(box[0], [8, 11, 18, 21])
+        np.testing.assert_array_equal(box[1], [0, 1, 97, 100])
+
+    def test_close(self):
+        y, x = self.neighbours([10, 11, 12], [20, 21, 20])
+        result = slab_plan.plan(y, x, (100, 100), ratio=4)
+
+        self.assertEqual(len(result), 1)
+        np.testing.assert_array_equal(result[0][0], [0, 1, 2])
+
+    def test_transect(self):
+        # A diagonal across the grid is read in many small slabs rather
+        # than one slab of the whole grid
+        steps = np.arange(5, 995, 5)
+        y, x = self.neighbours(steps, steps)
+        result = slab_plan.plan(y, x, (1000, 1000), ratio=4)
+
+        self.assertGreater(len(result), 10)
+        read = sum((b[1] - b[0]) * (b[3] - b[2]) for p, b in result)
+        self.assertLess(read, 1000 * 1000 / 20)
+
+        points = np.concatenate([p for p, b in result])
+        self.assertEqual(sorted(points), range(len(steps)))
+        for p, b in result:
+            self.assertTrue(np.all(steps[p] >= b[0]))
+            self.assertTrue(np.all(steps[p] < b[1]))
+            self.assertTrue(np.all(steps[p] >= b[2]))
+            self.assertTrue(np.all(steps[p] < b[3]))
+
+    def test_scattered(self):
+        # Stations visited back and forth between two areas end up in two
+        # slabs
+        y, x = self.neighbours([10, 500, 12, 502, 11],
+                               [10, 500, 12, 502, 13])
+        result = slab_plan.plan(y, x, (1000, 1000), ratio=4)
+
+        self.assertEqual(sorted(p.tolist() for p, b in result),
+                         [[0, 2, 4], [1, 3]])
+
+    def test_dense(self):
+        # The grid of an area is read in one slab, without grouping
+        y, x = np.meshgrid(np.arange(100, 356), np.arange(200, 456),
+                           indexing='ij')
+        y, x = self.neighbours(y.ravel(), x.ravel())
+        result = slab_plan.plan(y, x, (1000, 1000), ratio=4)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(len(result[0][0]), 256 * 256)
+        self.assertEqual(result[0][1], (98, 356, 198, 456))
@@ -0,0 +1,100 @@
+import unittest
+import timestamps
+import numpy as np
+import datetime
+import json
+import pytz
+from netCDF4 import stringtochar
+
+
+class TestTimestamps(unittest.TestCase):
+
+    def test_numeric_decoder(self):
+        decode = timestamps.numeric_decoder(
+            'hours since 1950-01-01 00:00:00')
+
+        np.testing.assert_array_equal(
+            decode(np.array([0, 24, 587256])),
+            [-631152000, -631065600, 1482969600]
+        )
+
+    def test_numeric_decoder_calendar(self):
+        decode = timestamps.numeric_decoder('days since 2000-01-01', 'noleap')
+
+        np.testing.assert_array_equal(decode(np.array([59])),
+                                      [951868800])
+
+    def test_string_decoder(self):
+        strings = np.array(['2017-03-03T00:00:00.000000',
+                            '2017-03-03T01:00:00.000000'], dtype='S26')
+        chars = stringtochar(strings)
+
+        np.testing.assert_array_equal(
+            timestamps.string_decoder('UTC')(chars),
+            [1488499200, 1488502800]
+        )
+        np.testing.assert_array_equal(
+            timestamps.string_decoder('America/Halifax')(chars),
+            [1488513600, 1488517200]
+        )
+
+    def test_to_datetimes(self):
+        d = timestamps.to_datetimes(np.array([1488499200]))
+
+        self.assertEqual(d[0], datetime.datetime(2017, 3, 3, tzinfo=pytz.UTC))
+
+    def test_to_json(self):
+        epoch = np.array([1491004800, 1493596800])
+
+        result = json.loads(timestamps.to_json(epoch))
+        self.assertEqual(result[1],
+                         {'id': 1, 'value': '2017-05-01T00:00:00+00:00'})
+
+        result = json.loads(timestamps.to_json(epoch, 'month'))
+        self.assertEqual(result[0]['value'], '2017-04-15T00:00:00+00:00')
+
+    def test_refresh_append(self):
+        decoded = []
+
+        def decode(values):
+            decoded.append(len(values))
+            return np.asarray(values, dtype=np.int64) * 10
+
+        t = timestamps.Timestamps(ttl=0)
+        t.refresh(np.arange(3), decode)
+        t.refresh(np.arange(5), decode)
+
+        np.testing.assert_array_equal(t.epoch, [0, 10, 20, 30, 40])
+        self.assertEqual(len(t.datetimes), 5)
+        self.assertEqual(decoded[-1], 2)
+        self.assertFalse(t.epoch.flags.writeable)
+
+    def test_refresh_changed(self):
+        t = timestamps.Timestamps(ttl=0)
+        t.refresh(np.arange(3), lambda v: np.asarray(v, dtype=np.int64))
+        t.refresh(np.arange(10, 14), lambda v: np.asarray(v, dtype=np.int64))
+
+        np.testing.assert_array_equal(t.epoch, [10, 11, 12, 13])
+
+    def test_refresh_ttl(self):
+        t = timestamps.Timestamps(ttl=3600)
+        t.refresh(np.arange(3), lambda v: np.asarray(v, dtype=np.int64))
+        t.refresh(np.arange(5), lambda v: np.asarray(v, dtype=np.int64))
+
+        self.assertEqual(len(t.epoch), 3)
+
+    def test_index_at_or_before(self):
+        epoch = np.array([10, 20, 30])
+
+        self.assertEqual(timestamps.index_at_or_before(epoch, 20), 1)
+        self.assertEqual(timestamps.index_at_or_before(epoch, 25), 1)
+        self.assertEqual(timestamps.index_at_or_before(epoch, 5), 0)
+        self.assertEqual(timestamps.index_at_or_before(epoch, 50), 2)
+
+    def test_nearest_index(self):
+        epoch = np.array([10, 20, 30])
+
+        self.assertEqual(timestamps.nearest_index(epoch, 14), 0)
+        self.assertEqual(timestamps.nearest_index(epoch, 16), 1)
+        self.assertEqual(timestamps.nearest_index(epoch, 0), 0)
+        self.assertEqual(timestamps.nearest_index(epoch, 50), 2)
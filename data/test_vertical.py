@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+import vertical
+
+
+class TestVertical(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(vertical.parse('5'), 5)
+        self.assertTrue(isinstance(vertical.parse('5'), int))
+        self.assertEqual(vertical.parse('100m'), 100.0)
+        self.assertEqual(vertical.parse('12.5m'), 12.5)
+        self.assertTrue(vertical.is_metres(vertical.parse('100m')))
+        self.assertEqual(vertical.parse('bottom'), 'bottom')
+        self.assertEqual(vertical.parse(3), 3)
+
+    def test_bracket(self):
+        depths = np.array([0.5, 10, 20, 40])
+
+        upper, lower, weight, valid = vertical.bracket(depths, 15)
+        self.assertEqual((upper, lower), (1, 2))
+        self.assertAlmostEqual(weight, 0.5)
+        self.assertTrue(valid)
+
+        # On a level, and above the first one
+        self.assertEqual(vertical.bracket(depths, 20)[2], 0)
+        upper, lower, weight, valid = vertical.bracket(depths, 0)
+        self.assertEqual((upper, lower, weight), (0, 0, 0))
+        self.assertTrue(valid)
+
+        self.assertFalse(vertical.bracket(depths, 50)[3])
+
+    def test_bracket_columns(self):
+        # Sigma levels, the second column is shallower
+        levels = np.array([[1, 0.5], [5, 2.5], [9, 4.5]])
+        upper, lower, weight, valid = vertical.bracket(levels, 3)
+
+        np.testing.assert_array_equal(upper, [0, 1])
+        np.testing.assert_array_equal(lower, [1, 2])
+        np.testing.assert_array_almost_equal(weight, [0.5, 0.25])
+        np.testing.assert_array_equal(
+            vertical.bracket(levels, 6)[3], [True, False])
+
+    def test_combine(self):
+        upper = np.ma.array([1.0, 2.0])
+        lower = np.ma.array([3.0, 0], mask=[False, True])
+
+        result = vertical.combine(upper, lower, np.array([0.5, 0]))
+        np.testing.assert_array_equal(result, [2.0, 2.0])
+        self.assertFalse(np.ma.is_masked(result))
+
+    def test_read(self):
+        var = np.arange(2 * 4 * 3).reshape((2, 4, 3)).astype(float)
+        depths = np.array([0, 10, 20, 30])
+
+        np.testing.assert_array_almost_equal(
+            vertical.read(var, 1, depths, 15.0, (slice(None),)),
+            (var[1, 1] + var[1, 2]) / 2)
+        self.assertTrue(
+            vertical.read(var, 0, depths, 35.0, (slice(None),)).mask.all())
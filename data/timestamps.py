@@ -0,0 +1,214 @@
+from netCDF4 import netcdftime, chartostring
+import numpy as np
+import calendar
+import datetime
+import json
+import threading
+import time
+import dateutil.parser
+import pytz
+
+UNIT_SECONDS = {
+    'seconds': 1,
+    'minutes': 60,
+    'hours': 3600,
+    'days': 86400,
+}
+
+
+def _to_epoch(dates):
+    # netcdftime dates for other calendars only have timetuple
+    return np.array([
+        calendar.timegm(getattr(d, 'utctimetuple', d.timetuple)())
+        for d in dates
+    ], dtype=np.int64)
+
+
+def numeric_decoder(units, calendar_name='standard'):
+    """Returns a function that converts CF time values to epoch seconds
+
+    Arguments:
+        units -- the CF units string, e.g. "hours since 1950-01-01 00:00:00"
+        calendar_name -- the CF calendar
+    """
+    t = netcdftime.utime(units, calendar=calendar_name)
+
+    if t.calendar in ['standard', 'gregorian', 'proleptic_gregorian'] and \
+            t.units in UNIT_SECONDS:
+        origin = calendar.timegm(t.origin.timetuple()) - t.tzoffset * 60
+        factor = UNIT_SECONDS[t.units]
+
+        def decode(values):
+            values = np.ma.getdata(values).astype(np.float64)
+            return origin + np.round(values * factor).astype(np.int64)
+    else:
+        def decode(values):
+            dates = t.num2date(np.ma.getdata(values))
+            return _to_epoch(np.atleast_1d(dates))
+
+    return decode
+
+
+def string_decoder(time_zone='UTC'):
+    """Returns a function that converts character arrays of ISO 8601 date
+    strings, like FVCOM's Times variable, to epoch seconds.
+
+    Arguments:
+        time_zone -- the zone the strings are in
+    """
+    tz = pytz.timezone(time_zone)
+
+    def decode(values):
+        strings = np.atleast_1d(chartostring(values))
+        try:
+            naive = np.array(
+                [s.strip().rstrip('Z') for s in strings],
+                dtype='datetime64[us]'
+            ).astype('datetime64[s]').astype(np.int64)
+        except ValueError:
+            return _to_epoch([
+                tz.localize(dateutil.parser.parse(s).replace(tzinfo=None))
+                for s in strings
+            ])
+
+        if len(naive) == 0:
+            return naive
+
+        # Zones with daylight saving time need the offset of every value
+        offsets = set(
+            tz.utcoffset(datetime.datetime.utcfromtimestamp(int(t)))
+            for t in (naive[0], naive[-1])
+        )
+        if len(offsets) == 1:
+            offset = offsets.pop()
+            return naive - int(offset.days * 86400 + offset.seconds)
+
+        return _to_epoch([
+            tz.localize(datetime.datetime.utcfromtimestamp(int(t)))
+            for t in naive
+        ])
+
+    return decode
+
+
+def to_datetimes(epoch):
+    """Converts epoch seconds to an array of UTC datetimes"""
+    return np.array([
+        d.replace(tzinfo=pytz.UTC)
+        for d in np.asarray(epoch).astype('datetime64[s]').astype(object)
+    ], dtype=object)
+
+
+def to_json(epoch, quantum=None):
+    """Serializes timestamps for the timestamps API
+
+    Arguments:
+        epoch -- an array of epoch seconds
+        quantum -- 'month' to snap each timestamp to the 15th of its month
+    """
+    dates = np.asarray(epoch).astype('datetime64[s]')
+    if quantum == 'month':
+        dates = (dates.astype('datetime64[M]').astype('datetime64[D]') +
+                 np.timedelta64(14, 'D')).astype('datetime64[s]')
+
+    return json.dumps([
+        {'id': idx, 'value': value + '+00:00'}
+        for idx, value in enumerate(np.datetime_as_string(dates).tolist())
+    ])
+
+
+class Timestamps(object):
+
+    """The timestamps of a dataset, kept as an int64 array of epoch seconds
+
+    The time variable is checked again once the ttl has passed. Forecast
+    aggregations only grow, so if the values already read haven't changed
+    only the new ones are read and decoded. The datetime array and the JSON
+    for the API are derived from the epoch array and cached with it.
+
+    Arguments:
+        ttl -- seconds between checks of the time variable
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+        self.__checked = None
+        self.__epoch = np.zeros(0, dtype=np.int64)
+        self.__datetimes = to_datetimes(self.__epoch)
+        self.__json = {}
+
+    @staticmethod
+    def __readonly(array):
+        array.flags.writeable = False
+        return array
+
+    def refresh(self, var, decode):
+        """Brings the timestamps up to date with the time variable
+
+        Arguments:
+            var -- the time variable
+            decode -- function from a slice of var to epoch seconds
+        """
+        now = time.time()
+        if self.__checked is not None and now - self.__checked < self.ttl:
+            return
+
+        with self.__lock:
+            epoch = self.__epoch
+            n = len(var)
+            count = len(epoch)
+
+            unchanged = 0 < count <= n and np.array_equal(
+                decode(var[count - 1:count]), epoch[-1:]
+            ) and np.array_equal(decode(var[0:1]), epoch[:1])
+
+            if unchanged and n == count:
+                pass
+            elif unchanged:
+                new = decode(var[count:n])
+                self.__epoch = self.__readonly(np.concatenate([epoch, new]))
+                self.__datetimes = self.__readonly(np.concatenate(
+                    [self.__datetimes, to_datetimes(new)]))
+                self.__json = {}
+            else:
+                self.__epoch = self.__readonly(
+                    np.asarray(decode(var[:]), dtype=np.int64))
+                self.__datetimes = self.__readonly(
+                    to_datetimes(self.__epoch))
+                self.__json = {}
+
+            self.__checked = now
+
+    @property
+    def epoch(self):
+        return self.__epoch
+
+    @property
+    def datetimes(self):
+        return self.__datetimes
+
+    def json(self, quantum=None):
+        if self.__json.get(quantum) is None:
+            self.__json[quantum] = to_json(self.__epoch, quantum)
+
+        return self.__json[quantum]
+
+
+def index_at_or_before(epoch, value):
+    """Returns the index of the last timestamp at or before value, or 0 if
+    they are all after it.
+    """
+    return max(int(np.searchsorted(epoch, value, side='right')) - 1, 0)
+
+
+def nearest_index(epoch, value):
+    """Returns the index of the timestamp closest to value"""
+    epoch = np.asarray(epoch)
+    i = int(np.searchsorted(epoch, value))
+    if i == 0:
+        return 0
+    if i == len(epoch):
+        return len(epoch) - 1
+
+    return i if epoch[i] - value < value - epoch[i - 1] else i - 1
@@ -0,0 +1,119 @@
+import re
+import numpy as np
+
+# A depth in metres in a url or query, e.g. 100m or 12.5m
+_METRES = re.compile(r'^\s*(\d+(\.\d*)?|\.\d+)\s*m\s*$')
+
+
+def parse(depth):
+    """Parses a depth from a url or query
+
+    Digits are the index of a level, a number followed by m is a depth in
+    metres, anything else, e.g. 'bottom' or 'all', is returned as is.
+
+    Returns:
+        An int level, a float depth in metres, or depth
+    """
+    if isinstance(depth, basestring):
+        if depth.isdigit():
+            return int(depth)
+
+        match = _METRES.match(depth)
+        if match:
+            return float(match.group(1))
+
+    return depth
+
+
+def is_metres(depth):
+    """True if depth is a depth in metres rather than a level"""
+    return isinstance(depth, float)
+
+
+def metres(depths, depth):
+    """The depth in metres of a level, or of a depth in metres"""
+    if is_metres(depth):
+        return depth
+
+    return depths[depth]
+
+
+def bracket(levels, depth):
+    """Finds the levels above and below a depth
+
+    Arguments:
+        levels -- the depths of the levels, increasing down, (nlev,) for
+                  z-levels or (nlev, ...) for levels that vary by column
+        depth -- the target depth in metres
+
+    Returns:
+        upper, lower -- the levels either side of the depth, the same one
+                        above the first level
+        weight -- the weight of the lower level, 0 if only the upper one is
+                  needed
+        valid -- False for the columns that don't reach the depth
+
+        Each with the trailing shape of levels.
+    """
+    levels = np.asarray(np.ma.filled(np.ma.asarray(levels, dtype=np.float64),
+                                     np.nan))
+    nlev = levels.shape[0]
+    flat = levels.reshape((nlev, -1))
+    columns = np.arange(flat.shape[1])
+
+    below = np.sum(flat <= depth, axis=0)
+    upper = np.clip(below - 1, 0, nlev - 1)
+    lower = np.clip(below, 0, nlev - 1)
+
+    top = flat[upper, columns]
+    bottom = flat[lower, columns]
+    span = np.where(lower == upper, 1, bottom - top)
+    weight = np.where(lower == upper, 0, (depth - top) / span)
+    weight = np.clip(np.nan_to_num(weight), 0, 1)
+
+    valid = depth <= flat[-1]
+
+    shape = levels.shape[1:]
+    return (upper.reshape(shape), lower.reshape(shape),
+            weight.reshape(shape), valid.reshape(shape))
+
+
+def combine(upper, lower, weight):
+    """Linear interpolation between the values on two levels
+
+    The lower level isn't needed where its weight is 0, so a column that
+    ends at the upper level isn't masked there.
+    """
+    upper = np.ma.asarray(upper)
+    lower = np.ma.asarray(lower)
+
+    return np.ma.where(weight == 0, upper, upper + weight * (lower - upper))
+
+
+def read(var, time, depths, depth, box):
+    """Reads a variable on z-levels at a depth in metres
+
+    Only the two levels around the depth are read, or just one if the depth
+    is on a level.
+
+    Arguments:
+        var -- a (time, depth, ...) variable
+        time -- a time index, or a list of them
+        depths -- the depths of the levels
+        depth -- the depth in metres
+        box -- the index of the rest of the dimensions, e.g. a tuple of
+               slices
+
+    Returns:
+        var[time, level, box] interpolated to the depth
+    """
+    upper, lower, weight, valid = bracket(depths, depth)
+    index = (time, int(upper)) + tuple(box)
+
+    data = np.ma.asarray(var[index])
+    if not valid:
+        return np.ma.masked_all(data.shape, dtype=data.dtype)
+    if weight == 0:
+        return data
+
+    return combine(data, var[(time, int(lower)) + tuple(box)], float(weight))
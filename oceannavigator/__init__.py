@@ -9,12 +9,19 @@ app.add_url_rule('/', 'root', lambda: app.send_static_file('index.html'))
 app.config.from_pyfile('oceannavigator.cfg', silent=False)
 app.config.from_envvar('OCEANNAVIGATOR_SETTINGS', silent=True)
 
+import data
+data.configure(app.config)
+
 Compress(app)
 
 babel = Babel(app)
 
 import oceannavigator.views
 
+if app.config.get('SHARED_STORE_PRELOAD'):
+    from oceannavigator.util import get_dataset_url, get_datasets
+    data.preload([get_dataset_url(d) for d in get_datasets()])
+
 
 @babel.localeselector
 def get_locale():
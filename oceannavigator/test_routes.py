@@ -8,7 +8,13 @@ import datetime
 from flask import Response
 import numpy as np
 import data
+import data.timestamps
 import views
+import calendar
+
+
+def _epoch(dates):
+    return np.array([calendar.timegm(d.timetuple()) for d in dates])
 
 
 class TestRoutes(unittest.TestCase):
@@ -361,10 +367,12 @@ class TestRoutes(unittest.TestCase):
 
         open_dataset.return_value = open_dataset
         open_dataset.__enter__ = open_dataset
-        open_dataset.configure_mock(timestamps=[
+        epoch = _epoch([
             datetime.datetime(2017, 04, 01, 0, 0, 0),
             datetime.datetime(2017, 05, 01, 0, 0, 0),
         ])
+        open_dataset.timestamps_json.side_effect = \
+            lambda quantum=None: data.timestamps.to_json(epoch, quantum)
         resp = self.app.get('/api/timestamps/?dataset=dataset')
         self.assertEquals(resp.status_code, 200)
         self.assertEquals(resp.mimetype, 'application/json')
@@ -514,12 +522,12 @@ class TestRoutes(unittest.TestCase):
         open_dataset.return_value = open_dataset
 
         mocks = [
-            mock.MagicMock(timestamps=np.array([
+            mock.MagicMock(epoch_timestamps=_epoch([
                 datetime.datetime(2017, 04, 01, 0, 0, 0),
                 datetime.datetime(2017, 05, 01, 0, 0, 0),
                 datetime.datetime(2017, 06, 01, 0, 0, 0),
             ])),
-            mock.MagicMock(timestamps=np.array([
+            mock.MagicMock(epoch_timestamps=_epoch([
                 datetime.datetime(2017, 02, 01, 0, 0, 0),
                 datetime.datetime(2017, 03, 01, 0, 0, 0),
                 datetime.datetime(2017, 04, 06, 0, 0, 0),
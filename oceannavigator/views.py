@@ -26,14 +26,15 @@ from plotting.stick import StickPlotter
 from plotting.stats import stats as areastats
 import plotting.tile
 import plotting.scale
+from data import vertical
 import numpy as np
 import re
 import oceannavigator.misc
 import os
 import plotting.colormap
 import base64
-import pytz
 from data import open_dataset
+from data.timestamps import index_at_or_before
 
 MAX_CACHE = 315360000
 FAILURE = redirect("/", code=302)
@@ -43,7 +44,7 @@ FAILURE = redirect("/", code=302)
 def range_query(dataset, projection, extent, variable, depth, time):
     extent = map(float, extent.split(","))
     min, max = plotting.scale.get_scale(
-        dataset, variable, depth, time, projection, extent)
+        dataset, variable, vertical.parse(depth), time, projection, extent)
 
     js = json.dumps({
         'min': min,
@@ -97,7 +98,7 @@ def query_id(q, q_id):
 @app.route('/api/data/<string:dataset>/<string:variable>/<int:time>/<string:depth>/<string:location>.json')
 def get_data(dataset, variable, time, depth, location):
     data = oceannavigator.misc.get_point_data(
-        dataset, variable, time, depth,
+        dataset, variable, time, vertical.parse(depth),
         map(float, location.split(","))
     )
     js = json.dumps(data)
@@ -334,31 +335,13 @@ def vars_query():
 
 @app.route('/api/timestamps/')
 def time_query():
-    data = []
+    js = "[]"
     if 'dataset' in request.args:
         dataset = request.args['dataset']
         quantum = request.args.get('quantum')
         with open_dataset(get_dataset_url(dataset)) as ds:
-            for idx, date in enumerate(ds.timestamps):
-                if quantum == 'month':
-                    date = datetime.datetime(
-                        date.year,
-                        date.month,
-                        15
-                    )
-                data.append(
-                    {'id': idx, 'value': date.replace(tzinfo=pytz.UTC)})
-
-    data = sorted(data, key=lambda k: k['id'])
-
-    class DateTimeEncoder(json.JSONEncoder):
-
-        def default(self, o):
-            if isinstance(o, datetime.datetime):
-                return o.isoformat()
-
-            return json.JSONEncoder.default(self, o)
-    js = json.dumps(data, cls=DateTimeEncoder)
+            js = ds.timestamps_json(quantum)
+
     resp = Response(js, status=200, mimetype='application/json')
     return resp
 
@@ -366,16 +349,10 @@ def time_query():
 @app.route('/api/timestamp/<string:old_dataset>/<int:date>/<string:new_dataset>')
 def timestamp_for_date(old_dataset, date, new_dataset):
     with open_dataset(get_dataset_url(old_dataset)) as ds:
-        timestamp = ds.timestamps[date]
+        timestamp = ds.epoch_timestamps[date]
 
     with open_dataset(get_dataset_url(new_dataset)) as ds:
-        timestamps = ds.timestamps
-
-    diffs = np.vectorize(lambda x: x.total_seconds())(timestamps - timestamp)
-    idx = np.where(diffs <= 0)[0]
-    res = 0
-    if len(idx) > 0:
-        res = idx.max()
+        res = index_at_or_before(ds.epoch_timestamps, timestamp)
 
     return Response(json.dumps(res), status=200, mimetype='application/json')
 
@@ -412,8 +389,8 @@ def tile(projection, dataset, variable, time, depth, scale, zoom, x, y):
     if _is_cache_valid(dataset, f):
         return send_file(f, mimetype='image/png', cache_timeout=MAX_CACHE)
     else:
-        if depth != "bottom" and depth != "all":
-            depth = int(depth)
+        # A level, a depth in metres such as 100m, or bottom
+        depth = vertical.parse(depth)
 
         img = plotting.tile.plot(projection, x, y, zoom, {
             'dataset': dataset,
@@ -10,9 +10,10 @@ import dateutil.parser
 from oceannavigator import app
 import plotter
 from flask_babel import gettext
-from data import open_dataset
+from data import open_dataset, executor, vertical
 import time
 import datetime
+import calendar
 from scipy.interpolate import interp1d
 
 
@@ -109,24 +110,26 @@ class DrifterPlotter(plotter.Plotter):
         self.end = np.clip(self.end, 0, len(self.times) - 1)
 
         with open_dataset(get_dataset_url(self.dataset_name)) as dataset:
-            depth = int(self.depth)
-
-            try:
-                model_start = np.where(
-                    dataset.timestamps <= self.times[self.start]
-                )[0][-1]
-            except IndexError:
-                model_start = 0
+            depth = self.depth
+            if not vertical.is_metres(depth):
+                depth = int(depth)
+
+            epoch = dataset.epoch_timestamps
+            model_start = np.searchsorted(
+                epoch,
+                calendar.timegm(self.times[self.start].utctimetuple()),
+                side='right'
+            ) - 1
+            model_start = max(model_start, 0)
 
             model_start -= 1
             model_start = np.clip(model_start, 0, len(dataset.timestamps) - 1)
 
-            try:
-                model_end = np.where(
-                    dataset.timestamps >= self.times[self.end]
-                )[0][0]
-            except IndexError:
-                model_end = len(dataset.timestamps) - 1
+            model_end = np.searchsorted(
+                epoch,
+                calendar.timegm(self.times[self.end].utctimetuple())
+            )
+            model_end = min(model_end, len(dataset.timestamps) - 1)
 
             model_end += 1
             model_end = np.clip(
@@ -143,16 +146,20 @@ class DrifterPlotter(plotter.Plotter):
                 lambda t: time.mktime(t.timetuple()),
                 self.times[self.start:self.end + 1]
             )
-            d = []
-            for v in self.variables:
-                pts, dist, mt, md = dataset.get_path(
-                    self.points[self.start:self.end + 1],
-                    depth,
-                    range(model_start, model_end + 1),
-                    v,
-                    times=output_times
-                )
+            paths = executor.fetch([
+                (dataset,
+                 lambda d, v=v: d.get_path(
+                     self.points[self.start:self.end + 1],
+                     depth,
+                     range(model_start, model_end + 1),
+                     v,
+                     times=output_times
+                 ))
+                for v in self.variables
+            ])
 
+            d = []
+            for pts, dist, mt, md in paths:
                 f = interp1d(
                     model_times,
                     md,
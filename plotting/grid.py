@@ -1,17 +1,17 @@
-from math import pi, radians, degrees
+from math import radians, degrees
 import numpy as np
-from pykdtree.kdtree import KDTree
 import geopy
 from geopy.distance import VincentyDistance
 import scipy.interpolate
 import itertools
 from pyresample.geometry import SwathDefinition
-from pyresample.kd_tree import resample_custom, resample_nearest
+from pyresample.kd_tree import resample_custom
 from cachetools import LRUCache
 import pytz
 from netCDF4 import netcdftime
 from bisect import bisect_left
 import utils
+from data import curvilinear, compute
 
 _data_cache = LRUCache(maxsize=16)
 
@@ -30,19 +30,11 @@ class Grid(object):
 
         self.time_var = utils.get_time_var(ncfile)
 
-        self.kdt = _data_cache.get(ncfile.filepath())
-        if self.kdt is None:
-            rad_factor = pi / 180.0
-            latvals = self.latvar[:] * rad_factor
-            lonvals = self.lonvar[:] * rad_factor
-            clat, clon = np.cos(latvals), np.cos(lonvals)
-            slat, slon = np.sin(latvals), np.sin(lonvals)
-            triples = np.array(list(zip(np.ravel(clat * clon),
-                                        np.ravel(clat * slon),
-                                        np.ravel(slat))))
-
-            self.kdt = KDTree(triples)
-            _data_cache[ncfile.filepath()] = self.kdt
+        self.grid = _data_cache.get(ncfile.filepath())
+        if self.grid is None:
+            self.grid = curvilinear.CurvilinearGrid(
+                ncfile.filepath(), latvarname, self.latvar[:], self.lonvar[:])
+            _data_cache[ncfile.filepath()] = self.grid
 
         self._shape = ncfile.variables[latvarname].shape
 
@@ -58,22 +50,9 @@ class Grid(object):
         Returns:
             y, x indicies
         """
-        if hasattr(lat0, "__len__"):
-            lat0 = np.array(lat0)
-            lon0 = np.array(lon0)
-            multiple = True
-        else:
-            multiple = False
-        rad_factor = pi / 180.0
-        lat0_rad = lat0 * rad_factor
-        lon0_rad = lon0 * rad_factor
-        clat0, clon0 = np.cos(lat0_rad), np.cos(lon0_rad)
-        slat0, slon0 = np.sin(lat0_rad), np.sin(lon0_rad)
-        q = [clat0 * clon0, clat0 * slon0, slat0]
-        if multiple:
-            q = np.array(q).transpose()
-        dist_sq_min, minindex_1d = self.kdt.query(np.float32(q), k=n)
-        iy_min, ix_min = np.unravel_index(minindex_1d, self._shape)
+        iy_min, ix_min, d = self.grid.find_index(lat0, lon0, n)
+        if not hasattr(lat0, "__len__"):
+            iy_min, ix_min = iy_min[0], ix_min[0]
         return iy_min, ix_min
 
     def bounding_box(self, lat, lon, n=10):
@@ -168,7 +147,8 @@ class Grid(object):
                     method=method,
                     neighbours=neighbours,
                     radius_of_influence=radius,
-                    nprocs=4
+                    grid=self.grid,
+                    offset=(miny, minx)
                 )
             )
         resampled = np.ma.vstack(resampled)
@@ -252,7 +232,8 @@ class Grid(object):
                                      method=method,
                                      neighbours=neighbours,
                                      radius_of_influence=radius,
-                                     nprocs=4))
+                                     grid=self.grid,
+                                     offset=(miny, minx)))
         combined = np.ma.array(combined)
 
         if mintime + 1 >= len(ts):
@@ -306,7 +287,24 @@ def _fill_invalid_shift(z):
 
 
 def resample(in_lat, in_lon, out_lat, out_lon, data, method='inv_square',
-             neighbours=8, radius_of_influence=500000, nprocs=4):
+             neighbours=8, radius_of_influence=500000, nprocs=None, grid=None,
+             offset=(0, 0)):
+    """Resamples a slab of a grid to the target points
+
+    'bilinear' and 'nn' look up the cells of the targets in the grid, a
+    data.curvilinear.CurvilinearGrid of which the slab starts at offset,
+    built over the slab if not given. 'inv_square' is pyresample's IDW, on
+    nprocs threads of the compute budget, as many as are free by default.
+    """
+    if method in ['bilinear', 'nn']:
+        if grid is None:
+            grid = curvilinear.CurvilinearGrid(None, 'slab', in_lat, in_lon)
+            offset = (0, 0)
+
+        return grid.interpolate(
+            data, np.ravel(out_lat), np.ravel(out_lon), offset=offset,
+            method='bilinear' if method == 'bilinear' else 'nearest')
+
     masked_lat = in_lat.view(np.ma.MaskedArray)
     masked_lon = in_lon.view(np.ma.MaskedArray)
     masked_lon.mask = masked_lat.mask = data.view(np.ma.MaskedArray).mask
@@ -315,35 +313,17 @@ def resample(in_lat, in_lon, out_lat, out_lon, data, method='inv_square',
     target_def = SwathDefinition(lons=out_lon, lats=out_lat)
 
     if method == 'inv_square':
-        res = resample_custom(
-            input_def,
-            data,
-            target_def,
-            radius_of_influence=radius_of_influence,
-            neighbours=neighbours,
-            weight_funcs=lambda r: 1 / np.clip(r, 0.0625,
-                                               np.finfo(r.dtype).max) ** 2,
-            fill_value=None,
-            nprocs=nprocs)
-    elif method == 'bilinear':
-        res = resample_custom(
-            input_def,
-            data,
-            target_def,
-            radius_of_influence=radius_of_influence,
-            neighbours=4,
-            weight_funcs=lambda r: 1 / np.clip(r, 0.0625,
-                                               np.finfo(r.dtype).max),
-            fill_value=None,
-            nprocs=nprocs)
-    elif method == 'nn':
-        res = resample_nearest(
-            input_def,
-            data,
-            target_def,
-            radius_of_influence=radius_of_influence,
-            fill_value=None,
-            nprocs=nprocs)
+        with compute.slots(nprocs) as granted:
+            res = resample_custom(
+                input_def,
+                data,
+                target_def,
+                radius_of_influence=radius_of_influence,
+                neighbours=neighbours,
+                weight_funcs=lambda r: 1 / np.clip(r, 0.0625,
+                                                   np.finfo(r.dtype).max) ** 2,
+                fill_value=None,
+                nprocs=granted)
     else:
         raise ValueError("Unknown resample method: %s", method)
 
@@ -10,7 +10,7 @@ import utils
 from oceannavigator.util import get_dataset_url
 import line
 from flask_babel import gettext
-from data import open_dataset
+from data import open_dataset, vertical
 
 
 class HovmollerPlotter(line.LinePlotter):
@@ -28,9 +28,11 @@ class HovmollerPlotter(line.LinePlotter):
                     self.depth_value = 'Bottom'
                     self.depth_unit = ''
                 else:
-                    self.depth = np.clip(int(self.depth), 0,
-                                         len(dataset.depths) - 1)
-                    self.depth_value = np.round(dataset.depths[self.depth])
+                    if not vertical.is_metres(self.depth):
+                        self.depth = np.clip(int(self.depth), 0,
+                                             len(dataset.depths) - 1)
+                    self.depth_value = np.round(
+                        vertical.metres(dataset.depths, self.depth))
                     self.depth_unit = "m"
             else:
                 self.depth_value = 0
@@ -24,7 +24,7 @@ from oceannavigator.misc import list_areas
 import pyresample.utils
 import area
 from geopy.distance import VincentyDistance
-from data import open_dataset
+from data import open_dataset, vertical, executor
 
 
 class MapPlotter(area.AreaPlotter):
@@ -147,31 +147,45 @@ class MapPlotter(area.AreaPlotter):
 
             if self.depth == 'bottom':
                 depth_value = 'Bottom'
+            elif vertical.is_metres(self.depth):
+                depth_value = self.depth
             else:
                 self.depth = np.clip(
                     int(self.depth), 0, len(dataset.depths) - 1)
                 depth_value = dataset.depths[self.depth]
 
+            # All of the variables are read and interpolated together, and
+            # the climatology of an anomaly is read at the same time
+            export = self.filetype in ['csv', 'odv', 'txt']
+            reads = [(dataset, lambda d: d.get_area(
+                np.array([self.latitude, self.longitude]),
+                self.depth,
+                self.time,
+                list(self.variables),
+                return_depth=export
+            ))]
+            if self.variables != self.variables_anom:
+                month = dataset.timestamps[self.time].month - 1
+                reads.append((
+                    open_dataset(get_dataset_climatology(self.dataset_name)),
+                    lambda d: d.get_area(
+                        np.array([self.latitude, self.longitude]),
+                        self.depth,
+                        month,
+                        list(self.variables)
+                    )
+                ))
+            areas = executor.fetch(reads)
+            climatology = areas[1:]
+            areas = areas[0]
+
             data = []
             allvars = []
-            for v in self.variables:
+            for v, d in zip(self.variables, areas):
                 var = dataset.variables[v]
                 allvars.append(v)
-                if self.filetype in ['csv', 'odv', 'txt']:
-                    d, depth_value = dataset.get_area(
-                        np.array([self.latitude, self.longitude]),
-                        self.depth,
-                        self.time,
-                        v,
-                        return_depth=True
-                    )
-                else:
-                    d = dataset.get_area(
-                        np.array([self.latitude, self.longitude]),
-                        self.depth,
-                        self.time,
-                        v
-                    )
+                if export:
+                    d, depth_value = d
 
                 d = np.multiply(d, scale_factor)
                 self.variable_unit, d = self.kelvin_to_celsius(
@@ -197,19 +211,19 @@ class MapPlotter(area.AreaPlotter):
             if self.quiver is not None and \
                 self.quiver['variable'] != '' and \
                     self.quiver['variable'] != 'none':
-                for v in self.quiver['variable'].split(','):
+                quiver_variables = self.quiver['variable'].split(',')
+                quiver_lon, quiver_lat = self.basemap.makegrid(50, 50)
+                quiver_data = dataset.get_area(
+                    np.array([quiver_lat, quiver_lon]),
+                    self.depth,
+                    self.time,
+                    quiver_variables
+                )
+                for v in quiver_variables:
                     allvars.append(v)
                     var = dataset.variables[v]
                     quiver_unit = get_variable_unit(self.dataset_name, var)
                     quiver_name = get_variable_name(self.dataset_name, var)
-                    quiver_lon, quiver_lat = self.basemap.makegrid(50, 50)
-                    d = dataset.get_area(
-                        np.array([quiver_lat, quiver_lon]),
-                        self.depth,
-                        self.time,
-                        v
-                    )
-                    quiver_data.append(d)
 
                 self.quiver_name = self.vector_name(quiver_name)
                 self.quiver_longitude = quiver_lon
@@ -255,16 +269,7 @@ class MapPlotter(area.AreaPlotter):
             with open_dataset(
                 get_dataset_climatology(self.dataset_name)
             ) as dataset:
-                data = []
-                for v in self.variables:
-                    var = dataset.variables[v]
-                    d = dataset.get_area(
-                        np.array([self.latitude, self.longitude]),
-                        self.depth,
-                        self.timestamp.month - 1,
-                        v
-                    )
-                    data.append(d)
+                data = climatology[0]
 
                 if len(data) == 2:
                     data = np.sqrt(data[0] ** 2 + data[1] ** 2)
@@ -12,6 +12,8 @@ import point
 import numbers
 from flask_babel import gettext, format_datetime
 from data import open_dataset
+from data.timestamps import nearest_index
+import calendar
 from oceannavigator import app
 
 
@@ -65,6 +67,7 @@ class ObservationPlotter(point.PointPlotter):
 
         with open_dataset(get_dataset_url(self.dataset_name)) as dataset:
             ts = dataset.timestamps
+            epoch = dataset.epoch_timestamps
 
             observation_times = []
             timestamps = []
@@ -72,12 +75,8 @@ class ObservationPlotter(point.PointPlotter):
                 observation_time = dateutil.parser.parse(o['time'])
                 observation_times.append(observation_time)
 
-                deltas = [
-                    (x.replace(tzinfo=pytz.UTC) -
-                     observation_time).total_seconds()
-                    for x in ts]
-
-                time = np.abs(deltas).argmin()
+                time = nearest_index(
+                    epoch, calendar.timegm(observation_time.utctimetuple()))
                 timestamp = ts[time]
                 timestamps.append(timestamp)
 
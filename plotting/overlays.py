@@ -7,6 +7,7 @@ import hashlib
 from cachetools import LRUCache
 import threading
 from oceannavigator import app
+from data import compute
 import os
 
 _bathymetry_cache = LRUCache(maxsize=256 * 1024 * 1024, getsizeof=len)
@@ -69,12 +70,13 @@ def bathymetry(basemap, target_lat, target_lon, blur=None):
                 lons=target_lon.astype(np.float64),
                 lats=target_lat.astype(np.float64))
 
-            data = pyresample.kd_tree.resample_nearest(
-                orig_def, res,
-                target_def,
-                radius_of_influence=500000,
-                fill_value=None,
-                nprocs=4)
+            with compute.slots() as nprocs:
+                data = pyresample.kd_tree.resample_nearest(
+                    orig_def, res,
+                    target_def,
+                    radius_of_influence=500000,
+                    fill_value=None,
+                    nprocs=nprocs)
 
             def do_save(filename, data):
                 np.save(filename, data.filled())
@@ -16,6 +16,7 @@ from oceannavigator.util import (
 from flask_babel import format_date, format_datetime
 import contextlib
 from PIL import Image
+from data import compute, vertical
 
 
 class Plotter:
@@ -114,13 +115,11 @@ class Plotter:
         if depth is None or len(str(depth)) == 0:
             depth = 0
 
-        if isinstance(depth, basestring) and depth.isdigit():
-            depth = int(depth)
-
+        # Levels, or depths in metres such as 100m
         if isinstance(depth, list):
-            for i in range(0, len(depth)):
-                if isinstance(depth[i], basestring) and depth[i].isdigit():
-                    depth[i] = int(depth[i])
+            depth = [vertical.parse(d) for d in depth]
+        else:
+            depth = vertical.parse(depth)
 
         self.depth = depth
 
@@ -143,7 +142,8 @@ class Plotter:
         fig.text(0.9, 0, get_dataset_attribution(self.dataset_name),
                  ha='right', size='small', va='top')
 
-        with contextlib.closing(StringIO()) as buf:
+        # Rendering is single threaded, it takes one compute slot
+        with contextlib.closing(StringIO()) as buf, compute.slots(1):
             plt.savefig(
                 buf,
                 format=self.filetype,
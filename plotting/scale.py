@@ -1,17 +1,17 @@
 import numpy as np
-from pyproj import Proj
 from oceannavigator.util import (
     get_dataset_url, get_dataset_climatology, get_variable_unit
 )
 import re
-from data import open_dataset
+from data import open_dataset, executor
+import utils
 
 
 def get_scale(dataset, variable, depth, time, projection, extent):
     x = np.linspace(extent[0], extent[2], 50)
     y = np.linspace(extent[1], extent[3], 50)
     xx, yy = np.meshgrid(x, y)
-    dest = Proj(init=projection)
+    dest = utils.get_proj(projection)
     lon, lat = dest(xx, yy, inverse=True)
 
     variables_anom = variable.split(",")
@@ -20,21 +20,28 @@ def get_scale(dataset, variable, depth, time, projection, extent):
     with open_dataset(get_dataset_url(dataset)) as ds:
         timestamp = ds.timestamps[time]
 
-        d = ds.get_area(
+        # The climatology of an anomaly is read at the same time
+        reads = [(ds, lambda d: d.get_area(
             np.array([lat, lon]),
             depth,
             time,
-            variables[0]
-        )
+            variables
+        ))]
+        if variables != variables_anom:
+            reads.append((
+                open_dataset(get_dataset_climatology(dataset)),
+                lambda d: d.get_area(
+                    np.array([lat, lon]),
+                    depth,
+                    timestamp.month - 1,
+                    variables
+                )
+            ))
+        areas = executor.fetch(reads)
+
+        d = areas[0][0]
         if len(variables) > 1:
-            d0 = d
-            d1 = ds.get_area(
-                np.array([lat, lon]),
-                depth,
-                time,
-                variables[1]
-            )
-            d = np.sqrt(d0 ** 2 + d1 ** 2)
+            d = np.sqrt(areas[0][0] ** 2 + areas[0][1] ** 2)
 
         variable_unit = get_variable_unit(dataset,
                                           ds.variables[variables[0]])
@@ -43,27 +50,13 @@ def get_scale(dataset, variable, depth, time, projection, extent):
             d = np.add(d, -273.15)
 
     if variables != variables_anom:
-        with open_dataset(get_dataset_climatology(dataset), 'r') as ds:
-            c = ds.get_area(
-                np.array([lat, lon]),
-                depth,
-                timestamp.month - 1,
-                variables[0]
-            )
-
-            if len(variables) > 1:
-                c0 = c
-                c1 = ds.get_area(
-                    np.array([lat, lon]),
-                    depth,
-                    timestamp.month - 1,
-                    variables[1]
-                )
-                c = np.sqrt(c0 ** 2 + c1 ** 2)
+        c = areas[1][0]
+        if len(variables) > 1:
+            c = np.sqrt(areas[1][0] ** 2 + areas[1][1] ** 2)
 
-            d = d - c
+        d = d - c
 
-            m = max(abs(d.min()), abs(d.max()))
-            return -m, m
+        m = max(abs(d.min()), abs(d.max()))
+        return -m, m
 
     return d.min(), d.max()
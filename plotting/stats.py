@@ -8,7 +8,7 @@ import json
 from operator import itemgetter
 import re
 from flask_babel import gettext
-from data import open_dataset
+from data import open_dataset, vertical
 
 
 def stats(dataset_name, query):
@@ -96,10 +96,13 @@ def stats(dataset_name, query):
                 depthm = 'Bottom'
             if len(query.get('depth')) > 0 and \
                     query.get('depth') != 'bottom':
-                depth = int(query.get('depth'))
+                depth = vertical.parse(str(query.get('depth')))
 
-                depth = np.clip(depth, 0, len(dataset.depths) - 1)
-                depthm = dataset.depths[depth]
+                if vertical.is_metres(depth):
+                    depthm = depth
+                else:
+                    depth = np.clip(int(depth), 0, len(dataset.depths) - 1)
+                    depthm = dataset.depths[depth]
 
         lat, lon = np.meshgrid(
             np.linspace(bounds[0], bounds[2], 50),
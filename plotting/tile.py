@@ -14,18 +14,19 @@ import os
 import math
 from oceannavigator.util import get_dataset_url, get_variable_name, \
     get_variable_unit, get_dataset_climatology, get_variable_scale_factor
-from pyproj import Proj
 import pyproj
 from scipy.ndimage.filters import gaussian_filter
 from PIL import Image
 from flask_babel import gettext
 from skimage import measure
 import contextlib
-from data import open_dataset
+from cachetools import LRUCache
+from data import open_dataset, compute, vertical, executor
 from oceannavigator import app
 
 
 ETOPO_FILE = app.config['ETOPO_FILE']
+_coords_cache = LRUCache(maxsize=4096)
 
 
 def deg2num(lat_deg, lon_deg, zoom):
@@ -50,8 +51,8 @@ def get_m_coords(projection, x, y, z):
         nw = num2deg(x, y, z)
         se = num2deg(x + 1, y + 1, z)
 
-        wgs84 = Proj(init='EPSG:4326')
-        dest = Proj(init=projection)
+        wgs84 = utils.get_proj('EPSG:4326')
+        dest = utils.get_proj(projection)
 
         # 0,0 is top-left, 1st dim is rows
         x1, y1 = pyproj.transform(wgs84, dest, nw[1], nw[0])
@@ -68,7 +69,7 @@ def get_m_coords(projection, x, y, z):
             llcrnr_lon = -135
             urcrnr_lon = 45
 
-        proj = Proj(init=projection)
+        proj = utils.get_proj(projection)
 
         xx, yy = proj(lon_0, boundinglat)
         lon, llcrnr_lat = proj(math.sqrt(2.) * yy, 0., inverse=True)
@@ -100,12 +101,18 @@ def get_m_coords(projection, x, y, z):
 
 
 def get_latlon_coords(projection, x, y, z):
-    x0, y0 = get_m_coords(projection, x, y, z)
-    # webmerc = Proj(init='EPSG:3857')
-    dest = Proj(init=projection)
-    lon, lat = dest(x0, y0, inverse=True)
+    key = (projection, x, y, z)
+    if _coords_cache.get(key) is None:
+        x0, y0 = get_m_coords(projection, x, y, z)
+        dest = utils.get_proj(projection)
+        lon, lat = dest(x0, y0, inverse=True)
 
-    return lat, lon
+        # The cached arrays are shared between requests
+        lat.flags.writeable = False
+        lon.flags.writeable = False
+        _coords_cache[key] = (lat, lon)
+
+    return _coords_cache[key]
 
 
 def scale(args):
@@ -187,7 +194,6 @@ def plot(projection, x, y, z, args):
     scale = args.get('scale')
     scale = [float(component) for component in scale.split(',')]
 
-    data = []
     with open_dataset(get_dataset_url(dataset_name)) as dataset:
         if args.get('time') is None or (type(args.get('time')) == str and
                                         len(args.get('time')) == 0):
@@ -204,13 +210,26 @@ def plot(projection, x, y, z, args):
 
         timestamp = dataset.timestamps[time]
 
-        for v in variable:
-            data.append(dataset.get_area(
-                np.array([lat, lon]),
-                depth,
-                time,
-                v
+        # The components of a vector are interpolated together, and the
+        # climatology of an anomaly is read at the same time
+        reads = [(dataset, lambda d: d.get_area(
+            np.array([lat, lon]),
+            depth,
+            time,
+            list(variable)
+        ))]
+        if anom:
+            reads.append((
+                open_dataset(get_dataset_climatology(dataset_name)),
+                lambda d: d.get_area(
+                    np.array([lat, lon]),
+                    depth,
+                    timestamp.month - 1,
+                    variable[-1]
+                )
             ))
+        results = executor.fetch(reads)
+        data = results[0]
 
         variable_name = get_variable_name(dataset_name,
                                           dataset.variables[variable[0]])
@@ -226,7 +245,7 @@ def plot(projection, x, y, z, args):
             cmap = colormap.find_colormap(variable_name)
 
         if depth != 'bottom':
-            depthm = dataset.depths[depth]
+            depthm = vertical.metres(dataset.depths, depth)
         else:
             depthm = 0
 
@@ -248,14 +267,7 @@ def plot(projection, x, y, z, args):
             cmap = colormap.colormaps.get('speed')
 
     if anom:
-        with open_dataset(get_dataset_climatology(dataset_name)) as dataset:
-            a = dataset.get_area(
-                np.array([lat, lon]),
-                depth,
-                timestamp.month - 1,
-                v
-            )
-            data = data - a
+        data = data - results[1]
 
     f, fname = tempfile.mkstemp()
     os.close(f)
@@ -276,7 +288,8 @@ def plot(projection, x, y, z, args):
     img = sm.to_rgba(np.squeeze(data))
 
     im = Image.fromarray((img * 255.0).astype(np.uint8))
-    im.save(fname, format='png', optimize=True)
+    with compute.slots(1):
+        im.save(fname, format='png', optimize=True)
     with open(fname, 'r') as f:
         buf = f.read()
         os.remove(fname)
@@ -332,7 +345,8 @@ def topo(projection, x, y, z, args):
     f, fname = tempfile.mkstemp()
     os.close(f)
 
-    im.save(fname, format='png', optimize=True)
+    with compute.slots(1):
+        im.save(fname, format='png', optimize=True)
     with open(fname, 'r') as f:
         buf = f.read()
         os.remove(fname)
@@ -376,7 +390,7 @@ def bathymetry(projection, x, y, z, args):
     plt.xlim([0, 255])
     plt.ylim([0, 255])
 
-    with contextlib.closing(StringIO()) as buf:
+    with contextlib.closing(StringIO()) as buf, compute.slots(1):
         plt.savefig(
             buf,
             format='png',
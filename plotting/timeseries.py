@@ -11,7 +11,7 @@ from oceannavigator.util import get_variable_name, get_variable_unit, \
     get_dataset_url
 import datetime
 import point
-from data import open_dataset
+from data import open_dataset, vertical
 
 LINEAR = 200
 
@@ -38,7 +38,8 @@ class TimeseriesPlotter(point.PointPlotter):
             if isinstance(self.depth, str) or isinstance(self.depth, unicode):
                 header.append(["Depth", self.depth])
             else:
-                header.append(["Depth", "%d" % self.depths[self.depth]])
+                header.append(["Depth", "%d" % vertical.metres(self.depths,
+                                                               self.depth)])
 
             columns.append("%s (%s)" % (self.variable_name,
                                         self.variable_unit))
@@ -222,7 +223,7 @@ class TimeseriesPlotter(point.PointPlotter):
                 (set(dataset.variables[var].dimensions) &
                     set(dataset.depth_dimensions)):
                 self.depth_label = " at %d m" % (
-                    np.round(dataset.depths[self.depth])
+                    np.round(vertical.metres(dataset.depths, self.depth))
                 )
 
             elif self.depth == 'bottom':
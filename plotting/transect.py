@@ -14,7 +14,7 @@ from oceannavigator.util import get_variable_name, get_variable_unit, \
     get_dataset_url, get_dataset_climatology, get_variable_scale_factor
 import line
 from flask_babel import gettext
-from data import open_dataset, geo
+from data import open_dataset, geo, executor
 
 
 class TransectPlotter(line.LinePlotter):
@@ -75,10 +75,13 @@ class TransectPlotter(line.LinePlotter):
                 distances, times, lat, lon, bearings = geo.path_to_points(
                     self.points, 100
                 )
-                transect_pts, distance, x, dep = dataset.get_path_profile(
-                    self.points, time, self.variables[0], 100)
-                transect_pts, distance, y, dep = dataset.get_path_profile(
-                    self.points, time, self.variables[1], 100)
+                (transect_pts, distance, x, dep), \
+                    (transect_pts, distance, y, dep) = executor.fetch([
+                        (dataset,
+                         lambda d, name=name: d.get_path_profile(
+                             self.points, time, name, 100))
+                        for name in self.variables[:2]
+                    ])
 
                 x = np.multiply(x, scale_factors[0])
                 y = np.multiply(y, scale_factors[1])
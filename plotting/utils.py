@@ -2,6 +2,9 @@ import numpy as np
 import re
 import datetime
 from mpl_toolkits.basemap import Basemap
+from pyproj import Proj
+
+_proj_cache = {}
 
 
 def get_filename(plot_type, dataset_name, extension):
@@ -177,3 +180,11 @@ def get_interpolation(query):
         }
 
     return interp
+
+
+def get_proj(projection):
+    """Returns a Proj for an EPSG code, initializing each one only once"""
+    if projection not in _proj_cache:
+        _proj_cache[projection] = Proj(init=projection)
+
+    return _proj_cache[projection]
@@ -0,0 +1,90 @@
+#!env python
+"""
+Mirrors datasets into MIRROR_DIR, so the navigator reads them from local
+chunked files instead of their urls.
+
+Usage:
+    mirror.py [--pack] [--zlib] [--reorder] [--variables a,b] dataset_or_url...
+    mirror.py --remove dataset_or_url...
+    mirror.py --list
+
+Datasets are the keys of datasetconfig.cfg. The settings are read from
+oceannavigator.cfg and the file named by OCEANNAVIGATOR_SETTINGS, the same
+way the application reads them.
+"""
+import argparse
+import ConfigParser
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import data
+import data.mirror
+
+
+def read_settings():
+    settings = {}
+    paths = [os.path.join(ROOT, 'oceannavigator', 'oceannavigator.cfg')]
+    if os.environ.get('OCEANNAVIGATOR_SETTINGS'):
+        paths.append(os.environ['OCEANNAVIGATOR_SETTINGS'])
+
+    for path in paths:
+        values = {}
+        execfile(path, values)
+        settings.update((k, v) for k, v in values.items() if k.isupper())
+
+    return settings
+
+
+def dataset_url(name):
+    config = ConfigParser.RawConfigParser()
+    config.read(os.path.join(ROOT, 'oceannavigator', 'datasetconfig.cfg'))
+    if config.has_option('datasets', name):
+        return json.loads(config.get('datasets', name).replace("\n", ""))[
+            'url']
+
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('datasets', nargs='*')
+    parser.add_argument('--pack', action='store_true',
+                        help='store data as scaled int16')
+    parser.add_argument('--zlib', action='store_true',
+                        help='compress the chunks')
+    parser.add_argument('--reorder', action='store_true',
+                        help='store unstructured meshes along a Hilbert curve')
+    parser.add_argument('--variables',
+                        help='comma separated variables to mirror')
+    parser.add_argument('--remove', action='store_true',
+                        help='remove the mirrors instead')
+    parser.add_argument('--list', action='store_true',
+                        help='list the mirrors')
+    args = parser.parse_args()
+
+    data.configure(read_settings())
+    if data.settings.get('MIRROR_DIR') is None:
+        print "MIRROR_DIR isn't set"
+        exit(1)
+
+    if args.list:
+        for manifest in data.mirror.mirrors():
+            print manifest['url']
+        return
+
+    variables = args.variables.split(',') if args.variables else None
+    for name in args.datasets:
+        url = dataset_url(name)
+        if args.remove:
+            data.mirror.remove(url)
+        else:
+            print name, '->', data.mirror.ingest(url, variables, args.pack,
+                                                 args.zlib, args.reorder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!env python
+"""
+Builds coarsened overviews of variables into OVERVIEW_DIR, so low zoom
+tiles and whole domain ranges are read from them instead of the full grid.
+
+Usage:
+    overview.py --variables a,b [--factors 4,16] [--latest n] dataset_or_url...
+
+Overviews of times that are no longer in the datasets are removed. Each
+overview records a checksum of the time step it was built from, so after
+a forecast rerun the times are read from the source until they are built
+again, e.g. with --latest. Only NEMO grids have overviews. The settings
+are read the same way as for mirror.py.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import data
+import data.nemo
+import data.overview
+from mirror import read_settings, dataset_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('datasets', nargs='+')
+    parser.add_argument('--variables', required=True,
+                        help='comma separated variables to build')
+    parser.add_argument('--factors', default='4,16',
+                        help='comma separated factors to coarsen by')
+    parser.add_argument('--latest', type=int,
+                        help='only build the latest n times')
+    args = parser.parse_args()
+
+    data.configure(read_settings())
+    if data.settings.get('OVERVIEW_DIR') is None:
+        print "OVERVIEW_DIR isn't set"
+        exit(1)
+
+    variables = args.variables.split(',')
+    factors = [int(f) for f in args.factors.split(',')]
+    for name in args.datasets:
+        with data.open_dataset(dataset_url(name)) as dataset:
+            epochs = dataset.epoch_timestamps
+            times = None
+            if args.latest:
+                times = range(max(0, len(epochs) - args.latest), len(epochs))
+
+            data.overview.build(dataset.url, variables,
+                                data.nemo.LATLON_PAIRS, factors, epochs,
+                                times)
+            data.overview.prune(dataset.url, epochs)
+            print name, '->', data.overview.directory(dataset.url)
+
+
+if __name__ == '__main__':
+    main()